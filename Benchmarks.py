@@ -0,0 +1,250 @@
+from DataModel import GridWorld, Event
+from DataRandomizer import DataGenerator
+from SpatialIndex import BucketGridIndex
+from random import Random
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+
+def get_percentiles(samples, percentiles=(50, 90, 99)):
+    """
+    a function which returns percentiles of a list of samples with the nearest rank method
+    :param samples: a non-empty list of numbers
+    :param percentiles: optional argument, the percentiles to return, default value is (50, 90, 99)
+    :return: a dictionary linking 'p50', 'p90', etc. and 'max' to the corresponding samples
+    """
+
+    samples = sorted(samples)
+    result = {}
+    for percentile in percentiles:
+        rank = max(1, -(-percentile*len(samples) // 100))  # the ceiling of percentile% of the number of samples
+        result["p{0}".format(percentile)] = samples[rank - 1]
+    result["max"] = samples[-1]
+
+    return result
+
+
+class WorldBenchmark(object):
+    """
+    this class represents a benchmark of the nearest events search across world sizes and densities of events, the
+    results are collected in a report, which can be saved as JSON and compared with the report of an earlier run
+    """
+
+    def __init__(self, grid_sizes=(10, 50, 100), densities=(0.001, 0.01, 0.1, 0.5, 1.0), num_queries=1000,
+                 num_nearest_events=5, seed=0, construction_repeats=5):
+        """
+        constructor for a WorldBenchmark object
+        :param grid_sizes: optional argument, the grid sizes of the benchmarked worlds, default value is (10, 50, 100)
+        :param densities: optional argument, the fractions of the positions holding an event, from nearly empty to
+            fully packed worlds, default value is (0.001, 0.01, 0.1, 0.5, 1.0)
+        :param num_queries: optional argument, the number of timed queries for each world, default value is 1000
+        :param num_nearest_events: optional argument, the number of nearest events of each query, default value is 5
+        :param seed: optional argument, the seed of the generated worlds and queries, default value is 0
+        :param construction_repeats: optional argument, the number of timed constructions of each world and runs of
+            init_data, the median time is reported, default value is 5
+        :raises ValueError: if the number of construction repeats is not positive
+        """
+
+        if construction_repeats <= 0:
+            raise ValueError("The number of construction repeats must be greater than 0")
+
+        self.grid_sizes = grid_sizes
+        self.densities = densities
+        self.num_queries = num_queries
+        self.num_nearest_events = num_nearest_events
+        self.seed = seed
+        self.construction_repeats = construction_repeats
+
+    def run(self):
+        """
+        a method which runs all benchmarks
+        :return: the report, a dictionary with information about the environment and a list of cases, each case has
+            its name, grid size, density, number of events and measurements
+        """
+
+        cases = []
+        for grid_size in self.grid_sizes:
+            cases.append(self.run_init_data(grid_size))
+            for density in self.densities:
+                number_of_events = max(1, int(round(density * (2*grid_size + 1)**2)))
+                for indexed in (False, True):
+                    cases.append(self.run_world(grid_size, density, number_of_events, indexed))
+
+        return {"python": platform.python_version(), "platform": platform.platform(), "num_queries": self.num_queries,
+                "num_nearest_events": self.num_nearest_events, "seed": self.seed,
+                "construction_repeats": self.construction_repeats, "cases": cases}
+
+    def run_init_data(self, grid_size):
+        """
+        a method which times the random data generation of DataGenerator.init_data, which chooses the number of events,
+        the shared random generator is seeded before every run, so every run generates the same events and the median
+        time of the construction repeats is reported
+        :param grid_size: the grid size of the world
+        :return: the case of the report
+        """
+
+        times = []
+        for _ in range(self.construction_repeats):
+            random.seed(self.seed)  # init_data uses the shared random generator
+            world = GridWorld(generate=False, grid_size=grid_size)
+            gc.collect()
+            start = time.perf_counter()
+            DataGenerator.init_data(world, Event)
+            times.append(time.perf_counter() - start)
+        seconds = sorted(times)[len(times) // 2]
+
+        number_of_events = len(world.event_positions)
+        return {"name": "init_data", "grid_size": grid_size, "density": number_of_events / (2*grid_size + 1)**2,
+                "number_of_events": number_of_events, "seconds": seconds}
+
+    def build_world(self, grid_size, number_of_events, indexed):
+        """
+        a method which builds a benchmarked world
+        :param grid_size: the grid size of the world
+        :param number_of_events: the number of events of the world
+        :param indexed: True if the world uses a BucketGridIndex and False if it uses Breadth-First-Search
+        :return: the GridWorld object
+        """
+
+        world = GridWorld(generate=False, spatial_index=BucketGridIndex() if indexed else None, grid_size=grid_size)
+        world.generate_data(number_of_events=number_of_events, seed=self.seed)
+
+        return world
+
+    def run_world(self, grid_size, density, number_of_events, indexed):
+        """
+        a method which times the construction of a world with a number of events and the queries over it, the memory
+        is measured in a separate construction, since tracing the allocations slows down the construction many times
+        :param grid_size: the grid size of the world
+        :param density: the fraction of the positions holding an event
+        :param number_of_events: the number of events of the world
+        :param indexed: True if the world uses a BucketGridIndex and False if it uses Breadth-First-Search
+        :return: the case of the report
+        """
+
+        gc.collect()
+        tracemalloc.start()
+        world = self.build_world(grid_size, number_of_events, indexed)
+        memory_bytes, peak_memory_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        construction_times = []
+        for _ in range(self.construction_repeats):
+            world = None  # the previous world is released before the next one is built
+            gc.collect()
+            start = time.perf_counter()
+            world = self.build_world(grid_size, number_of_events, indexed)
+            construction_times.append(time.perf_counter() - start)
+        construction_seconds = sorted(construction_times)[len(construction_times) // 2]
+
+        random_generator = Random(self.seed)
+        queries = [(random_generator.randint(-grid_size, grid_size), random_generator.randint(-grid_size, grid_size))
+                   for _ in range(self.num_queries)]
+
+        latencies = []
+        for x, y in queries:
+            start = time.perf_counter()
+            world.get_nearest_positions(x, y, self.num_nearest_events)
+            latencies.append((time.perf_counter() - start) * 1e6)
+
+        query_latency = get_percentiles(latencies)
+        query_latency["mean"] = sum(latencies) / len(latencies)
+
+        return {"name": "indexed_queries" if indexed else "bfs_queries", "grid_size": grid_size, "density": density,
+                "number_of_events": number_of_events, "construction_seconds": construction_seconds,
+                "memory_bytes": memory_bytes, "peak_memory_bytes": peak_memory_bytes,
+                "query_latency_us": query_latency}
+
+    @staticmethod
+    def compare(baseline, report, tolerance=1.5):
+        """
+        a static method, which finds the cases of a report which are slower than in a baseline report
+        :param baseline: the report of an earlier run
+        :param report: the report of the current run
+        :param tolerance: optional argument, a case is reported if it is slower than the baseline by more than this
+            factor, default value is 1.5
+        :return: a list of tuples (case name, grid size, density, measurement, baseline value, current value)
+        """
+
+        def key(case):
+            return case["name"], case["grid_size"], case["density"]
+
+        def comparable(case, baseline_case):
+            # init_data chooses its number of events, so only runs which generated the same events are compared
+            return case["name"] != "init_data" or case["number_of_events"] == baseline_case["number_of_events"]
+
+        def measurements(case):
+            if "query_latency_us" in case:
+                return {"construction_seconds": case["construction_seconds"],
+                        "query_latency_us.p50": case["query_latency_us"]["p50"],
+                        "query_latency_us.p99": case["query_latency_us"]["p99"]}
+            return {"seconds": case["seconds"]}
+
+        baseline_cases = dict((key(case), case) for case in baseline["cases"])
+        regressions = []
+        for case in report["cases"]:
+            if key(case) not in baseline_cases or not comparable(case, baseline_cases[key(case)]):
+                continue
+
+            baseline_values = measurements(baseline_cases[key(case)])
+            for measurement, value in measurements(case).items():
+                if value > baseline_values[measurement] * tolerance:
+                    regressions.append(key(case) + (measurement, baseline_values[measurement], value))
+
+        return regressions
+
+
+def main(arguments=None):
+    """
+    a main method, which runs the benchmarks and saves the report
+    :param arguments: optional argument, the list of command line arguments, default value is None, in which case the
+        arguments of the process are used
+    :return: 1 if there are regressions compared with the baseline report and 0 otherwise
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmarks the nearest events search of GridWorld")
+    parser.add_argument("--output", default="benchmark.json", help="the path of the JSON report")
+    parser.add_argument("--baseline", help="the path of an earlier JSON report to compare with")
+    parser.add_argument("--grid-sizes", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.001, 0.01, 0.1, 0.5, 1.0])
+    parser.add_argument("--queries", type=int, default=1000, help="the number of timed queries for each world")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="the slowdown factor reported as a regression")
+    parser.add_argument("--repeats", type=int, default=5, help="the number of timed constructions of each world")
+    arguments = parser.parse_args(arguments)
+
+    benchmark = WorldBenchmark(arguments.grid_sizes, arguments.densities, arguments.queries,
+                               construction_repeats=arguments.repeats)
+    report = benchmark.run()
+    with open(arguments.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+    for case in report["cases"]:
+        if "query_latency_us" in case:
+            print("{0:16} grid {1:4} density {2:6} events {3:7}: built in {4:.3f}s, query p50 {5:.1f}us p99 {6:.1f}us"
+                  .format(case["name"], case["grid_size"], case["density"], case["number_of_events"],
+                          case["construction_seconds"], case["query_latency_us"]["p50"],
+                          case["query_latency_us"]["p99"]))
+        else:
+            print("{0:16} grid {1:4} events {2:7}: {3:.3f}s".format(case["name"], case["grid_size"],
+                                                                     case["number_of_events"], case["seconds"]))
+
+    if arguments.baseline is None:
+        return 0
+
+    with open(arguments.baseline) as baseline_file:
+        regressions = WorldBenchmark.compare(json.load(baseline_file), report, arguments.tolerance)
+    for name, grid_size, density, measurement, baseline_value, value in regressions:
+        print("Regression in {0} grid {1} density {2}: {3} {4:.3f} -> {5:.3f}".format(
+            name, grid_size, density, measurement, baseline_value, value))
+
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -38,3 +38,32 @@ class DuplicateIdentifierError(KeyError):
         """
 
         super(DuplicateIdentifierError, self).__init__(msg)
+
+
+class UnknownIdentifierError(KeyError):
+    """
+    a custom type of error raised when there is no event with a given identifier, e.g when removing an event
+    """
+
+    def __init__(self, msg):
+        """
+        the constructor for the error calls the parent's (KeyError) constructor
+        :param msg: the msg of the error
+        """
+
+        super(UnknownIdentifierError, self).__init__(msg)
+
+
+class ReadOnlyWorldError(TypeError):
+    """
+    a custom type of error raised when trying to change a read-only world, e.g. registering an event in a world loaded
+    from a snapshot
+    """
+
+    def __init__(self, msg):
+        """
+        the constructor for the error calls the parent's (TypeError) constructor
+        :param msg: the msg of the error
+        """
+
+        super(ReadOnlyWorldError, self).__init__(msg)
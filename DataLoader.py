@@ -0,0 +1,207 @@
+from CustomErrors import InvalidPositionError, DuplicateIdentifierError
+import csv
+import json
+import os
+
+
+class LoadReport(object):
+    """
+    this class represents the outcome of loading events from a file, i.e. the number of loaded and rejected rows and
+    the errors of the first rejected rows
+    """
+
+    def __init__(self, max_errors):
+        """
+        the constructor for a load report
+        :param max_errors: the maximum number of errors kept in the report, so that its size is bounded
+        """
+
+        self.loaded = 0
+        self.rejected = 0
+        self.errors = []  # a list of tuples (line number, error)
+        self.max_errors = max_errors
+
+    def add_error(self, line_number, error):
+        """
+        a method which records a rejected row, only the first max_errors errors are kept
+        :param line_number: the line number of the row in the file, starting from 1
+        :param error: the error raised when parsing or validating the row
+        """
+
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line_number, error))
+
+
+class EventLoader(object):
+    """
+    a utility class providing static methods for loading events from CSV or JSONL files, the files are read and
+    registered in chunks, so that the memory used does not depend on the size of the file
+    """
+
+    formats = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}  # the file format for each known file extension
+
+    @staticmethod
+    def get_file_format(path):
+        """
+        a static method, which finds the format of a file from its extension
+        :param path: the path of the file
+        :return: 'csv' or 'jsonl'
+        :raises ValueError: if the extension of the file is not known
+        """
+
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in EventLoader.formats:
+            raise ValueError("Unknown format of the events file: {0}".format(path))
+
+        return EventLoader.formats[extension]
+
+    @staticmethod
+    def iter_csv_rows(lines):
+        """
+        a static method, which parses the rows of a CSV file in format: identifier,x,y[,price...], a header row starting
+        with 'id' or 'identifier' is skipped
+        :param lines: an iterable of the lines of the file
+        :return: a generator of tuples (line number, row), where the row is a tuple (identifier, x, y, tickets, None,
+            None) or the error raised when parsing the line, since CSV rows have no times
+        """
+
+        for line_number, fields in enumerate(csv.reader(lines), 1):
+            if len(fields) == 0:
+                continue
+
+            if line_number == 1 and fields[0].strip().lower() in ("id", "identifier"):
+                continue
+
+            try:
+                if len(fields) < 3:
+                    raise ValueError("Expected identifier, x, y and ticket prices, got: {0}".format(",".join(fields)))
+                row = (int(fields[0]), int(fields[1]), int(fields[2]),
+                       tuple(float(price) for price in fields[3:] if price.strip() != ""), None, None)
+            except ValueError as error:
+                row = error
+
+            yield line_number, row
+
+    @staticmethod
+    def iter_jsonl_rows(lines):
+        """
+        a static method, which parses the rows of a JSONL file, each line is an object in format:
+        {"id": identifier, "x": x, "y": y, "tickets": [price, ...]}, with optional "start_time" and "end_time" fields
+        :param lines: an iterable of the lines of the file
+        :return: a generator of tuples (line number, row), where the row is a tuple (identifier, x, y, tickets,
+            start time, end time) or the error raised when parsing the line
+        """
+
+        for line_number, line in enumerate(lines, 1):
+            if line.strip() == "":
+                continue
+
+            try:
+                fields = json.loads(line)
+                if type(fields) != dict:
+                    raise ValueError("Expected a JSON object, got: {0}".format(line.strip()))
+                row = (fields["id"], fields["x"], fields["y"], tuple(fields.get("tickets", ())),
+                       fields.get("start_time"), fields.get("end_time"))
+            except KeyError as error:
+                row = ValueError("Missing field: {0}".format(error.args[0]))
+            except (ValueError, TypeError) as error:
+                row = error
+
+            yield line_number, row
+
+    @staticmethod
+    def load(world, data_type, source, file_format=None, chunk_size=10000, max_errors=100):
+        """
+        this is the main static method to be called in order to load events from a file, each chunk of rows is
+        validated and the valid events are registered with a single call, invalid rows are reported without stopping
+        the load
+        :param world: the reference to the GridWorld object
+        :param data_type: this is the type of data stored in the grid world, in the simulation Event should be used,
+            since the world contains Event objects
+        :param source: the path of the file or an iterable of its lines, e.g. an open file
+        :param file_format: optional argument, 'csv' or 'jsonl', default value is None, in which case the format is
+            found from the extension of the path
+        :param chunk_size: optional argument, the maximum number of events validated and registered at once, default
+            value is 10000
+        :param max_errors: optional argument, the maximum number of errors kept in the report, default value is 100
+        :return: a LoadReport with the number of loaded and rejected rows and the errors of the first rejected rows
+        :raises ValueError: if the format of the file is not known or the chunk size is not positive
+        :raises ReadOnlyWorldError: if the world is read-only
+        """
+
+        world.check_writable()
+
+        if file_format is None:
+            file_format = EventLoader.get_file_format(source)
+        if file_format not in ("csv", "jsonl"):
+            raise ValueError("Unknown format of the events file: {0}".format(file_format))
+        if chunk_size <= 0:
+            raise ValueError("The chunk size must be greater than 0")
+
+        if isinstance(source, str):
+            with open(source, newline="") as lines:
+                return EventLoader.load(world, data_type, lines, file_format, chunk_size, max_errors)
+
+        if file_format == "csv":
+            rows = EventLoader.iter_csv_rows(source)
+        else:
+            rows = EventLoader.iter_jsonl_rows(source)
+
+        report = LoadReport(max_errors)
+        chunk = []
+        identifiers = set()  # the identifiers of the current chunk, since they are not registered yet
+        for line_number, row in rows:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                chunk.append(EventLoader.validate_row(world, data_type, row, identifiers))
+            except (ValueError, TypeError, KeyError) as error:
+                report.add_error(line_number, error)
+                continue
+
+            if len(chunk) == chunk_size:
+                world.register_events(chunk)
+                report.loaded += len(chunk)
+                chunk = []
+                identifiers.clear()
+
+        if len(chunk) > 0:
+            world.register_events(chunk)
+            report.loaded += len(chunk)
+
+        return report
+
+    @staticmethod
+    def validate_row(world, data_type, row, identifiers):
+        """
+        a static method, which validates a parsed row against the world and the rows of the current chunk
+        :param world: the reference to the GridWorld object
+        :param data_type: the type of the created event
+        :param row: a tuple (identifier, x, y, tickets, start time, end time)
+        :param identifiers: the set of identifiers of the current chunk, the identifier of the row is added to it
+        :return: a tuple (event, x, y) ready to be registered
+        :raises InvalidPriceError: if there is a ticket price <= 0
+        :raises InvalidPositionError: if the coordinates are out of bounds or not integers
+        :raises DuplicateIdentifierError: if the identifier is already in use
+        :raises TypeError: if the identifier is not an integer or a time is not a number
+        :raises ValueError: if the event ends before it starts
+        """
+
+        identifier, x, y, tickets, start_time, end_time = row
+        for time in (start_time, end_time):
+            if time is not None and type(time) not in (int, float):
+                raise TypeError("Times must be numbers of seconds: {0}".format(time))
+        event = data_type(identifier, tickets, start_time, end_time)
+
+        if type(x) != int or type(y) != int:
+            raise InvalidPositionError("Coordinates must be integers: {0}, {1}".format(x, y))
+
+        if not ((-1*world.grid_size) <= x <= world.grid_size and (-1*world.grid_size) <= y <= world.grid_size):
+            raise InvalidPositionError("Out of bounds coordinates when registering an event: {0}, {1}".format(x, y))
+
+        if identifier in world.unique_identifiers or identifier in identifiers:
+            raise DuplicateIdentifierError("Identifier {0} is already in use".format(identifier))
+        identifiers.add(identifier)
+
+        return event, x, y
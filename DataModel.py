@@ -1,23 +1,49 @@
 from DataRandomizer import DataGenerator
-from CustomErrors import InvalidPriceError, InvalidPositionError, DuplicateIdentifierError
+from DataLoader import EventLoader
+from CustomErrors import InvalidPriceError, InvalidPositionError, DuplicateIdentifierError, UnknownIdentifierError, \
+    ReadOnlyWorldError
+from SpatialIndex import get_search_key, get_search_ranks
+from ResultFormatting import ResultFormatter
+from WorldStorage import DenseStorage
+from NearestTable import NearestTable
+from Metrics import QueryRecord
+from array import array
 from collections import deque
+from heapq import heappush, heappop
 from math import log
+from sys import intern
+from time import perf_counter
+
+try:
+    import numpy
+except ImportError:  # numpy is only needed for the batch queries
+    numpy = None
 
 
 class Event(object):
     """
-    this class represents the model of an Event with a unique identifier and 0 or more positive ticket prices
+    this class represents the model of an Event with a unique identifier, 0 or more positive ticket prices and an
+    optional time window, the attributes are declared in __slots__ and the tickets are packed in a typed array, so that
+    worlds with millions of events don't pay for a dictionary and a float object per ticket for every event
     """
 
+    __slots__ = ("identifier", "tickets", "formatted_id", "formatted_minimum_ticket_price", "minimum_price",
+                 "maximum_price", "start_time", "end_time")
+
     currency = "$"  # the main currency used for the tickets is dollar
 
-    def __init__(self, identifier, tickets):
+    def __init__(self, identifier, tickets, start_time=None, end_time=None):
         """
         constructor for an Event object
         :param identifier: the unique numeric identifier of the event
-        :param tickets: the container with all the ticket prices
+        :param tickets: the container with all the ticket prices, stored as an array of doubles
+        :param start_time: optional argument, the timestamp in seconds at which the event starts, default value is None,
+            in which case the event has no start
+        :param end_time: optional argument, the timestamp in seconds at which the event ends, default value is None, in
+            which case the event never ends
         :raises InvalidPriceError: if there is a ticker price <= 0
         :raises TypeError: if the identifier is not an integer
+        :raises ValueError: if the event ends before it starts
         """
 
         # ensure all tickets' prices are positive
@@ -28,18 +54,43 @@ class Event(object):
         if type(identifier) != int:
             raise TypeError("Identifier must be of type int")
 
+        # ensure the time window is not empty
+        if start_time is not None and end_time is not None and end_time < start_time:
+            raise ValueError("An event can not end before it starts")
+
         self.identifier = identifier
-        self.tickets = tickets
+        self.tickets = array("d", tickets)
+        self.start_time = start_time
+        self.end_time = end_time
+
+        # the formatted id and minimum ticket price are cached once the event is registered in a world
+        self.formatted_id = None
+        self.formatted_minimum_ticket_price = None
+
+        # the minimum and maximum ticket prices, also cached when the event is registered
+        self.minimum_price = None
+        self.maximum_price = None
 
     def get_id(self):
         """
         get a formatted string of the unique id of the event
         :return: a string of the id filled with 0s appended to its left so that the number of digits is equal to the
             number of digits of the maximum id for a ticket, for example if max ticket id might be 400, then id 4 will
-            returned as '004' instead of '4'
+            returned as '004' instead of '4', the id is formatted for the world the event is registered in, or for the
+            default grid size if it is not registered
         """
 
-        num_of_digits = int(log((GridWorld.grid_size*2 + 1)**2, 10)) + 1
+        if self.formatted_id is not None:
+            return self.formatted_id
+
+        return self.format_id(GridWorld.get_id_digits(GridWorld.grid_size))
+
+    def format_id(self, num_of_digits):
+        """
+        get a formatted string of the unique id of the event, padded to a given number of digits
+        :param num_of_digits: the number of digits of the formatted id
+        :return: a string of the id filled with 0s appended to its left so that it has at least num_of_digits digits
+        """
 
         formatted_id = str(self.identifier)
         if len(formatted_id) < num_of_digits:
@@ -55,6 +106,9 @@ class Event(object):
             if there are no tickets, 'N/A' is returned
         """
 
+        if self.formatted_minimum_ticket_price is not None:
+            return self.formatted_minimum_ticket_price
+
         if len(self.tickets) == 0:
             return "N/A"
         else:
@@ -68,58 +122,277 @@ class Event(object):
             else:
                 return Event.currency + min_price
 
+    def cache_formatting(self, num_of_id_digits):
+        """
+        a method which computes the formatted id and minimum ticket price once, so that queries don't recompute them,
+        called when the event is registered in a world
+        :param num_of_id_digits: the number of digits of the formatted id, which depends on the size of the world
+        """
+
+        self.formatted_minimum_ticket_price = None  # cleared so that the minimum price is recomputed
+
+        self.formatted_id = self.format_id(num_of_id_digits)
+
+        # there are few distinct minimum prices, so their formatted strings are shared between events
+        self.formatted_minimum_ticket_price = intern(self.get_minimum_ticket_price())
+
+    def cache_price_range(self):
+        """
+        a method which computes the minimum and maximum ticket prices once, so that price filtered queries don't
+        recompute them, called when the event is registered in a world
+        """
+
+        self.minimum_price = self.maximum_price = None  # cleared so that the price range is recomputed
+
+        price_range = self.get_price_range()
+        if price_range is not None:
+            self.minimum_price, self.maximum_price = price_range
+
+    @property
+    def price_range(self):
+        """
+        the cached minimum and maximum ticket prices, they are kept in two attributes instead of a tuple to save memory
+        :return: a tuple (minimum price, maximum price) or None if there are no tickets or the prices are not cached
+        """
+
+        if self.minimum_price is None:
+            return None
+
+        return self.minimum_price, self.maximum_price
+
+    def get_price_range(self):
+        """
+        get the minimum and maximum ticket prices of this event
+        :return: a tuple (minimum price, maximum price) or None if there are no tickets
+        """
+
+        if self.minimum_price is not None:
+            return self.minimum_price, self.maximum_price
+
+        if len(self.tickets) == 0:
+            return None
+        else:
+            return min(self.tickets), max(self.tickets)
+
+    def has_ticket_in_range(self, min_price=None, max_price=None):
+        """
+        a method which checks if this event has a ticket with a price in a given range
+        :param min_price: optional argument, the minimum price of the range inclusive, default value is None, in which
+            case the range has no lower bound
+        :param max_price: optional argument, the maximum price of the range inclusive, default value is None, in which
+            case the range has no upper bound
+        :return: true if at least one ticket price is in the range and false otherwise, e.g. if there are no tickets
+        """
+
+        price_range = self.get_price_range()
+        if price_range is None:
+            return False
+
+        # most events are decided by the cached price range without going through the tickets
+        low = price_range[0] if min_price is None else max(min_price, price_range[0])
+        high = price_range[1] if max_price is None else min(max_price, price_range[1])
+        if low > high:
+            return False
+        if low == price_range[0] or high == price_range[1]:
+            return True
+
+        return any(low <= ticket <= high for ticket in self.tickets)
+
+    @property
+    def time_range(self):
+        """
+        the time window of the event, with infinite bounds for a missing start or end time
+        :return: a tuple (start time, end time)
+        """
+
+        return (float("-inf") if self.start_time is None else self.start_time,
+                float("inf") if self.end_time is None else self.end_time)
+
+    def is_happening(self, start_time=None, end_time=None):
+        """
+        a method which checks if this event is happening at any moment of a given time window
+        :param start_time: optional argument, the start of the window inclusive, default value is None, in which case
+            the window has no start
+        :param end_time: optional argument, the end of the window inclusive, default value is None, in which case the
+            window has no end
+        :return: true if the time window of the event overlaps the given window and false otherwise
+        """
+
+        return (start_time is None or self.end_time is None or self.end_time >= start_time) and \
+            (end_time is None or self.start_time is None or self.start_time <= end_time)
+
 
 class GridWorld(object):
     """
     this class represents the model of a GridWorld containing a number of events
     """
 
-    grid_size = 10  # half of the size of the grid, e.g. if this is 10, world is in range [-10, 10]
+    grid_size = 10  # the default half of the size of the grid, e.g. if this is 10, world is in range [-10, 10]
 
-    def __init__(self, generate=True):
+    def __init__(self, generate=True, spatial_index=None, storage=None, query_cache=None, metrics=None,
+                 cost_layer=None, grid_size=None):
         """
         constructor for a GridWorld object
         :param generate: optional argument, True if data should be generated when initializing the object and False
             otherwise, default value is True
+        :param spatial_index: optional argument, a SpatialIndex object used to answer nearest positions queries
+            without exploring empty positions, default value is None, in which case Breadth-First-Search is used
+        :param storage: optional argument, a WorldStorage object holding the events, default value is None, in which
+            case a DenseStorage with a cell for every position is allocated, a ChunkedStorage should be used for
+            very large worlds and a ColumnarStorage for worlds with many events
+        :param query_cache: optional argument, a QueryCache object keeping the results of recent nearest positions
+            queries, default value is None, in which case every query is searched
+        :param metrics: optional argument, a MetricsSink object receiving measurements of every query and change,
+            default value is None, in which case nothing is measured
+        :param cost_layer: optional argument, a CostLayer object with the travel cost of every position, the nearest
+            events are then the ones with the cheapest travel costs, default value is None, in which case the
+            manhattan distance is used
+        :param grid_size: optional argument, half of the size of the grid of this world, default value is None, in
+            which case the grid_size class attribute is used
+        :raises ValueError: if the grid size is negative or the grid size of the cost layer is different
         """
 
-        self.unique_identifiers = set()  # a set is used to ensure the uniqueness of identifiers for events
+        if grid_size is not None:
+            if grid_size < 0:
+                raise ValueError("The grid size must not be negative")
+            self.grid_size = grid_size  # the instance attribute hides the default of the class
+
+        if cost_layer is not None and cost_layer.grid_size != self.grid_size:
+            raise ValueError("The cost layer has grid size {0}, not {1}".format(cost_layer.grid_size, self.grid_size))
+
+        self.spatial_index = spatial_index
+
+        self.storage = storage if storage is not None else DenseStorage(self.grid_size)
+
+        # a map linking the identifier of each event in the grid to its position, kept up to date by the storage
+        self.event_positions = self.storage.event_positions
+        self.event_arrays = None  # compact arrays of identifiers and coordinates, built lazily for batch queries
+        self.expiry_queue = []  # a heap of tuples (end time, identifier) of the registered events with an end time
 
-        self.grid = []
-        for row in range(self.grid_size*2 + 1):
-            self.grid.append([None]*(self.grid_size*2 + 1))
+        self.id_digits = self.get_id_digits(self.grid_size)  # the number of digits of the formatted event ids
+
+        self.query_cache = query_cache
+
+        self.nearest_table = None  # a NearestTable answering unfiltered queries, built on demand
+
+        self.metrics = metrics
+
+        self.cost_layer = cost_layer
+        self.event_distances = None  # the distance of every position to its nearest event, built lazily for searches
+        self.stale_distances = 0  # the number of events removed since the distances were built
+
+        self.read_only = False  # true if the events of the world can not be changed, e.g. loaded from a snapshot
 
         if generate:
             self.generate_data()
 
-    def generate_data(self):
+    @property
+    def unique_identifiers(self):
+        """
+        the identifiers in use by the events of the world, which are the keys of event_positions, so they are not kept
+        in a separate set
+        :return: the map of event positions, which supports membership tests and iterates over the identifiers
+        """
+
+        return self.event_positions
+
+    def generate_data(self, number_of_events=None, seed=None):
+        """
+        a method which generates random data in the world, if a number of events or a seed is given the data is
+        generated in bulk, which is much faster for large worlds
+        :param number_of_events: optional argument, the number of events to generate, default value is None, in which
+            case a random number of events is generated
+        :param seed: optional argument, the seed of the random generator used for reproducible data, default value is
+            None
+        """
+
+        if number_of_events is None and seed is None:
+            DataGenerator.init_data(self, Event)
+        else:
+            DataGenerator.init_data_bulk(self, Event, number_of_events, seed)
+
+    def load_data(self, source, file_format=None, chunk_size=10000, max_errors=100):
+        """
+        a method which loads events from a CSV or JSONL file in chunks, invalid rows are reported instead of stopping
+        the load, see EventLoader.load
+        :param source: the path of the file or an iterable of its lines
+        :param file_format: optional argument, 'csv' or 'jsonl', default value is None, in which case the format is
+            found from the extension of the path
+        :param chunk_size: optional argument, the maximum number of events registered at once, default value is 10000
+        :param max_errors: optional argument, the maximum number of errors kept in the report, default value is 100
+        :return: a LoadReport with the number of loaded and rejected rows and the errors of the first rejected rows
+        :raises ValueError: if the format of the file is not known or the chunk size is not positive
+        :raises ReadOnlyWorldError: if the world is read-only
+        """
+
+        return EventLoader.load(self, Event, source, file_format, chunk_size, max_errors)
+
+    def precompute_nearest_positions(self, num_nearest_events=5):
+        """
+        a method which builds a table of the nearest positions with events for every position of the world, after that
+        unfiltered queries for up to num_nearest_events events are answered with a lookup, the table is refreshed when
+        the events change, suitable for small and medium worlds since it holds a list for every position
+        :param num_nearest_events: optional argument, the maximum number of nearest events answered by the table,
+            default value is 5
+        :raises ValueError: if the number of nearest events is not positive
+        """
+
+        table = NearestTable(self.grid_size, num_nearest_events)
+        table.build(dict(((x, y), self.count_events(x, y)) for x, y in set(self.event_positions.values())))
+        self.nearest_table = table
+
+    def check_writable(self):
         """
-        a method which generates random data in the world
+        a method which ensures the events of the world can be changed, called before every change
+        :raises ReadOnlyWorldError: if the world is read-only
         """
 
-        DataGenerator.init_data(self, Event)
+        if self.read_only:
+            raise ReadOnlyWorldError("The world is read-only, its events can not be changed")
 
     def get_event(self, x, y):
         """
-        a method which returns the event stored at position (x,y)
+        a method which returns the event stored at position (x,y), if there is more than one event at the position, the
+        first registered one is returned
         :param x: the x coordinate
         :param y: the y coordinate
         :return: the event at position (x, y) or None if there is no event at the position
         """
 
-        return self.grid[x + self.grid_size][y + self.grid_size]
+        events = self.storage.get_events(x, y)
+        if not events:
+            return None
+
+        return next(iter(events.values()))
+
+    def get_events(self, x, y):
+        """
+        a method which returns all events stored at position (x,y)
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: a list of the events at position (x, y) in the order they were registered, empty if there are none
+        """
+
+        events = self.storage.get_events(x, y)
+        if not events:
+            return []
+
+        return list(events.values())
 
     def register_event(self, event, i, j):
         """
-        a method to register a new event in the world
+        a method to register a new event in the world, a position can hold any number of events
         :param event: the event object to register
         :param i: the x coordinate of the event
         :param j: the y coordinate of the event
         :raises TypeError: if the event argument is not of type Event
         :raises InvalidPositionError: if the coordinates for the event are out of bounds
         :raises DuplicateIdentifierError: if the event's identifier is already in use
+        :raises ReadOnlyWorldError: if the world is read-only
         """
 
+        self.check_writable()
+
         if type(event) != Event:
             raise TypeError("Event must be an object of type Event")
 
@@ -129,15 +402,270 @@ class GridWorld(object):
         if event.identifier in self.unique_identifiers:
             raise DuplicateIdentifierError("Identifier {0} is already in use".format(event.identifier))
 
-        self.grid[j + self.grid_size][i + self.grid_size] = event
-        self.unique_identifiers.add(event.identifier)
+        event.cache_formatting(self.id_digits)
+        event.cache_price_range()
+        self.store_event(event, i, j)
+
+        if event.end_time is not None:
+            heappush(self.expiry_queue, (event.end_time, event.identifier))
+
+        if self.metrics is not None:
+            self.metrics.record_change("register")
+
+    def register_events(self, events):
+        """
+        a method to register many new events at once, all events are validated before any of them is registered, so
+        either all or none of the events are registered
+        :param events: an iterable of tuples (event, x, y)
+        :raises TypeError: if an event is not of type Event
+        :raises InvalidPositionError: if the coordinates of an event are out of bounds
+        :raises DuplicateIdentifierError: if an event's identifier is already in use or repeated in the events
+        :raises ReadOnlyWorldError: if the world is read-only
+        """
+
+        self.check_writable()
+
+        events = list(events)
+        identifiers = set()
+        for event, i, j in events:
+            if type(event) != Event:
+                raise TypeError("Event must be an object of type Event")
+
+            if not ((-1*self.grid_size) <= i <= self.grid_size and (-1*self.grid_size) <= j <= self.grid_size):
+                raise InvalidPositionError("Out of bounds coordinates when registering an event: {0}, {1}".format(i, j))
+
+            if event.identifier in self.unique_identifiers or event.identifier in identifiers:
+                raise DuplicateIdentifierError("Identifier {0} is already in use".format(event.identifier))
+            identifiers.add(event.identifier)
+
+        # the events are added to the storage directly and to the spatial index in a single call
+        storage, id_digits = self.storage, self.id_digits
+        for event, i, j in events:
+            event.cache_formatting(id_digits)
+            event.cache_price_range()
+            storage.add_event(i, j, event)
+
+            if event.end_time is not None:
+                heappush(self.expiry_queue, (event.end_time, event.identifier))
+
+        self.event_arrays = None
+        self.add_event_distances((i, j) for _, i, j in events)
+
+        if self.query_cache is not None:
+            self.query_cache.invalidate_positions((i, j) for _, i, j in events)
+
+        if self.nearest_table is not None:
+            self.nearest_table.update_positions(dict(((i, j), self.count_events(i, j)) for _, i, j in events))
+
+        if self.metrics is not None:
+            self.metrics.record_change("register", len(events))
+
+        if self.spatial_index is not None:
+            self.spatial_index.add_positions((i, j, event.price_range, event.time_range) for event, i, j in events)
+
+    def store_event(self, event, x, y):
+        """
+        a method which adds an already validated event to the storage and the indexes of the world
+        :param event: the event object to store
+        :param x: the x coordinate of the event
+        :param y: the y coordinate of the event
+        """
+
+        self.storage.add_event(x, y, event)
+        self.event_arrays = None
+        self.add_event_distances(((x, y),))
+
+        if self.spatial_index is not None:
+            self.spatial_index.add_position(x, y, event.price_range, event.time_range)
+
+        if self.query_cache is not None:
+            self.query_cache.invalidate_position(x, y)
+
+        if self.nearest_table is not None:
+            self.nearest_table.update_position(x, y, self.count_events(x, y))
+
+    def unstore_event(self, identifier):
+        """
+        a method which removes an event from the storage and the indexes of the world
+        :param identifier: the identifier of the event
+        :return: the removed event object
+        :raises UnknownIdentifierError: if there is no event with the given identifier
+        """
+
+        if identifier not in self.event_positions:
+            raise UnknownIdentifierError("There is no event with identifier {0}".format(identifier))
+
+        x, y = self.event_positions[identifier]
+        event = self.storage.remove_event(identifier)
+        self.event_arrays = None
+
+        # the distances to the nearest events can only grow, so the old distances still never overestimate them
+        self.stale_distances += 1
+
+        if self.spatial_index is not None:
+            self.spatial_index.remove_position(x, y, event.price_range, event.time_range)
+
+        if self.query_cache is not None:
+            self.query_cache.invalidate_position(x, y)
+
+        if self.nearest_table is not None:
+            self.nearest_table.update_position(x, y, self.count_events(x, y))
+
+        return event
+
+    def expire_events(self, now):
+        """
+        a method to remove all events which ended before a given time, the events are taken from a heap ordered by
+        their end times, so the cost depends on the number of expired events and not on the number of events
+        :param now: the current timestamp in seconds
+        :return: a list of the removed event objects, ordered by their end times
+        :raises ReadOnlyWorldError: if the world is read-only
+        """
+
+        self.check_writable()
+
+        expired = []
+        while len(self.expiry_queue) > 0 and self.expiry_queue[0][0] < now:
+            end_time, identifier = heappop(self.expiry_queue)
+
+            # entries of events which were removed are left in the heap and skipped here, the identifier might also
+            # be in use by a new event
+            if identifier not in self.event_positions:
+                continue
+            event, _, _ = self.get_event_by_id(identifier)
+            if event.end_time != end_time:
+                continue
+
+            expired.append(self.unstore_event(identifier))
+
+        if self.metrics is not None and len(expired) > 0:
+            self.metrics.record_change("remove", len(expired))
+
+        return expired
+
+    def get_event_by_id(self, identifier):
+        """
+        a method which returns the event with a given identifier and its position
+        :param identifier: the identifier of the event
+        :return: a tuple (event, x, y)
+        :raises UnknownIdentifierError: if there is no event with the given identifier
+        """
+
+        if identifier not in self.event_positions:
+            raise UnknownIdentifierError("There is no event with identifier {0}".format(identifier))
+
+        x, y = self.event_positions[identifier]
+        return self.storage.get_events(x, y)[identifier], x, y
+
+    def remove_event(self, identifier):
+        """
+        a method to remove an event from the world, its identifier can then be used by a new event
+        :param identifier: the identifier of the event
+        :return: the removed event object
+        :raises UnknownIdentifierError: if there is no event with the given identifier
+        :raises ReadOnlyWorldError: if the world is read-only
+        """
+
+        self.check_writable()
+
+        event = self.unstore_event(identifier)
+
+        if self.metrics is not None:
+            self.metrics.record_change("remove")
+
+        return event
+
+    def move_event(self, identifier, i, j):
+        """
+        a method to move an event to a new position, the event is placed after the events already at the position
+        :param identifier: the identifier of the event
+        :param i: the new x coordinate of the event
+        :param j: the new y coordinate of the event
+        :raises InvalidPositionError: if the new coordinates are out of bounds
+        :raises UnknownIdentifierError: if there is no event with the given identifier
+        :raises ReadOnlyWorldError: if the world is read-only
+        """
+
+        self.check_writable()
+
+        if not ((-1*self.grid_size) <= i <= self.grid_size and (-1*self.grid_size) <= j <= self.grid_size):
+            raise InvalidPositionError("Out of bounds coordinates when moving an event: {0}, {1}".format(i, j))
+
+        self.store_event(self.unstore_event(identifier), i, j)
+
+        if self.metrics is not None:
+            self.metrics.record_change("move")
+
+    def update_tickets(self, identifier, tickets):
+        """
+        a method to replace the tickets of an event, e.g. when some tickets are sold out
+        :param identifier: the identifier of the event
+        :param tickets: the container with all the new ticket prices
+        :raises InvalidPriceError: if there is a ticket price <= 0
+        :raises UnknownIdentifierError: if there is no event with the given identifier
+        :raises ReadOnlyWorldError: if the world is read-only
+        """
+
+        self.check_writable()
+
+        if not all(ticket > 0 for ticket in tickets):
+            raise InvalidPriceError("All ticket prices must be greater than 0")
+
+        event, x, y = self.get_event_by_id(identifier)
+        if self.spatial_index is not None:
+            self.spatial_index.remove_position(x, y, event.price_range, event.time_range)
+
+        event.tickets = array("d", tickets)
+        event.cache_formatting(self.id_digits)
+        event.cache_price_range()
+        self.storage.update_event(event)
+
+        if self.spatial_index is not None:
+            self.spatial_index.add_position(x, y, event.price_range, event.time_range)
+
+        if self.query_cache is not None:
+            self.query_cache.invalidate_position(x, y)
+
+        if self.metrics is not None:
+            self.metrics.record_change("update_tickets")
+
+    def count_events(self, x, y, min_price=None, max_price=None, start_time=None, end_time=None):
+        """
+        a method which returns the number of events at position (x,y), which have a ticket in a price range and are
+        happening in a time window
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :param min_price: optional argument, the minimum ticket price inclusive, default value is None
+        :param max_price: optional argument, the maximum ticket price inclusive, default value is None
+        :param start_time: optional argument, the start of the time window inclusive, default value is None
+        :param end_time: optional argument, the end of the time window inclusive, default value is None
+        :return: the number of matching events, if no price or time is given all events at the position are counted
+        """
+
+        events = self.storage.get_events(x, y)
+        if not events:
+            return 0
+
+        priced = min_price is not None or max_price is not None
+        timed = start_time is not None or end_time is not None
+        if not priced and not timed:
+            return len(events)
+
+        return sum(1 for event in events.values() if (not priced or event.has_ticket_in_range(min_price, max_price)) and
+                   (not timed or event.is_happening(start_time, end_time)))
 
-    def get_nearest_positions(self, x, y, num_nearest_events):
+    def get_nearest_positions(self, x, y, num_nearest_events, min_price=None, max_price=None, start_time=None,
+                              end_time=None):
         """
-        a method which returns the nearest positions to an input position in which there is a registered event
+        a method which returns the nearest positions to an input position in which there is a registered event, the
+        search stops as soon as the found positions hold enough events, even if it is just a few crowded positions
         :param x: the input x coordinate
         :param y: the input y coordinate
-        :param num_nearest_events: the number of nearest events to return
+        :param num_nearest_events: the number of nearest events to find
+        :param min_price: optional argument, if given only events with a ticket at this price or above are searched
+        :param max_price: optional argument, if given only events with a ticket at this price or below are searched
+        :param start_time: optional argument, if given only events which end at this time or later are searched
+        :param end_time: optional argument, if given only events which start at this time or earlier are searched
         :return: a list of points represented by a tuple (x,y) which are the nearest positions with an event
         :raises InvalidPositionError: when the input coordinates are out of bounds
         """
@@ -145,75 +673,591 @@ class GridWorld(object):
         if not ((-1*self.grid_size) <= x <= self.grid_size and (-1*self.grid_size) <= y <= self.grid_size):
             raise InvalidPositionError("Out of bounds coordinates when getting nearest events: {0}, {1}".format(x, y))
 
+        if self.metrics is not None:
+            return self.get_nearest_positions_measured(x, y, num_nearest_events, min_price, max_price, start_time,
+                                                       end_time)
+
+        if self.query_cache is None:
+            return self.search_nearest_positions(x, y, num_nearest_events, min_price, max_price, start_time, end_time)
+
+        return self.get_nearest_positions_cached(x, y, num_nearest_events, min_price, max_price, start_time, end_time)
+
+    def get_nearest_positions_measured(self, x, y, num_nearest_events, min_price=None, max_price=None, start_time=None,
+                                       end_time=None):
+        """
+        a method which answers a nearest positions query like get_nearest_positions and sends its measurements to the
+        metrics sink, the input position is assumed to be valid
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param num_nearest_events: the number of nearest events to find
+        :param min_price: optional argument, if given only events with a ticket at this price or above are searched
+        :param max_price: optional argument, if given only events with a ticket at this price or below are searched
+        :param start_time: optional argument, if given only events which end at this time or later are searched
+        :param end_time: optional argument, if given only events which start at this time or earlier are searched
+        :return: a list of points represented by a tuple (x,y) which are the nearest positions with an event
+        """
+
+        record = QueryRecord(x, y, num_nearest_events, min_price, max_price, start_time, end_time)
+        start = perf_counter()
+        if self.query_cache is None:
+            nearest_positions = self.search_nearest_positions(x, y, num_nearest_events, min_price, max_price,
+                                                              start_time, end_time, record)
+        else:
+            nearest_positions = self.get_nearest_positions_cached(x, y, num_nearest_events, min_price, max_price,
+                                                                  start_time, end_time, record)
+        record.seconds = perf_counter() - start
+
+        record.positions_found = len(nearest_positions)
+        record.events_found = sum(self.count_events(i, j, min_price, max_price, start_time, end_time)
+                                  for i, j in nearest_positions)
+        self.metrics.record_query(record)
+
+        return nearest_positions
+
+    def get_nearest_positions_cached(self, x, y, num_nearest_events, min_price=None, max_price=None, start_time=None,
+                                     end_time=None, record=None):
+        """
+        a method which answers a nearest positions query from the query cache, searching and caching the result if it
+        is not cached, the input position is assumed to be valid
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param num_nearest_events: the number of nearest events to find
+        :param min_price: optional argument, if given only events with a ticket at this price or above are searched
+        :param max_price: optional argument, if given only events with a ticket at this price or below are searched
+        :param start_time: optional argument, if given only events which end at this time or later are searched
+        :param end_time: optional argument, if given only events which start at this time or earlier are searched
+        :param record: optional argument, a QueryRecord filled with the measurements of the search, default value is
+            None
+        :return: a list of points represented by a tuple (x,y) which are the nearest positions with an event
+        """
+
+        key = (x, y, num_nearest_events, min_price, max_price, start_time, end_time)
+        if self.cost_layer is not None:
+            key += (self.cost_layer.version,)  # results computed with older travel costs are never looked up again
+        nearest_positions = self.query_cache.get(key)
+        if nearest_positions is None:
+            nearest_positions = self.search_nearest_positions(x, y, num_nearest_events, min_price, max_price,
+                                                              start_time, end_time, record)
+
+            # the result depends only on the positions up to the furthest found one, unless too few events were found
+            if num_nearest_events == 0:
+                radius = -1
+            elif self.cost_layer is not None or sum(self.count_events(i, j, min_price, max_price, start_time, end_time)
+                                                    for i, j in nearest_positions) < num_nearest_events:
+                radius = None
+            else:
+                radius = self.get_manhattan_distance(x, y, nearest_positions[-1][0], nearest_positions[-1][1])
+            self.query_cache.put(key, x, y, radius, nearest_positions)
+        elif record is not None:
+            record.method = "cache"
+
+        return list(nearest_positions)
+
+    def search_nearest_positions(self, x, y, num_nearest_events, min_price=None, max_price=None, start_time=None,
+                                 end_time=None, record=None):
+        """
+        a method which searches the nearest positions holding events, using the spatial index when there is one and
+        Breadth-First-Search otherwise, the input position is assumed to be valid
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param num_nearest_events: the number of nearest events to find
+        :param min_price: optional argument, if given only events with a ticket at this price or above are searched
+        :param max_price: optional argument, if given only events with a ticket at this price or below are searched
+        :param start_time: optional argument, if given only events which end at this time or later are searched
+        :param end_time: optional argument, if given only events which start at this time or earlier are searched
+        :param record: optional argument, a QueryRecord filled with the measurements of the search, default value is
+            None
+        :return: a list of points represented by a tuple (x,y) which are the nearest positions with an event
+        """
+
+        if self.cost_layer is not None:
+            if record is not None:
+                record.method = "astar"
+            return [position for position, _ in
+                    self.search_travel_costs(x, y, num_nearest_events, min_price, max_price, start_time, end_time,
+                                             record)]
+
+        filtered = min_price is not None or max_price is not None or start_time is not None or end_time is not None
+        if self.nearest_table is not None and not filtered and \
+                num_nearest_events <= self.nearest_table.num_nearest_events:
+            if record is not None:
+                record.method = "table"
+            return self.nearest_table.get_nearest_positions(x, y, num_nearest_events)
+
+        if self.spatial_index is not None:
+            if record is not None:
+                record.method = "index"
+            if not filtered:
+                return self.spatial_index.get_nearest_positions(x, y, num_nearest_events)
+            return self.spatial_index.get_nearest_positions(x, y, num_nearest_events, min_price, max_price,
+                                                            self.count_events, start_time, end_time)
+
+        if record is not None:
+            record.method = "bfs"
+            record.nodes_expanded, record.fringe_size, record.cells_visited = 0, 0, 0
+
         x, y = x + self.grid_size, y + self.grid_size
         nearest_positions = []
         if num_nearest_events == 0:
             return nearest_positions
 
         # check if the input coordinates contain an event
-        if self.grid[y][x] is not None:
+        num_found = self.count_events(x - self.grid_size, y - self.grid_size, min_price, max_price, start_time,
+                                       end_time)
+        if num_found > 0:
             nearest_positions.append((x - self.grid_size, y - self.grid_size))
 
-        # perform Breadth-First-Search to find the nearest events, by exploring neighbour positions
-        explored = set()
-        explored.add((x, y))
+        # perform Breadth-First-Search to find the nearest events, by exploring neighbour positions, positions are
+        # marked as discovered when added to the fringe, since checking for membership in the deque takes linear time
+        discovered = set()
+        discovered.add((x, y))
         fringe = deque()
-        while len(nearest_positions) != num_nearest_events:
-            for position in self.get_available_moves(x, y):
-                if position in explored or position in fringe:
+        while num_found < num_nearest_events:
+            for position in self.get_available_moves(x, y, self.grid_size):
+                if position in discovered:
                     continue
+                discovered.add(position)
                 fringe.append(position)
 
             if len(fringe) == 0:
                 break
 
             x, y = fringe.popleft()
-            explored.add((x, y))
-            if self.grid[y][x] is not None:
+            num_events = self.count_events(x - self.grid_size, y - self.grid_size, min_price, max_price, start_time,
+                                       end_time)
+            if num_events > 0:
                 nearest_positions.append((x - self.grid_size, y - self.grid_size))
+                num_found += num_events
+
+        if record is not None:
+            # every discovered position left the fringe and was visited, except for the ones still in the fringe, and
+            # every visited position was expanded, except for the last one if the search stopped after visiting it
+            record.fringe_size = len(fringe)
+            record.cells_visited = len(discovered) - len(fringe)
+            record.nodes_expanded = record.cells_visited - (1 if num_found >= num_nearest_events else 0)
 
         return nearest_positions
 
-    def get_nearest_events(self, x, y, num_nearest_events=5):
+    def get_travel_costs(self, x, y, num_nearest_events, min_price=None, max_price=None, start_time=None,
+                         end_time=None):
+        """
+        a method which returns the positions with the cheapest travel costs from an input position in which there is a
+        registered event, together with their travel costs
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param num_nearest_events: the number of nearest events to find
+        :param min_price: optional argument, if given only events with a ticket at this price or above are searched
+        :param max_price: optional argument, if given only events with a ticket at this price or below are searched
+        :param start_time: optional argument, if given only events which end at this time or later are searched
+        :param end_time: optional argument, if given only events which start at this time or earlier are searched
+        :return: a list of tuples ((x, y), travel cost) ordered from the cheapest travel cost, positions which can not
+            be reached because of obstacles are never returned
+        :raises InvalidPositionError: when the input coordinates are out of bounds
+        :raises ValueError: if the world has no cost layer
+        """
+
+        if not ((-1*self.grid_size) <= x <= self.grid_size and (-1*self.grid_size) <= y <= self.grid_size):
+            raise InvalidPositionError("Out of bounds coordinates when getting nearest events: {0}, {1}".format(x, y))
+
+        if self.cost_layer is None:
+            raise ValueError("The world has no travel costs")
+
+        return self.search_travel_costs(x, y, num_nearest_events, min_price, max_price, start_time, end_time)
+
+    def get_event_distances(self):
+        """
+        a method which returns the manhattan distance of every position to its nearest event, computed with a single
+        Breadth-First-Search starting from all positions with events, new events lower the distances incrementally and
+        after removed events the distances are lower bounds, which are computed again once many events were removed
+        :return: an array of distances indexed by (x + grid_size)*(2*grid_size + 1) + (y + grid_size), -1 for the
+            positions without any event
+        """
+
+        if self.event_distances is not None and self.stale_distances <= len(self.event_positions) // 4:
+            return self.event_distances
+
+        self.stale_distances = 0
+
+        side = 2*self.grid_size + 1
+        distances = array("l", [-1]) * side**2
+        fringe = deque()
+        for x, y in set(self.event_positions.values()):
+            distances[(x + self.grid_size)*side + (y + self.grid_size)] = 0
+            fringe.append((x + self.grid_size, y + self.grid_size))
+
+        while len(fringe) > 0:
+            x, y = fringe.popleft()
+            distance = distances[x*side + y] + 1
+            for i, j in ((x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)):
+                if 0 <= i < side and 0 <= j < side and distances[i*side + j] < 0:
+                    distances[i*side + j] = distance
+                    fringe.append((i, j))
+
+        self.event_distances = distances
+        return distances
+
+    def add_event_distances(self, positions):
+        """
+        a method which lowers the distances to the nearest events after new events are registered, with a
+        Breadth-First-Search starting from the new positions, which only visits the positions closer to a new event
+        than to the existing ones, nothing is done if the distances were not built yet
+        :param positions: an iterable of the positions (x, y) of the new events
+        """
+
+        distances = self.event_distances
+        if distances is None:
+            return
+
+        side = 2*self.grid_size + 1
+        fringe = deque()
+        for x, y in positions:
+            cell = (x + self.grid_size)*side + (y + self.grid_size)
+            if distances[cell] != 0:
+                distances[cell] = 0
+                fringe.append((x + self.grid_size, y + self.grid_size))
+
+        # -1 marks the positions which were not reached by any event so far
+        while len(fringe) > 0:
+            x, y = fringe.popleft()
+            distance = distances[x*side + y] + 1
+            for i, j in ((x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)):
+                if 0 <= i < side and 0 <= j < side and not 0 <= distances[i*side + j] <= distance:
+                    distances[i*side + j] = distance
+                    fringe.append((i, j))
+
+    def search_travel_costs(self, x, y, num_nearest_events, min_price=None, max_price=None, start_time=None,
+                            end_time=None, record=None):
+        """
+        a method which searches the positions with events with the cheapest travel costs with A* search, the heuristic
+        is the distance to the nearest event multiplied by the minimum cost of a position, which never overestimates the
+        travel cost to any event, so events are found in the order of their travel costs, ties are broken in the order
+        of the Breadth-First-Search, the input position is assumed to be valid
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param num_nearest_events: the number of nearest events to find
+        :param min_price: optional argument, if given only events with a ticket at this price or above are searched
+        :param max_price: optional argument, if given only events with a ticket at this price or below are searched
+        :param start_time: optional argument, if given only events which end at this time or later are searched
+        :param end_time: optional argument, if given only events which start at this time or earlier are searched
+        :param record: optional argument, a QueryRecord filled with the measurements of the search, default value is
+            None
+        :return: a list of tuples ((x, y), travel cost) ordered from the cheapest travel cost
+        """
+
+        if num_nearest_events == 0:
+            return []
+
+        grid_size, side, costs = self.grid_size, 2*self.grid_size + 1, self.cost_layer.costs
+        distances = self.get_event_distances()
+        minimum_cost = self.cost_layer.get_minimum_cost()
+        if minimum_cost == float("inf"):
+            minimum_cost = 0  # every position is an obstacle, so the search ends at the input position
+
+        found = []  # tuples (travel cost, (manhattan distance, search rank), position, number of events)
+        num_found = 0
+        last_cost = None  # the travel cost at which enough events were found
+        cheapest = {(x, y): 0}  # the cheapest known travel cost of every reached position
+        expanded = set()
+        fringe = [(0, 0, x, y)]  # a heap of tuples (travel cost + heuristic, travel cost, x, y)
+        while len(fringe) > 0:
+            # once enough events are found, only the events with the same travel cost as the last one are still needed
+            if last_cost is not None and fringe[0][0] > last_cost:
+                break
+
+            _, cost, i, j = heappop(fringe)
+            if (i, j) in expanded:
+                continue
+            expanded.add((i, j))
+
+            num_events = self.count_events(i, j, min_price, max_price, start_time, end_time)
+            if num_events > 0:
+                found.append((cost, get_search_key(x, y, i, j), (i, j), num_events))
+                num_found += num_events
+                if last_cost is None and num_found >= num_nearest_events:
+                    last_cost = cost
+
+            for i1, j1 in ((i + 1, j), (i, j + 1), (i - 1, j), (i, j - 1)):
+                if not ((-1*grid_size) <= i1 <= grid_size and (-1*grid_size) <= j1 <= grid_size):
+                    continue
+                cell = (i1 + grid_size)*side + (j1 + grid_size)
+                new_cost = cost + costs[cell]
+                if new_cost == float("inf") or new_cost >= cheapest.get((i1, j1), float("inf")):
+                    continue
+                cheapest[(i1, j1)] = new_cost
+                heappush(fringe, (new_cost + minimum_cost*distances[cell], new_cost, i1, j1))
+
+        if record is not None:
+            record.cells_visited = len(expanded)
+            record.nodes_expanded = len(expanded)
+            record.fringe_size = len(fringe)
+
+        found.sort()
+        travel_costs = []
+        num_found = 0
+        for cost, _, position, num_events in found:
+            if num_found >= num_nearest_events:
+                break
+            travel_costs.append((position, cost))
+            num_found += num_events
+
+        return travel_costs
+
+    def query_nearest_events(self, x, y, num_nearest_events=5, min_price=None, max_price=None, start_time=None,
+                             end_time=None):
+        """
+        a method to get the nearest events to an input position together with their distances, nothing is printed
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param num_nearest_events: optional argument, the number of nearest events to return, default value is 5
+        :param min_price: optional argument, if given only events with a ticket at this price or above are returned
+        :param max_price: optional argument, if given only events with a ticket at this price or below are returned
+        :param start_time: optional argument, if given only events which end at this time or later are returned
+        :param end_time: optional argument, if given only events which start at this time or earlier are returned
+        :return: a list of tuples (event, distance) ordered from the nearest to the furthest event, events at the same
+            position are ordered by registration
+        :raises InvalidPositionError: when the input coordinates are out of bounds
+        """
+
+        if self.cost_layer is not None:
+            travel_costs = self.get_travel_costs(x, y, num_nearest_events, min_price, max_price, start_time, end_time)
+        else:
+            travel_costs = [(position, self.get_manhattan_distance(x, y, position[0], position[1]))
+                            for position in self.get_nearest_positions(x, y, num_nearest_events, min_price, max_price,
+                                                                       start_time, end_time)]
+
+        nearest_events = []
+        priced = min_price is not None or max_price is not None
+        timed = start_time is not None or end_time is not None
+        for position, distance in travel_costs:
+            events = self.storage.get_events(position[0], position[1])
+            nearest_events.extend((event, distance) for event in events.values()
+                                  if (not priced or event.has_ticket_in_range(min_price, max_price)) and
+                                  (not timed or event.is_happening(start_time, end_time)))
+
+        return nearest_events[:num_nearest_events]
+
+    def get_nearest_events(self, x, y, num_nearest_events=5, min_price=None, max_price=None, start_time=None,
+                           end_time=None):
         """
         a method to get the nearest events to an input position, prints the information about each of the nearest events
         :param x: the input x coordinate
         :param y: the input y coordinate
         :param num_nearest_events: optional argument, the number of nearest events to return, default value is 5
+        :param min_price: optional argument, if given only events with a ticket at this price or above are returned
+        :param max_price: optional argument, if given only events with a ticket at this price or below are returned
+        :param start_time: optional argument, if given only events which end at this time or later are returned
+        :param end_time: optional argument, if given only events which start at this time or earlier are returned
         :return: a list of the nearest event objects
         """
 
-        nearest_positions = self.get_nearest_positions(x, y, num_nearest_events)
-        nearest_events = []
+        nearest_events = self.query_nearest_events(x, y, num_nearest_events, min_price, max_price, start_time,
+                                                   end_time)
+        ResultFormatter.write_nearest_events([(x, y, nearest_events)])
+
+        return [event for event, _ in nearest_events]
+
+    def query_upcoming_events(self, x, y, now, hours, num_nearest_events=5, min_price=None, max_price=None):
+        """
+        a method to get the nearest events to an input position which are happening at any moment within the next
+        hours, including the events which already started and did not end yet, nothing is printed
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param now: the current timestamp in seconds
+        :param hours: the number of hours after now which are searched
+        :param num_nearest_events: optional argument, the number of nearest events to return, default value is 5
+        :param min_price: optional argument, if given only events with a ticket at this price or above are returned
+        :param max_price: optional argument, if given only events with a ticket at this price or below are returned
+        :return: a list of tuples (event, distance) ordered from the nearest to the furthest event, events at the same
+            position are ordered by registration
+        :raises InvalidPositionError: when the input coordinates are out of bounds
+        :raises ValueError: if the number of hours is negative
+        """
+
+        if hours < 0:
+            raise ValueError("The number of hours must not be negative")
+
+        return self.query_nearest_events(x, y, num_nearest_events, min_price, max_price, now, now + hours*3600)
+
+    def iter_positions(self, x0, y0, x1, y1):
+        """
+        a method which generates the positions holding events in a rectangle of the world, clipped to the world bounds,
+        the spatial index is used when there is one, otherwise the storage
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :return: a generator of tuples (x, y, events), where events is the map of events at the position
+        """
+
+        x0, y0 = max(x0, -self.grid_size), max(y0, -self.grid_size)
+        x1, y1 = min(x1, self.grid_size), min(y1, self.grid_size)
+
+        if self.spatial_index is None:
+            for position in self.storage.iter_positions(x0, y0, x1, y1):
+                yield position
+        else:
+            for x, y in self.spatial_index.iter_positions(x0, y0, x1, y1):
+                yield x, y, self.storage.get_events(x, y)
+
+    def get_events_in_box(self, x0, y0, x1, y1):
+        """
+        a method which generates all events in the rectangle [x0..x1]x[y0..y1], the events are streamed, so a large
+        result is never stored in memory
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :return: a generator of tuples (event, x, y) in no particular order
+        """
+
+        for x, y, events in self.iter_positions(x0, y0, x1, y1):
+            for event in events.values():
+                yield event, x, y
+
+    def get_events_within_distance(self, x, y, radius):
+        """
+        a method which generates all events within a manhattan distance of an input position, the events are streamed,
+        so a large result is never stored in memory
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param radius: the maximum manhattan distance inclusive
+        :return: a generator of tuples (event, distance) in no particular order
+        :raises InvalidPositionError: when the input coordinates are out of bounds
+        """
+
+        if not ((-1*self.grid_size) <= x <= self.grid_size and (-1*self.grid_size) <= y <= self.grid_size):
+            raise InvalidPositionError("Out of bounds coordinates when getting events in range: {0}, {1}".format(x, y))
+
+        return self.iter_events_within_distance(x, y, radius)
+
+    def iter_events_within_distance(self, x, y, radius):
+        """
+        a generator method used by get_events_within_distance, so that the position is validated when the query is made
+        and not when the first event is requested
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param radius: the maximum manhattan distance inclusive
+        :return: a generator of tuples (event, distance) in no particular order
+        """
+
+        for event_x, event_y, events in self.iter_positions(x - radius, y - radius, x + radius, y + radius):
+            distance = self.get_manhattan_distance(x, y, event_x, event_y)
+            if distance <= radius:
+                for event in events.values():
+                    yield event, distance
+
+    def get_event_arrays(self):
+        """
+        a method which returns the events in the world as compact numpy arrays, the arrays are cached until a new event
+        is registered
+        :return: a tuple of 4 numpy arrays (identifiers, x coordinates, y coordinates, slots), aligned by index, where
+            the slot of an event is its registration order among the events at the same position
+        """
+
+        if self.event_arrays is None:
+            num_of_events = len(self.event_positions)
+            identifiers = numpy.empty(num_of_events, dtype=numpy.int64)
+            xs = numpy.empty(num_of_events, dtype=numpy.int64)
+            ys = numpy.empty(num_of_events, dtype=numpy.int64)
+            slots = numpy.empty(num_of_events, dtype=numpy.int64)
+
+            index = 0
+            for x, y in dict.fromkeys(self.event_positions.values()):
+                for slot, identifier in enumerate(self.storage.get_events(x, y)):
+                    identifiers[index], xs[index], ys[index], slots[index] = identifier, x, y, slot
+                    index += 1
+
+            self.event_arrays = identifiers, xs, ys, slots
+
+        return self.event_arrays
 
-        print("\nClosest Events to ({0},{1}):\n".format(x, y))
-        for position in nearest_positions:
-            event = self.grid[position[1] + self.grid_size][position[0] + self.grid_size]
-            nearest_events.append(event)
-            print("Event {0} - {1}, Distance {2}\n".format(event.get_id(), event.get_minimum_ticket_price(),
-                                                           self.get_manhattan_distance(x, y, position[0], position[1])))
+    def get_nearest_events_batch(self, points, num_nearest_events=5):
+        """
+        a method to get the nearest events to many input positions at once, the manhattan distances are computed with
+        numpy over the compact arrays of the events and nothing is printed, the results are the same as the ones of
+        query_nearest_events for each position, travel costs can not be vectorized, so worlds with a cost layer are not
+        supported
+        :param points: a container of input positions (x, y), e.g. a list of tuples or a numpy array of shape (n, 2)
+        :param num_nearest_events: optional argument, the number of nearest events to return, default value is 5
+        :return: a tuple of 2 numpy arrays (identifiers, distances) of shape (n, num_nearest_events), row i contains the
+            identifiers of the nearest events to point i and their manhattan distances, ordered from nearest to
+            furthest, if there are fewer events in the world both arrays are filled with -1
+        :raises ImportError: if numpy is not installed
+        :raises InvalidPositionError: if any of the input positions is out of bounds
+        :raises ValueError: if the world has a cost layer
+        """
+
+        if numpy is None:
+            raise ImportError("numpy is required for batch queries of the nearest events")
+
+        if self.cost_layer is not None:
+            raise ValueError("Batch queries use manhattan distances, use query_nearest_events for travel costs")
+
+        points = numpy.asarray(points, dtype=numpy.int64).reshape(-1, 2)
+        out_of_bounds = numpy.flatnonzero((numpy.abs(points) > self.grid_size).any(axis=1))
+        if len(out_of_bounds) > 0:
+            x, y = points[out_of_bounds[0]]
+            raise InvalidPositionError("Out of bounds coordinates when getting nearest events: {0}, {1}".format(x, y))
+
+        nearest_identifiers = numpy.full((len(points), num_nearest_events), -1, dtype=numpy.int64)
+        nearest_distances = numpy.full((len(points), num_nearest_events), -1, dtype=numpy.int64)
+
+        identifiers, xs, ys, slots = self.get_event_arrays()
+        num_found = min(num_nearest_events, len(identifiers))
+        if num_found == 0:
+            return nearest_identifiers, nearest_distances
+
+        # the search rank is smaller than 4 times the maximum distance, so (distance, rank, slot) can be packed in
+        # one key, the slot orders the events at the same position
+        key_multiplier = 4*(4*self.grid_size) + 1
+        slot_multiplier = int(slots.max()) + 1
 
-        return nearest_events
+        # process the points in chunks, so that the distance matrix stays below roughly a million entries
+        chunk_size = max(1, 2**20 // len(identifiers))
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size]
+            dx = xs[numpy.newaxis, :] - chunk[:, 0:1]
+            dy = ys[numpy.newaxis, :] - chunk[:, 1:2]
+            distances = numpy.abs(dx) + numpy.abs(dy)
+            keys = (distances*key_multiplier + get_search_ranks(dx, dy, distances))*slot_multiplier + slots
+
+            if num_found < len(identifiers):
+                candidates = numpy.argpartition(keys, num_found - 1, axis=1)[:, :num_found]
+            else:
+                candidates = numpy.broadcast_to(numpy.arange(num_found), keys.shape)
+            order = numpy.argsort(numpy.take_along_axis(keys, candidates, axis=1), axis=1)
+            candidates = numpy.take_along_axis(candidates, order, axis=1)
+
+            nearest_identifiers[start:start + len(chunk), :num_found] = identifiers[candidates]
+            nearest_distances[start:start + len(chunk), :num_found] = numpy.take_along_axis(distances, candidates,
+                                                                                            axis=1)
+
+        return nearest_identifiers, nearest_distances
 
     def pretty_print_world(self):
         """
-        a utility method which prints the 2D list representing the grid world
+        a utility method which prints the rows of the grid world
         """
 
-        for row in self.grid:
-            print(row)
+        for y in range(-self.grid_size, self.grid_size + 1):
+            print([self.storage.get_events(x, y) for x in range(-self.grid_size, self.grid_size + 1)])
 
     @staticmethod
-    def get_available_moves(x, y):
+    def get_available_moves(x, y, grid_size=None):
         """
         a method, which returns the valid moves given an input position,
         expects the posituon to be positive, that is the indices of the 2D grid
         :param x: the x coordinate of the input position
         :param y: the y coordinate of the input position
+        :param grid_size: optional argument, half of the size of the grid, default value is None, in which case the
+            grid_size class attribute is used
         :return: all the valid moves that can be made given the input position
         :raises InvalidPositionError: if the input position is out of bounds
         """
 
+        if grid_size is None:
+            grid_size = GridWorld.grid_size
+
         def valid(pos):
             """
             an inner function used to determine if a position is valid
@@ -221,7 +1265,7 @@ class GridWorld(object):
             :return: true if the position is in bounds and false otherwise
             """
 
-            return 0 <= pos[0] <= 2*GridWorld.grid_size and 0 <= pos[1] <= 2*GridWorld.grid_size
+            return 0 <= pos[0] <= 2*grid_size and 0 <= pos[1] <= 2*grid_size
 
         # check for invalid input position
         if not valid((x, y)):
@@ -233,6 +1277,16 @@ class GridWorld(object):
         # return only those moves that are valid
         return (position for position in positions if valid(position))
 
+    @staticmethod
+    def get_id_digits(grid_size):
+        """
+        a static method, which computes the number of digits of the formatted event ids in a world of a given size
+        :param grid_size: half of the size of the grid
+        :return: the number of digits of the area of the world, which is the maximum number of events
+        """
+
+        return int(log((grid_size*2 + 1)**2, 10)) + 1
+
     @staticmethod
     def get_manhattan_distance(x0, y0, x1, y1):
         """
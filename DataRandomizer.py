@@ -1,4 +1,10 @@
-from random import randint, uniform
+from random import randint, uniform, Random
+import gc
+
+try:
+    import numpy
+except ImportError:  # numpy is only needed to speed up the bulk generation of tickets
+    numpy = None
 
 
 class DataGenerator(object):
@@ -84,3 +90,79 @@ class DataGenerator(object):
             event = data_type(i, DataGenerator.generate_event_tickets())
             # register the event
             world.register_event(event, x, y)
+
+    @staticmethod
+    def generate_tickets_bulk(number_of_events, random):
+        """
+        a static method, which generates the collections of unique ticket prices for many events at once, with numpy
+        all prices are generated in one vectorized pass
+        :param number_of_events: the number of events to generate tickets for
+        :param random: the Random object used as a source of randomness, so that the result is reproducible
+        :return: a list of tuples of unique ticket prices, one tuple for each event
+        """
+
+        # prices are generated in cents, so that they are rounded to 2 digits after the decimal point
+        min_cents = int(round(DataGenerator.min_ticket_price*100))
+        max_cents = int(round(DataGenerator.max_ticket_price*100))
+        max_num_of_tickets = DataGenerator.max_num_of_tickers + 1  # the same bound as in generate_event_tickets
+
+        if numpy is None:
+            all_cents = range(min_cents, max_cents + 1)
+            return [tuple(cents / 100 for cents in random.sample(all_cents, random.randint(0, max_num_of_tickets)))
+                    for _ in range(number_of_events)]
+
+        generator = numpy.random.default_rng(random.getrandbits(64))
+        counts = generator.integers(0, max_num_of_tickets + 1, size=number_of_events)
+        offsets = numpy.concatenate(([0], numpy.cumsum(counts)))
+        owners = numpy.repeat(numpy.arange(number_of_events), counts)
+        cents = generator.integers(min_cents, max_cents + 1, size=int(offsets[-1]))
+
+        # redraw the prices which are repeated within the same event, until all prices of an event are unique
+        while True:
+            keys = owners*(max_cents + 1) + cents
+            order = numpy.argsort(keys)
+            sorted_keys = keys[order]
+            repeated = sorted_keys[1:] == sorted_keys[:-1]
+            if not repeated.any():
+                break
+            redrawn = order[1:][repeated]
+            cents[redrawn] = generator.integers(min_cents, max_cents + 1, size=len(redrawn))
+
+        prices = (cents / 100).tolist()
+        offsets = offsets.tolist()
+        return [tuple(prices[offsets[i]:offsets[i + 1]]) for i in range(number_of_events)]
+
+    @staticmethod
+    def init_data_bulk(world, data_type, number_of_events=None, seed=None):
+        """
+        this is a faster alternative to init_data, which samples all positions without replacement, generates all
+        tickets in one pass and registers all events with a single call, suitable for worlds with millions of events
+        :param world: the reference to the GridWorld object
+        :param data_type: this is the type of data stored in the grid world, in the simulation Event should be used,
+            since the world contains Event objects
+        :param number_of_events: optional argument, the number of events to generate, default value is None, in which
+            case a random number of events between 1 and the area of the world is generated
+        :param seed: optional argument, the seed of the random generator, runs with the same seed generate the same
+            data, default value is None
+        :raises ValueError: if the number of events is greater than the area of the world
+        """
+
+        random = Random(seed)
+        side = world.grid_size*2 + 1
+
+        if number_of_events is None:
+            number_of_events = random.randint(1, side**2)
+
+        # the garbage collector is paused, since it would repeatedly scan the millions of new objects for no gain
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            # each position of the world is numbered, so that unique positions are sampled without rejections
+            positions = random.sample(range(side**2), number_of_events)
+            tickets = DataGenerator.generate_tickets_bulk(number_of_events, random)
+
+            world.register_events((data_type(i, tickets[i]), position % side - world.grid_size,
+                                   position // side - world.grid_size) for i, position in enumerate(positions))
+        finally:
+            if gc_enabled:
+                gc.enable()
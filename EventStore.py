@@ -0,0 +1,523 @@
+from DataModel import GridWorld, Event
+from WorldStorage import WorldStorage
+from array import array
+
+
+class RowMap(object):
+    """
+    this class represents a map linking integer keys to the rows of events, the keys and rows are kept in two typed
+    arrays with open addressing instead of a dictionary, which would hold two integer objects for every entry
+    """
+
+    multiplier = 11400714819323198485  # 2**64 divided by the golden ratio, spreads consecutive keys over the table
+
+    def __init__(self, capacity=8):
+        """
+        constructor for a RowMap object
+        :param capacity: optional argument, the initial number of slots, a power of 2, default value is 8
+        """
+
+        self.keys = array("q", [0])*capacity
+        self.rows = array("i", [-1])*capacity  # -1 marks an empty slot
+        self.size = 0
+
+    def __len__(self):
+        """
+        the number of keys in the map
+        """
+
+        return self.size
+
+    def __contains__(self, key):
+        """
+        a method which checks if a key is in the map
+        :param key: the integer key
+        :return: true if the key is in the map and false otherwise
+        """
+
+        return self.rows[self.find_slot(key)] != -1
+
+    def get_home(self, key):
+        """
+        a method which returns the slot where the search for a key starts
+        :param key: the integer key
+        :return: the first slot probed for the key
+        """
+
+        return ((key*self.multiplier) & 0xFFFFFFFFFFFFFFFF) >> (65 - len(self.rows).bit_length())
+
+    def find_slot(self, key):
+        """
+        a method which finds the slot of a key by probing the slots after its home slot
+        :param key: the integer key
+        :return: the slot holding the key or the empty slot where it would be added
+        """
+
+        keys, rows = self.keys, self.rows
+        mask = len(rows) - 1
+        slot = self.get_home(key)
+        while rows[slot] != -1 and keys[slot] != key:
+            slot = (slot + 1) & mask
+
+        return slot
+
+    def get(self, key):
+        """
+        a method which returns the row of a key
+        :param key: the integer key
+        :return: the row of the key or None if the key is not in the map
+        """
+
+        row = self.rows[self.find_slot(key)]
+        return None if row == -1 else row
+
+    def __getitem__(self, key):
+        """
+        a method which returns the row of a key
+        :param key: the integer key
+        :return: the row of the key
+        :raises KeyError: if the key is not in the map
+        """
+
+        row = self.rows[self.find_slot(key)]
+        if row == -1:
+            raise KeyError(key)
+
+        return row
+
+    def __setitem__(self, key, row):
+        """
+        a method which links a key to a row, the slots are doubled once more than two thirds of them are used
+        :param key: the integer key
+        :param row: the row, a non-negative integer
+        """
+
+        slot = self.find_slot(key)
+        if self.rows[slot] == -1:
+            self.keys[slot] = key
+            self.size += 1
+        self.rows[slot] = row
+
+        if 3*self.size > 2*len(self.rows):
+            self.resize(2*len(self.rows))
+
+    def pop(self, key):
+        """
+        a method which removes a key, the following keys of its probe sequence are shifted back, so that no searches
+        pass through removed slots, the slots are halved once fewer than an eighth of them are used
+        :param key: the integer key
+        :return: the row of the removed key
+        :raises KeyError: if the key is not in the map
+        """
+
+        keys, rows = self.keys, self.rows
+        mask = len(rows) - 1
+        hole = self.find_slot(key)
+        row = rows[hole]
+        if row == -1:
+            raise KeyError(key)
+
+        rows[hole] = -1
+        self.size -= 1
+
+        slot = (hole + 1) & mask
+        while rows[slot] != -1:
+            # a key can fill the hole if the hole is between its home slot and its slot
+            if (slot - self.get_home(keys[slot])) & mask >= (slot - hole) & mask:
+                keys[hole], rows[hole] = keys[slot], rows[slot]
+                rows[slot] = -1
+                hole = slot
+            slot = (slot + 1) & mask
+
+        if 8*self.size < len(rows) and len(rows) > 8:
+            self.resize(len(rows) // 2)
+
+        return row
+
+    def resize(self, capacity):
+        """
+        a method which moves the keys to a new number of slots
+        :param capacity: the new number of slots, a power of 2
+        """
+
+        keys, rows = self.keys, self.rows
+        self.keys = array("q", [0])*capacity
+        self.rows = array("i", [-1])*capacity
+        self.size = 0
+        for slot in range(len(rows)):
+            if rows[slot] != -1:
+                self[keys[slot]] = rows[slot]
+
+
+class ColumnarEventPositions(object):
+    """
+    this class represents a read-only map linking the identifiers of the events in a ColumnarStorage to their positions,
+    the positions are decoded from the rows of the events instead of being kept in tuples
+    """
+
+    def __init__(self, storage):
+        """
+        constructor for a ColumnarEventPositions object
+        :param storage: the ColumnarStorage object
+        """
+
+        self.storage = storage
+
+    def __len__(self):
+        """
+        the number of events in the storage
+        """
+
+        return len(self.storage.rows)
+
+    def __contains__(self, identifier):
+        """
+        a method which checks if there is an event with a given identifier
+        :param identifier: the identifier of the event
+        :return: true if there is an event with the identifier and false otherwise
+        """
+
+        return identifier in self.storage.rows
+
+    def __getitem__(self, identifier):
+        """
+        a method which returns the position of an event
+        :param identifier: the identifier of the event
+        :return: a tuple (x, y) with the position of the event
+        :raises KeyError: if there is no event with the identifier
+        """
+
+        return self.storage.get_position(self.storage.rows[identifier])
+
+    def __iter__(self):
+        """
+        a method which generates the identifiers of all events in the storage
+        :return: an iterator of the identifiers, in the order of the rows of the events
+        """
+
+        return self.keys()
+
+    def keys(self):
+        """
+        a method which generates the identifiers of all events in the storage
+        :return: an iterator of the identifiers, in the same order as values
+        """
+
+        return (self.storage.identifiers[row] for row in self.storage.iter_rows())
+
+    def values(self):
+        """
+        a method which generates the positions of all events in the storage
+        :return: an iterator of tuples (x, y), in the same order as keys
+        """
+
+        return map(self.storage.get_position, self.storage.iter_rows())
+
+    def items(self):
+        """
+        a method which generates the identifiers and positions of all events in the storage
+        :return: an iterator of tuples (identifier, (x, y)), in the order of the rows of the events
+        """
+
+        return zip(self.keys(), self.values())
+
+
+class ColumnarStorage(WorldStorage):
+    """
+    this class represents a storage, which keeps the events in typed arrays with a row for every event instead of
+    keeping event objects, the identifiers, positions, ticket offsets, prices and time windows are columns of 4 and 8
+    byte numbers and the rows are found with two RowMap objects, so no Python object is kept for an event
+
+    an event object is created as a view of its row every time the event is accessed, so changing the returned object
+    doesn't change the stored event, the events are changed with the methods of the world
+
+    the prices are kept as whole cents in 4 byte integers, which is exact for prices with at most 2 digits after the
+    decimal point such as the generated and loaded ones, once a price with more digits is stored all prices are
+    converted to doubles
+    """
+
+    max_cents = 2**31 - 1  # the largest number of cents which fits in a 4 byte integer
+
+    def __init__(self, grid_size):
+        """
+        constructor for a ColumnarStorage object
+        :param grid_size: half of the size of the grid, e.g. if this is 10, world is in range [-10, 10]
+        """
+
+        self.grid_size = grid_size
+        self.id_digits = GridWorld.get_id_digits(grid_size)  # the number of digits of the formatted event ids
+
+        # the columns of the events, the rows of removed events are reused by new events
+        self.identifiers = array("q")
+        self.cells = array("q")  # the position of every event encoded as its cell in the grid, -1 for removed events
+        self.next_rows = array("i")  # the next row at the same position or among the removed rows, -1 at the end
+        self.ticket_offsets = array("q")  # the offset of the first price of every event
+        self.ticket_counts = array("i")
+
+        # the start and end times of the events, NaN if an event has no start or end, both are None until an event
+        # with a time window is stored
+        self.start_times = None
+        self.end_times = None
+
+        self.prices = array("i")  # the ticket prices of all events, in cents until a price is not a whole cent
+        self.unused_prices = 0  # the number of prices of removed events or replaced tickets, dropped when compacted
+
+        self.free_row = -1  # the first of the rows of removed events, linked by next_rows
+        self.rows = RowMap()  # a map linking the identifier of each event to its row
+        self.heads = RowMap()  # a map linking the cell of each position holding events to the row of its first event
+
+        self.event_positions = ColumnarEventPositions(self)
+
+    def get_memory_size(self):
+        """
+        a method which returns the memory of the columns and the row maps of the storage
+        :return: the size of the arrays in bytes
+        """
+
+        arrays = [self.identifiers, self.cells, self.next_rows, self.ticket_offsets, self.ticket_counts, self.prices,
+                  self.rows.keys, self.rows.rows, self.heads.keys, self.heads.rows]
+        if self.start_times is not None:
+            arrays += [self.start_times, self.end_times]
+
+        return sum(column.itemsize * len(column) for column in arrays)
+
+    def get_cell(self, x, y):
+        """
+        a method which encodes a position as its cell in a grid of the world, row by row
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: the integer cell of the position
+        """
+
+        return (y + self.grid_size)*(2*self.grid_size + 1) + x + self.grid_size
+
+    def get_position(self, row):
+        """
+        a method which returns the position of the event at a given row
+        :param row: the row of the event
+        :return: a tuple (x, y) with the position of the event
+        """
+
+        y, x = divmod(self.cells[row], 2*self.grid_size + 1)
+        return x - self.grid_size, y - self.grid_size
+
+    def iter_rows(self):
+        """
+        a method which generates the rows of the stored events
+        :return: a generator of the rows, in increasing order
+        """
+
+        cells = self.cells
+        return (row for row in range(len(cells)) if cells[row] != -1)
+
+    def create_event(self, row):
+        """
+        a method which creates an event object from the row of an event
+        :param row: the row of the event
+        :return: a new Event object with cached formatting and price range
+        """
+
+        offset = self.ticket_offsets[row]
+        tickets = self.prices[offset:offset + self.ticket_counts[row]]
+        if tickets.typecode == "i":
+            tickets = [cents / 100 for cents in tickets]
+
+        start_time = end_time = None
+        if self.start_times is not None:
+            start_time, end_time = self.start_times[row], self.end_times[row]
+            start_time = None if start_time != start_time else start_time  # NaN
+            end_time = None if end_time != end_time else end_time
+
+        event = Event(self.identifiers[row], tickets, start_time, end_time)
+        event.cache_formatting(self.id_digits)
+        event.cache_price_range()
+
+        return event
+
+    def get_events(self, x, y):
+        """
+        a method which returns the map of events stored at position (x,y)
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: a map linking the identifiers of the events at position (x, y) to new event objects, in the order they
+            were stored, or None if there are no events at the position
+        """
+
+        if not (-self.grid_size <= x <= self.grid_size and -self.grid_size <= y <= self.grid_size):
+            return None
+
+        row = self.heads.get(self.get_cell(x, y))
+        if row is None:
+            return None
+
+        events = {}
+        while row != -1:
+            events[self.identifiers[row]] = self.create_event(row)
+            row = self.next_rows[row]
+
+        return events
+
+    def set_events(self, x, y, events):
+        """
+        a method which stores the map of events at position (x,y), replacing any events already stored there
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :param events: the map of events to store or None to clear the position
+        """
+
+        for identifier in list(self.get_events(x, y) or ()):
+            self.remove_event(identifier)
+
+        for event in (events or {}).values():
+            self.add_event(x, y, event)
+
+    def iter_positions(self, x0, y0, x1, y1):
+        """
+        a method which generates the positions holding events in a rectangle of the world, the cells of the rectangle
+        are visited if there are fewer of them than events
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :return: a generator of tuples (x, y, events) for each position in the rectangle holding events
+        """
+
+        x0, y0 = max(x0, -self.grid_size), max(y0, -self.grid_size)
+        x1, y1 = min(x1, self.grid_size), min(y1, self.grid_size)
+        if x0 > x1 or y0 > y1:
+            return
+
+        if (x1 - x0 + 1)*(y1 - y0 + 1) > len(self.rows):
+            positions = dict.fromkeys(self.get_position(row) for row in self.iter_rows())
+            positions = [(x, y) for x, y in positions if x0 <= x <= x1 and y0 <= y <= y1]
+        else:
+            positions = [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)
+                         if self.get_cell(x, y) in self.heads]
+
+        for x, y in positions:
+            yield x, y, self.get_events(x, y)
+
+    def add_event(self, x, y, event):
+        """
+        a method which stores an event at position (x,y) after the events already stored there
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :param event: the event object to store, which is copied into the columns
+        """
+
+        if event.identifier in self.rows:
+            self.remove_event(event.identifier)
+
+        if self.start_times is None and (event.start_time is not None or event.end_time is not None):
+            self.start_times = array("d", [float("nan")])*len(self.identifiers)
+            self.end_times = array("d", [float("nan")])*len(self.identifiers)
+
+        row = self.free_row
+        if row == -1:
+            row = len(self.identifiers)
+            for column in (self.identifiers, self.cells, self.next_rows, self.ticket_offsets, self.ticket_counts):
+                column.append(0)
+            if self.start_times is not None:
+                self.start_times.append(0.0)
+                self.end_times.append(0.0)
+        else:
+            self.free_row = self.next_rows[row]
+
+        cell = self.get_cell(x, y)
+        self.identifiers[row] = event.identifier
+        self.cells[row] = cell
+        self.next_rows[row] = -1
+        if self.start_times is not None:
+            self.start_times[row] = float("nan") if event.start_time is None else event.start_time
+            self.end_times[row] = float("nan") if event.end_time is None else event.end_time
+        self.write_tickets(row, event.tickets)
+        self.rows[event.identifier] = row
+
+        # the event is linked after the last event at its position
+        last_row = self.heads.get(cell)
+        if last_row is None:
+            self.heads[cell] = row
+        else:
+            while self.next_rows[last_row] != -1:
+                last_row = self.next_rows[last_row]
+            self.next_rows[last_row] = row
+
+    def remove_event(self, identifier):
+        """
+        a method which removes a stored event, its row is reused by the next stored event
+        :param identifier: the identifier of the event
+        :return: the removed event object
+        :raises KeyError: if there is no stored event with the given identifier
+        """
+
+        row = self.rows.pop(identifier)
+        event = self.create_event(row)
+
+        # the event is unlinked from the events at its position
+        cell = self.cells[row]
+        previous_row = self.heads[cell]
+        if previous_row == row:
+            if self.next_rows[row] == -1:
+                self.heads.pop(cell)
+            else:
+                self.heads[cell] = self.next_rows[row]
+        else:
+            while self.next_rows[previous_row] != row:
+                previous_row = self.next_rows[previous_row]
+            self.next_rows[previous_row] = self.next_rows[row]
+
+        self.unused_prices += self.ticket_counts[row]
+        self.ticket_counts[row] = 0
+        self.cells[row] = -1
+        self.next_rows[row] = self.free_row
+        self.free_row = row
+        self.compact_prices()
+
+        return event
+
+    def update_event(self, event):
+        """
+        a method which writes the tickets of a stored event back to its row after they were replaced
+        :param event: the changed event object
+        """
+
+        row = self.rows[event.identifier]
+        self.unused_prices += self.ticket_counts[row]
+        self.write_tickets(row, event.tickets)
+        self.compact_prices()
+
+    def write_tickets(self, row, tickets):
+        """
+        a method which appends the ticket prices of an event to the prices and points the row of the event at them
+        :param row: the row of the event
+        :param tickets: the container with all the ticket prices
+        """
+
+        prices = tickets
+        if self.prices.typecode == "i":
+            prices = [int(round(price*100)) for price in tickets]
+            if not all(cents <= self.max_cents and cents / 100 == price for cents, price in zip(prices, tickets)):
+                # a price is not a whole number of cents, so all prices are kept as doubles from now on
+                self.prices = array("d", [cents / 100 for cents in self.prices])
+                prices = tickets
+
+        self.ticket_offsets[row] = len(self.prices)
+        self.ticket_counts[row] = len(tickets)
+        self.prices.extend(prices)
+
+    def compact_prices(self):
+        """
+        a method which drops the unused prices once they are more than half of all prices
+        """
+
+        if self.unused_prices <= len(self.prices) // 2:
+            return
+
+        prices = array(self.prices.typecode)
+        for row in self.iter_rows():
+            offset = self.ticket_offsets[row]
+            self.ticket_offsets[row] = len(prices)
+            prices.extend(self.prices[offset:offset + self.ticket_counts[row]])
+
+        self.prices = prices
+        self.unused_prices = 0
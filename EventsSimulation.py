@@ -1,13 +1,26 @@
 from DataModel import GridWorld
 from CustomErrors import InvalidPositionError
+from SpatialIndex import BucketGridIndex
+from WorldSnapshot import WorldSnapshot
+import os
+import sys
 
 
-def main():
+def main(snapshot_path=None):
     """
     a main method, which runs the simulation
+    :param snapshot_path: optional argument, the path of a snapshot file, if the file exists the world is loaded from
+        it, otherwise a new world is generated and saved to it, default value is None, in which case a new world is
+        generated and not saved
     """
 
-    world = GridWorld(generate=True)  # creates a grid world with randomly generated data
+    if snapshot_path is not None and os.path.exists(snapshot_path):
+        world = WorldSnapshot.load(snapshot_path)
+    else:
+        # creates a grid world with randomly generated data, indexed so that empty positions are not explored
+        world = GridWorld(generate=True, spatial_index=BucketGridIndex())
+        if snapshot_path is not None:
+            WorldSnapshot.save(world, snapshot_path)
 
     while True:
         input_pos = input("Please Input Coordinates:\n\n")
@@ -26,4 +39,4 @@ def main():
             print("Out of bounds coordinates, please enter coordinates between {0} and {1} inclusive".format(-1*world.grid_size, world.grid_size))
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
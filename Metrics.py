@@ -0,0 +1,159 @@
+from collections import deque
+
+
+class QueryRecord(object):
+    """
+    this class represents the measurements of a single nearest positions query, the search related measurements are
+    None when the query was not answered by Breadth-First-Search or A* search
+    """
+
+    def __init__(self, x, y, num_nearest_events, min_price=None, max_price=None, start_time=None, end_time=None):
+        """
+        constructor for a QueryRecord object
+        :param x: the input x coordinate of the query
+        :param y: the input y coordinate of the query
+        :param num_nearest_events: the number of nearest events of the query
+        :param min_price: optional argument, the minimum price of the query, default value is None
+        :param max_price: optional argument, the maximum price of the query, default value is None
+        :param start_time: optional argument, the start of the time window of the query, default value is None
+        :param end_time: optional argument, the end of the time window of the query, default value is None
+        """
+
+        self.x = x
+        self.y = y
+        self.num_nearest_events = num_nearest_events
+        self.min_price = min_price
+        self.max_price = max_price
+        self.start_time = start_time
+        self.end_time = end_time
+
+        self.method = None  # 'cache', 'table', 'index', 'bfs' or 'astar', the way the query was answered
+        self.nodes_expanded = None  # the number of positions whose neighbours were added to the fringe
+        self.fringe_size = None  # the number of positions left in the fringe when the search stopped
+        self.cells_visited = None  # the number of positions whose events were counted
+
+        self.positions_found = 0  # the number of returned positions
+        self.events_found = 0  # the number of matching events in the returned positions
+        self.seconds = 0.0  # the wall time of the query
+
+    def to_dict(self):
+        """
+        :return: a dictionary with all measurements of the query, e.g. to be encoded as JSON
+        """
+
+        return {"x": self.x, "y": self.y, "num_nearest_events": self.num_nearest_events, "min_price": self.min_price,
+                "max_price": self.max_price, "start_time": self.start_time, "end_time": self.end_time,
+                "method": self.method, "nodes_expanded": self.nodes_expanded,
+                "fringe_size": self.fringe_size, "cells_visited": self.cells_visited,
+                "positions_found": self.positions_found, "events_found": self.events_found, "seconds": self.seconds}
+
+
+class MetricsSink(object):
+    """
+    this class represents the interface of a metrics sink, which can be plugged into a GridWorld in order to receive
+    measurements of its queries and changes, the methods do nothing by default
+    """
+
+    def record_query(self, record):
+        """
+        a method called after every nearest positions query
+        :param record: the QueryRecord of the query
+        """
+
+        pass
+
+    def record_change(self, kind, count=1):
+        """
+        a method called after every change of the events of the world
+        :param kind: 'register', 'remove', 'move' or 'update_tickets'
+        :param count: optional argument, the number of changed events, default value is 1
+        """
+
+        pass
+
+
+class CallbackSink(MetricsSink):
+    """
+    this class represents a metrics sink passing the measurements to callback functions, e.g. to forward them to an
+    external monitoring system
+    """
+
+    def __init__(self, on_query=None, on_change=None):
+        """
+        constructor for a CallbackSink object
+        :param on_query: optional argument, a function called with the QueryRecord of every query, default value is None
+        :param on_change: optional argument, a function called with the kind and the number of changed events of every
+            change, default value is None
+        """
+
+        self.on_query = on_query
+        self.on_change = on_change
+
+    def record_query(self, record):
+        """
+        a method called after every nearest positions query
+        :param record: the QueryRecord of the query
+        """
+
+        if self.on_query is not None:
+            self.on_query(record)
+
+    def record_change(self, kind, count=1):
+        """
+        a method called after every change of the events of the world
+        :param kind: 'register', 'remove', 'move' or 'update_tickets'
+        :param count: optional argument, the number of changed events, default value is 1
+        """
+
+        if self.on_change is not None:
+            self.on_change(kind, count)
+
+
+class MetricsCollector(MetricsSink):
+    """
+    this class represents a metrics sink keeping cumulative counters and the records of the most recent queries
+    """
+
+    def __init__(self, max_records=1000):
+        """
+        constructor for a MetricsCollector object
+        :param max_records: optional argument, the number of most recent query records kept, default value is 1000
+        """
+
+        self.records = deque(maxlen=max_records)
+        self.num_queries = 0
+        self.query_seconds = 0.0
+        self.nodes_expanded = 0
+        self.queries_by_method = {}  # a map linking each way of answering queries to the number of such queries
+        self.changes = {}  # a map linking each kind of change to the number of changed events
+
+    def record_query(self, record):
+        """
+        a method called after every nearest positions query
+        :param record: the QueryRecord of the query
+        """
+
+        self.records.append(record)
+        self.num_queries += 1
+        self.query_seconds += record.seconds
+        if record.nodes_expanded is not None:
+            self.nodes_expanded += record.nodes_expanded
+        self.queries_by_method[record.method] = self.queries_by_method.get(record.method, 0) + 1
+
+    def record_change(self, kind, count=1):
+        """
+        a method called after every change of the events of the world
+        :param kind: 'register', 'remove', 'move' or 'update_tickets'
+        :param count: optional argument, the number of changed events, default value is 1
+        """
+
+        self.changes[kind] = self.changes.get(kind, 0) + count
+
+    def get_slowest_queries(self, num_queries=10):
+        """
+        a method which returns the slowest of the most recent queries
+        :param num_queries: optional argument, the number of returned records, default value is 10
+        :return: a list of QueryRecord objects ordered from the slowest
+        """
+
+        return sorted(self.records, key=lambda record: record.seconds, reverse=True)[:num_queries]
@@ -0,0 +1,251 @@
+from SpatialIndex import get_search_key
+from bisect import bisect_left
+
+
+class NearestTable(object):
+    """
+    this class represents a table holding the nearest positions with events for every position of a world, so that
+    unfiltered nearest positions queries are answered with a lookup instead of a search
+
+    every position keeps all positions with events up to the distance at which the number of events reaches the size of
+    the table (including all positions tied at that distance), the lists are built in a single pass propagating every
+    position with events outwards at the same time, layer by layer, and a position is only propagated further from the
+    positions which keep it, since any position on a shortest path from a position to one of its kept positions keeps
+    it too
+    """
+
+    def __init__(self, grid_size, num_nearest_events=5):
+        """
+        constructor for a NearestTable object
+        :param grid_size: the grid size of the world, coordinates are in the range [-grid_size, grid_size]
+        :param num_nearest_events: optional argument, the maximum number of nearest events answered by the table,
+            default value is 5
+        :raises ValueError: if the number of nearest events is not positive
+        """
+
+        if num_nearest_events <= 0:
+            raise ValueError("The number of nearest events of the table must be greater than 0")
+
+        self.grid_size = grid_size
+        self.num_nearest_events = num_nearest_events
+        self.side = 2*grid_size + 1
+
+        self.event_counts = {}  # a map linking each position with events to its number of events
+
+        cells = self.side**2
+        self.entries = [[] for _ in range(cells)]  # the kept tuples (distance, x, y) of each position
+        self.found = [0] * cells  # the number of events in the kept positions of each position
+        self.radius = [-1] * cells  # the distance at which enough events are found or -1 if not yet found
+
+        self.positions = [() for _ in range(cells)]  # the kept positions of each position in search order
+        self.cumulative_counts = [() for _ in range(cells)]  # the running totals of events along the kept positions
+
+    def get_cell(self, x, y):
+        """
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :return: the index of the position in the flat lists of the table
+        """
+
+        return (x + self.grid_size)*self.side + (y + self.grid_size)
+
+    def build(self, event_counts):
+        """
+        a method which fills the table from scratch
+        :param event_counts: a map linking each position with events to its number of events
+        """
+
+        self.event_counts = dict((position, count) for position, count in event_counts.items() if count > 0)
+
+        cells = self.side**2
+        self.entries = [[] for _ in range(cells)]
+        self.found = [0] * cells
+        self.radius = [-1] * cells
+
+        self.propagate([(0, x, y, x, y) for x, y in self.event_counts])
+        self.finish(range(cells))
+
+    def update_position(self, x, y, count):
+        """
+        a method which refreshes the positions whose kept positions can change when the number of events at a position
+        changes, the rest of the table is left untouched
+        :param x: the x coordinate of the changed position
+        :param y: the y coordinate of the changed position
+        :param count: the new number of events at the position
+        """
+
+        if count > 0:
+            self.event_counts[(x, y)] = count
+        else:
+            self.event_counts.pop((x, y), None)
+
+        # the affected positions are the ones which keep the changed position or would keep it, they are connected
+        region = set()
+        fringe = [(x, y)]
+        grid_size = self.grid_size
+        while len(fringe) > 0:
+            i, j = fringe.pop()
+            cell = self.get_cell(i, j)
+            if cell in region:
+                continue
+            radius = self.radius[cell]
+            if radius >= 0 and abs(i - x) + abs(j - y) > radius:
+                continue
+
+            region.add(cell)
+            for i1, j1 in ((i + 1, j), (i - 1, j), (i, j + 1), (i, j - 1)):
+                if -grid_size <= i1 <= grid_size and -grid_size <= j1 <= grid_size:
+                    fringe.append((i1, j1))
+
+        self.refresh(region)
+
+    def update_positions(self, event_counts):
+        """
+        a method which refreshes the table after the numbers of events at many positions change, the table is built
+        again if the changes are too many to refresh them one by one
+        :param event_counts: a map linking each changed position to its new number of events
+        """
+
+        if len(event_counts) * 4 > len(self.event_counts) + 16:
+            counts = dict(self.event_counts)
+            counts.update(event_counts)
+            self.build(counts)
+            return
+
+        for (x, y), count in event_counts.items():
+            self.update_position(x, y, count)
+
+    def refresh(self, region):
+        """
+        a method which builds again the kept positions of a region of positions, the positions around the region are
+        assumed to be correct and their kept positions are propagated into the region
+        :param region: a set of indexes of the refreshed positions
+        """
+
+        side, grid_size = self.side, self.grid_size
+        for cell in region:
+            self.entries[cell] = []
+            self.found[cell] = 0
+            self.radius[cell] = -1
+
+        seeds = []
+        for cell in region:
+            x, y = cell // side - grid_size, cell % side - grid_size
+            if (x, y) in self.event_counts:
+                seeds.append((0, x, y, x, y))
+
+            for i, j in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if not (-grid_size <= i <= grid_size and -grid_size <= j <= grid_size):
+                    continue
+                neighbour = self.get_cell(i, j)
+                if neighbour in region:
+                    continue
+                # a kept position enters the region only from the neighbour preceding the cell on its propagation path
+                for distance, sx, sy in self.entries[neighbour]:
+                    if self.get_parent(x, y, sx, sy) == (i, j):
+                        seeds.append((distance + 1, x, y, sx, sy))
+
+        self.propagate(seeds, region)
+        self.finish(region)
+
+    @staticmethod
+    def get_parent(x, y, sx, sy):
+        """
+        a static method, which returns the position from which a propagated position reaches a position, positions are
+        propagated along the y axis first and then along the x axis, so that every position is reached only once
+        :param x: the x coordinate of the reached position
+        :param y: the y coordinate of the reached position
+        :param sx: the x coordinate of the propagated position
+        :param sy: the y coordinate of the propagated position
+        :return: a point represented by a tuple (x, y) or None if the two positions are the same
+        """
+
+        if x != sx:
+            return (x - 1, y) if x > sx else (x + 1, y)
+        if y != sy:
+            return (x, y - 1) if y > sy else (x, y + 1)
+        return None
+
+    def propagate(self, seeds, region=None):
+        """
+        a method which propagates positions with events outwards in the order of their distance, a position is kept
+        by every reached position which has not found enough events at a smaller distance
+        :param seeds: a list of tuples (distance, x, y, source x, source y) of the initially reached positions
+        :param region: optional argument, a set of indexes of the positions which can be changed, default value is None,
+            in which case all positions can be changed
+        """
+
+        layers = {}
+        for seed in seeds:
+            layers.setdefault(seed[0], []).append(seed[1:])
+
+        side, grid_size, num_nearest_events = self.side, self.grid_size, self.num_nearest_events
+        entries, found, radius, event_counts = self.entries, self.found, self.radius, self.event_counts
+
+        distance = min(layers) if len(layers) > 0 else 0
+        while len(layers) > 0:
+            layer = layers.pop(distance, ())
+            next_layer = layers.setdefault(distance + 1, [])
+            for x, y, sx, sy in layer:
+                cell = (x + grid_size)*side + (y + grid_size)
+                if radius[cell] >= 0 and distance > radius[cell]:
+                    continue
+
+                entries[cell].append((distance, sx, sy))
+                found[cell] += event_counts[(sx, sy)]
+                if radius[cell] < 0 and found[cell] >= num_nearest_events:
+                    radius[cell] = distance
+
+                if x != sx:
+                    children = ((x + 1, y),) if x > sx else ((x - 1, y),)
+                elif y != sy:
+                    children = ((x + 1, y), (x - 1, y), (x, y + 1) if y > sy else (x, y - 1))
+                else:
+                    children = ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+
+                for i, j in children:
+                    if -grid_size <= i <= grid_size and -grid_size <= j <= grid_size and \
+                            (region is None or (i + grid_size)*side + (j + grid_size) in region):
+                        next_layer.append((i, j, sx, sy))
+
+            if len(next_layer) == 0:
+                del layers[distance + 1]
+                distance = min(layers) if len(layers) > 0 else distance
+            else:
+                distance += 1
+
+    def finish(self, cells):
+        """
+        a method which orders the kept positions of positions in the order of the Breadth-First-Search of GridWorld
+        :param cells: an iterable of indexes of the positions
+        """
+
+        side, grid_size = self.side, self.grid_size
+        for cell in cells:
+            x, y = cell // side - grid_size, cell % side - grid_size
+            kept = sorted(self.entries[cell], key=lambda entry: get_search_key(x, y, entry[1], entry[2]))
+
+            total = 0
+            cumulative_counts = []
+            for _, sx, sy in kept:
+                total += self.event_counts[(sx, sy)]
+                cumulative_counts.append(total)
+
+            self.positions[cell] = tuple((sx, sy) for _, sx, sy in kept)
+            self.cumulative_counts[cell] = tuple(cumulative_counts)
+
+    def get_nearest_positions(self, x, y, num_nearest_events):
+        """
+        a method which looks up the nearest positions with events, the result is the same as the result of the
+        Breadth-First-Search of GridWorld
+        :param x: the input x coordinate, assumed to be within the world
+        :param y: the input y coordinate, assumed to be within the world
+        :param num_nearest_events: the number of nearest events to find, at most the size of the table
+        :return: a list of points represented by a tuple (x,y) which are the nearest positions with an event
+        """
+
+        cell = self.get_cell(x, y)
+        if num_nearest_events <= 0:
+            return []
+
+        return list(self.positions[cell][:bisect_left(self.cumulative_counts[cell], num_nearest_events) + 1])
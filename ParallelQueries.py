@@ -0,0 +1,127 @@
+from DataModel import GridWorld
+from WorldSnapshot import WorldSnapshot
+from multiprocessing import Pool
+import os
+import shutil
+import tempfile
+
+
+worker_world = None  # the world of a worker process, loaded once from the snapshot when the worker starts
+
+
+def load_worker_world(snapshot_path, world_type):
+    """
+    a function which initializes a worker process by mapping the snapshot of the world, the pages of the file are
+    shared by all workers instead of copying the world into each of them
+    :param snapshot_path: the path of the snapshot file
+    :param world_type: the type of the loaded world
+    """
+
+    global worker_world
+    worker_world = WorldSnapshot.load(snapshot_path, world_type)
+
+
+def run_worker_queries(task):
+    """
+    a function which answers a shard of queries in a worker process
+    :param task: a tuple (points, num_nearest_events, min_price, max_price), where points is a list of tuples (x, y)
+    :return: a list with a list of tuples (identifier, distance) for each point, in the order of the points
+    """
+
+    points, num_nearest_events, min_price, max_price = task
+    return [[(event.identifier, distance) for event, distance in
+             worker_world.query_nearest_events(x, y, num_nearest_events, min_price, max_price)] for x, y in points]
+
+
+class ParallelQueryRunner(object):
+    """
+    this class represents a runner answering large batches of nearest events queries with a pool of processes, the
+    world is shared with the processes through a snapshot file, which each process maps in memory once
+    """
+
+    def __init__(self, world=None, snapshot_path=None, processes=None, chunk_size=1000):
+        """
+        constructor for a ParallelQueryRunner object, the processes are started immediately
+        :param world: optional argument, the world to query, a snapshot of it is saved to a temporary file, so later
+            changes of the world are not seen by the runner, default value is None, in which case snapshot_path is used
+        :param snapshot_path: optional argument, the path of an existing snapshot file of the world to query, default
+            value is None
+        :param processes: optional argument, the number of processes, default value is None, in which case the number
+            of CPUs is used
+        :param chunk_size: optional argument, the number of queries sent to a process at once, default value is 1000
+        :raises ValueError: if neither or both of world and snapshot_path are given, or the chunk size is not positive
+        """
+
+        if (world is None) == (snapshot_path is None):
+            raise ValueError("Exactly one of a world and a snapshot path must be given")
+        if chunk_size <= 0:
+            raise ValueError("The chunk size must be greater than 0")
+
+        self.chunk_size = chunk_size
+        self.directory = None  # the temporary directory of the snapshot, removed when the runner is closed
+
+        world_type = GridWorld
+        if world is not None:
+            world_type = type(world)
+            self.directory = tempfile.mkdtemp()
+            snapshot_path = os.path.join(self.directory, "world.snapshot")
+            WorldSnapshot.save(world, snapshot_path)
+
+        self.pool = Pool(processes, initializer=load_worker_world, initargs=(snapshot_path, world_type))
+
+    def __enter__(self):
+        """
+        :return: the runner, so that it can be used in a with statement
+        """
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        closes the runner at the end of a with statement
+        """
+
+        self.close()
+
+    def close(self):
+        """
+        a method which stops the processes and removes the temporary snapshot
+        """
+
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def query_nearest_events(self, points, num_nearest_events=5, min_price=None, max_price=None):
+        """
+        a method to get the nearest events to many input positions, the positions are split into chunks answered by
+        the processes in parallel
+        :param points: an iterable of tuples (x, y)
+        :param num_nearest_events: optional argument, the number of nearest events to return for each position,
+            default value is 5
+        :param min_price: optional argument, if given only events with a ticket at this price or above are returned
+        :param max_price: optional argument, if given only events with a ticket at this price or below are returned
+        :return: a list with a list of tuples (identifier, distance) for each position, in the order of the positions,
+            the events can be looked up by identifier with get_event_by_id
+        :raises InvalidPositionError: if any of the input positions is out of bounds
+        :raises ValueError: if the runner is closed
+        """
+
+        if self.pool is None:
+            raise ValueError("The runner is closed")
+
+        points = list(points)
+        tasks = [(points[start:start + self.chunk_size], num_nearest_events, min_price, max_price)
+                 for start in range(0, len(points), self.chunk_size)]
+
+        # imap returns the results of the chunks in the order of the chunks, regardless of which finishes first
+        results = []
+        for chunk_results in self.pool.imap(run_worker_queries, tasks):
+            results.extend(chunk_results)
+
+        return results
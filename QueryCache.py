@@ -0,0 +1,116 @@
+from collections import OrderedDict
+
+
+class QueryCache(object):
+    """
+    this class represents a least recently used cache of the results of nearest positions queries, each result is kept
+    with its search radius, so that a change of the events invalidates only the results it can affect
+    """
+
+    def __init__(self, max_size=1024):
+        """
+        constructor for a QueryCache object
+        :param max_size: optional argument, the maximum number of cached results, default value is 1024
+        :raises ValueError: if the maximum size is not positive
+        """
+
+        if max_size <= 0:
+            raise ValueError("The size of the query cache must be greater than 0")
+
+        self.max_size = max_size
+
+        # a map linking each query key to a tuple (x, y, radius, result), ordered from the least to the most recently
+        # used query, a radius of None means that the search exhausted the world so any change can affect the result
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        """
+        :return: the number of cached results
+        """
+
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        a method which returns a cached result and marks it as the most recently used
+        :param key: the key of the query, e.g. a tuple (x, y, k, min_price, max_price)
+        :return: the cached result or None if the query is not cached
+        """
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[3]
+
+    def put(self, key, x, y, radius, result):
+        """
+        a method which caches the result of a query, evicting the least recently used result if the cache is full
+        :param key: the key of the query
+        :param x: the x coordinate of the query
+        :param y: the y coordinate of the query
+        :param radius: the distance of the furthest position the result depends on, changes further away than this
+            distance do not affect the result, None if every change can affect the result
+        :param result: the result of the query
+        """
+
+        self.entries[key] = (x, y, radius, result)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate_position(self, x, y):
+        """
+        a method which removes the cached results affected by a change of the events at a position
+        :param x: the x coordinate of the changed position
+        :param y: the y coordinate of the changed position
+        """
+
+        stale = [key for key, (qx, qy, radius, _) in self.entries.items()
+                 if radius is None or abs(qx - x) + abs(qy - y) <= radius]
+        for key in stale:
+            del self.entries[key]
+
+        self.invalidations += len(stale)
+
+    def invalidate_positions(self, positions):
+        """
+        a method which removes the cached results affected by changes of the events at many positions, e.g. after
+        registering events in bulk
+        :param positions: an iterable of points represented by a tuple (x, y)
+        """
+
+        positions = set(positions)
+        if len(positions) == 0:
+            return
+
+        stale = []
+        for key, (qx, qy, radius, _) in self.entries.items():
+            if radius is None:
+                stale.append(key)
+            elif 2*radius*(radius + 1) + 1 < len(positions):
+                # the positions within the radius are fewer than the changed positions, so they are checked instead
+                if any((qx + dx, qy + dy) in positions for dx in range(-radius, radius + 1)
+                       for dy in range(abs(dx) - radius, radius - abs(dx) + 1)):
+                    stale.append(key)
+            elif any(abs(qx - x) + abs(qy - y) <= radius for x, y in positions):
+                stale.append(key)
+
+        for key in stale:
+            del self.entries[key]
+
+        self.invalidations += len(stale)
+
+    def clear(self):
+        """
+        a method which removes all cached results, the counters are kept
+        """
+
+        self.entries.clear()
@@ -0,0 +1,254 @@
+from DataModel import GridWorld, numpy
+from CustomErrors import InvalidPositionError
+from SpatialIndex import BucketGridIndex
+from ResultFormatting import ResultFormatter
+import asyncio
+import json
+import sys
+import threading
+
+
+class QueryService(object):
+    """
+    this class represents a TCP service answering nearest events queries from many concurrent clients, each request is
+    a line in format 'x, y' and each response is a line with the result encoded as JSON
+
+    the requests of all clients are put in a bounded queue and answered in batches by a single task, so that requests
+    for the same position arriving together are searched only once, the positions of a batch are searched together in
+    a worker thread, so the connections are served while a batch is searched, and a client is not read from while the
+    queue is full, which slows down clients sending more requests than the service can answer
+
+    the world is read by the worker thread while the event loop keeps running, so code changing the world while the
+    service is running must hold the lock of the service, e.g. 'with service.lock: world.remove_event(1)'
+    """
+
+    def __init__(self, world, num_nearest_events=5, max_batch_size=256, max_pending_requests=1024):
+        """
+        constructor for a QueryService object
+        :param world: the GridWorld object shared by all clients
+        :param num_nearest_events: optional argument, the number of nearest events returned for each request, default
+            value is 5
+        :param max_batch_size: optional argument, the maximum number of requests answered in one batch, default value
+            is 256
+        :param max_pending_requests: optional argument, the maximum number of requests waiting to be answered, default
+            value is 1024
+        """
+
+        self.world = world
+        self.num_nearest_events = num_nearest_events
+        self.max_batch_size = max_batch_size
+        self.max_pending_requests = max_pending_requests
+
+        self.requests = 0  # the number of answered requests
+        self.batches = 0  # the number of batches the requests were answered in
+        self.searches = 0  # the number of searched positions, fewer than the requests when positions repeat
+
+        self.server = None
+        self.port = None
+        self.queue = None
+        self.batcher = None
+        self.writers = set()  # the writers of the connected clients, closed when the service stops
+        self.lock = threading.Lock()  # held while the positions of a batch are searched
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        a method which starts listening for clients
+        :param host: optional argument, the address to listen on, default value is '127.0.0.1'
+        :param port: optional argument, the port to listen on, default value is 0, in which case a free port is chosen,
+            the chosen port is kept in the port attribute
+        """
+
+        self.queue = asyncio.Queue(self.max_pending_requests)
+        self.batcher = asyncio.ensure_future(self.answer_batches())
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        a method which stops listening for clients and closes the connections of the connected clients
+        """
+
+        self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+        await self.server.wait_closed()
+
+        self.batcher.cancel()
+        try:
+            await self.batcher
+        except asyncio.CancelledError:
+            pass
+
+    async def serve_forever(self, host="127.0.0.1", port=0):
+        """
+        a method which starts the service and answers requests until it is cancelled
+        :param host: optional argument, the address to listen on, default value is '127.0.0.1'
+        :param port: optional argument, the port to listen on, default value is 0, in which case a free port is chosen
+        """
+
+        await self.start(host, port)
+        print("Listening on {0}:{1}".format(host, self.port))
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def query(self, x, y):
+        """
+        a method which queues a request and waits for its result, waits for a free place first if the queue is full
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :return: the result encoded by ResultFormatter.encode_nearest_events or a dictionary with an error message
+        """
+
+        result = asyncio.get_running_loop().create_future()
+        await self.queue.put(((x, y), result))
+        return await result
+
+    async def answer_batches(self):
+        """
+        a method which answers the queued requests in batches for as long as the service is running, all requests
+        waiting in the queue, up to the maximum batch size, are answered together
+        """
+
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            # the unique positions of the batch are searched together without blocking the event loop, a failed
+            # search is reported to the clients of the batch and the next batches are still answered
+            positions = list(dict.fromkeys(position for position, _ in batch))
+            try:
+                answers = await asyncio.get_running_loop().run_in_executor(None, self.answer_positions, positions)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                answers = dict.fromkeys(positions, {"error": "The nearest events could not be searched"})
+            self.searches += len(positions)
+
+            for position, result in batch:
+                if not result.done():
+                    result.set_result(answers[position])
+
+            self.requests += len(batch)
+            self.batches += 1
+
+            # let the clients send their next requests before the next batch is collected
+            await asyncio.sleep(0)
+
+    def answer_positions(self, positions):
+        """
+        a method which searches the nearest events to many positions, the positions in bounds are answered with a
+        single batch query when numpy is installed and the world has no cost layer, spatial index or nearest table,
+        one by one otherwise, since the batch query compares every point with every event while the index and the
+        table only visit the events near each point
+        :param positions: a list of unique tuples (x, y)
+        :return: a map linking each position to its result, as returned by answer
+        """
+
+        with self.lock:
+            return self.search_positions(positions)
+
+    def search_positions(self, positions):
+        """
+        a method which searches the nearest events to many positions, see answer_positions, called while the lock of
+        the service is held
+        :param positions: a list of unique tuples (x, y)
+        :return: a map linking each position to its result, as returned by answer
+        """
+
+        answers = {}
+        valid_positions = []
+        for x, y in positions:
+            if (-1*self.world.grid_size) <= x <= self.world.grid_size and \
+                    (-1*self.world.grid_size) <= y <= self.world.grid_size:
+                valid_positions.append((x, y))
+            else:
+                answers[(x, y)] = self.answer(x, y)  # reports the out of bounds position
+
+        if numpy is None or self.world.cost_layer is not None or self.world.spatial_index is not None or \
+                self.world.nearest_table is not None or len(valid_positions) == 0:
+            for x, y in valid_positions:
+                answers[(x, y)] = self.answer(x, y)
+            return answers
+
+        identifiers, distances = self.world.get_nearest_events_batch(valid_positions, self.num_nearest_events)
+        for (x, y), row_identifiers, row_distances in zip(valid_positions, identifiers.tolist(), distances.tolist()):
+            nearest_events = [(self.world.get_event_by_id(identifier)[0], distance)
+                              for identifier, distance in zip(row_identifiers, row_distances) if identifier >= 0]
+            answers[(x, y)] = ResultFormatter.encode_nearest_events(x, y, nearest_events)
+
+        return answers
+
+    def answer(self, x, y):
+        """
+        a method which searches the nearest events to a position
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :return: the result encoded by ResultFormatter.encode_nearest_events or a dictionary with an error message
+        """
+
+        try:
+            nearest_events = self.world.query_nearest_events(x, y, self.num_nearest_events)
+        except InvalidPositionError:
+            return {"error": "Out of bounds coordinates, please enter coordinates between {0} and {1} inclusive".format(
+                -1*self.world.grid_size, self.world.grid_size)}
+
+        return ResultFormatter.encode_nearest_events(x, y, nearest_events)
+
+    async def handle_client(self, reader, writer):
+        """
+        a method which answers the requests of a client, one at a time, until the client disconnects or sends 'q'
+        :param reader: the StreamReader of the connection
+        :param writer: the StreamWriter of the connection
+        """
+
+        self.writers.add(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):  # too long lines or reset connections end the connection
+                    break
+
+                if len(line) == 0:
+                    break
+
+                request = line.decode("utf-8", "replace").strip()
+                if request == "q" or request == "quit":
+                    break
+                if request == "":
+                    continue
+
+                try:
+                    x, y = map(int, request.split(","))
+                except ValueError:
+                    response = {"error": "Invalid format of the input position: positions should be in format: x, y"}
+                else:
+                    response = await self.query(x, y)
+
+                writer.write((json.dumps(response) + "\n").encode("utf-8"))
+                await writer.drain()  # waits while the client is not reading its responses
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+
+def main(port=8000):
+    """
+    a main method, which runs the query service over a grid world with randomly generated data
+    :param port: optional argument, the port to listen on, default value is 8000
+    """
+
+    world = GridWorld(generate=True, spatial_index=BucketGridIndex())
+    try:
+        asyncio.run(QueryService(world).serve_forever("127.0.0.1", port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
@@ -0,0 +1,70 @@
+import sys
+
+
+class ResultFormatter(object):
+    """
+    a utility class providing static methods for rendering the results of nearest events queries, kept separate from
+    the queries themselves so that no I/O happens while searching
+    """
+
+    @staticmethod
+    def format_nearest_events(x, y, nearest_events):
+        """
+        a static method, which renders the result of a single nearest events query
+        :param x: the input x coordinate of the query
+        :param y: the input y coordinate of the query
+        :param nearest_events: a list of tuples (event, distance) as returned by GridWorld.query_nearest_events
+        :return: a string with the information about each of the nearest events
+        """
+
+        lines = ["\nClosest Events to ({0},{1}):\n\n".format(x, y)]
+        for event, distance in nearest_events:
+            lines.append("Event {0} - {1}, Distance {2}\n\n".format(event.get_id(), event.get_minimum_ticket_price(),
+                                                                  distance))
+
+        return "".join(lines)
+
+    @staticmethod
+    def encode_nearest_events(x, y, nearest_events):
+        """
+        a static method, which converts the result of a single nearest events query to objects which can be encoded
+        as JSON
+        :param x: the input x coordinate of the query
+        :param y: the input y coordinate of the query
+        :param nearest_events: a list of tuples (event, distance) as returned by GridWorld.query_nearest_events
+        :return: a dictionary with the input position and a list of dictionaries, one for each of the nearest events
+        """
+
+        return {"x": x, "y": y, "events": [{"id": event.get_id(), "identifier": event.identifier,
+                                            "minimum_price": ResultFormatter.get_minimum_price(event),
+                                            "distance": distance} for event, distance in nearest_events]}
+
+    @staticmethod
+    def get_minimum_price(event):
+        """
+        a static method, which returns the minimum ticket price of an event, the price cached when the event was
+        registered is used, so the tickets are only searched for events which are not cached, e.g. read from a snapshot
+        :param event: the event object
+        :return: the minimum ticket price or None if there are no tickets
+        """
+
+        if event.minimum_price is not None:
+            return event.minimum_price
+
+        price_range = event.get_price_range()
+        return None if price_range is None else price_range[0]
+
+    @staticmethod
+    def write_nearest_events(queries, stream=None):
+        """
+        a static method, which renders the results of many nearest events queries with a single write
+        :param queries: an iterable of tuples (x, y, nearest_events), one for each query
+        :param stream: optional argument, the file-like object to write to, default value is None, in which case the
+            standard output is used
+        """
+
+        if stream is None:
+            stream = sys.stdout
+
+        stream.write("".join(ResultFormatter.format_nearest_events(x, y, nearest_events)
+                             for x, y, nearest_events in queries))
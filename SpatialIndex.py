@@ -0,0 +1,520 @@
+from heapq import heappop, heappush
+
+try:
+    import numpy
+except ImportError:  # numpy is only needed for the vectorized search ranks
+    numpy = None
+
+
+def get_search_rank(dx, dy):
+    """
+    a function which returns the rank of an offset within its manhattan distance layer, the rank reproduces the order
+    in which the Breadth-First-Search in GridWorld discovers positions, so that ties between equally distant positions
+    are broken in exactly the same way
+    :param dx: the x offset of the position from the input position
+    :param dy: the y offset of the position from the input position
+    :return: an integer in the range [0, 4*distance) giving the discovery order of the offset within its layer
+    """
+
+    distance = abs(dx) + abs(dy)
+    if distance == 0:
+        return 0
+
+    # positions to the right are discovered first, from the furthest column towards the input column
+    if dx > 0:
+        return 2*(distance - dx) - (1 if dy > 0 else 0)
+
+    # then the upper left quarter, from the top towards the input row
+    if dy >= 0:
+        return 2*distance - 1 + (distance - dy)
+
+    # and finally the lower left quarter, from the left towards the input column
+    return 3*distance + (dx + distance - 1)
+
+
+def get_search_ranks(dx, dy, distances):
+    """
+    a vectorized version of get_search_rank, which computes the search ranks of many offsets at once
+    :param dx: a numpy array of x offsets from the input position
+    :param dy: a numpy array of y offsets from the input position, with the same shape as dx
+    :param distances: a numpy array of the manhattan distances of the offsets, i.e. abs(dx) + abs(dy)
+    :return: a numpy array of the search ranks with the same shape as the input arrays
+    """
+
+    return numpy.where(dx > 0, 2*(distances - dx) - (dy > 0),
+                       numpy.where(dy >= 0, 3*distances - 1 - dy, 4*distances - 1 + dx)) * (distances > 0)
+
+
+def get_search_key(x0, y0, x1, y1):
+    """
+    a function which returns the key used to order positions when searching for the nearest events
+    :param x0: the x coordinate of the input position
+    :param y0: the y coordinate of the input position
+    :param x1: the x coordinate of the searched position
+    :param y1: the y coordinate of the searched position
+    :return: a tuple (manhattan distance, search rank), comparing these tuples gives the Breadth-First-Search order
+    """
+
+    dx, dy = x1 - x0, y1 - y0
+    return abs(dx) + abs(dy), get_search_rank(dx, dy)
+
+
+class SpatialIndex(object):
+    """
+    this class represents the interface of a spatial index, which can be plugged into a GridWorld in order to answer
+    nearest positions queries without exploring the empty positions of the world
+    """
+
+    unbounded_time_range = (float("-inf"), float("inf"))  # the time range of the events without a time window
+
+    def add_position(self, x, y, price_range=None, time_range=None):
+        """
+        a method to add an event at a position to the index, a position can hold more than one event
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :param price_range: optional argument, a tuple (minimum price, maximum price) of the event's tickets, used to
+            prune the search when filtering by price, default value is None, meaning the event has no tickets
+        :param time_range: optional argument, a tuple (start time, end time) of the event, used to prune the search
+            when filtering by time, default value is None, meaning the event has no time window
+        """
+
+        raise NotImplementedError("add_position must be implemented by the spatial index")
+
+    def add_positions(self, entries):
+        """
+        a method to add many events to the index at once, the same as calling add_position for each of them
+        :param entries: an iterable of tuples (x, y, price_range, time_range)
+        """
+
+        for x, y, price_range, time_range in entries:
+            self.add_position(x, y, price_range, time_range)
+
+    def remove_position(self, x, y, price_range=None, time_range=None):
+        """
+        a method to remove an event at a position from the index
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :param price_range: optional argument, the price range the event was added with, default value is None
+        :param time_range: optional argument, the time range the event was added with, default value is None
+        """
+
+        raise NotImplementedError("remove_position must be implemented by the spatial index")
+
+    def get_nearest_positions(self, x, y, num_nearest_events, min_price=None, max_price=None, count_events=None,
+                              start_time=None, end_time=None):
+        """
+        a method which returns the nearest indexed positions to an input position, ordered by manhattan distance and
+        with ties broken the same way as the Breadth-First-Search in GridWorld
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param num_nearest_events: the number of nearest events, the positions are returned until they hold at least
+            this many events in total
+        :param min_price: optional argument, if given only events with a ticket at this price or above are counted
+        :param max_price: optional argument, if given only events with a ticket at this price or below are counted
+        :param count_events: a function (x, y, min_price, max_price, start_time, end_time) returning the number of
+            events at a position with a ticket in the price range happening in the time window, required when filtering
+        :param start_time: optional argument, if given only events which end at this time or later are counted
+        :param end_time: optional argument, if given only events which start at this time or earlier are counted
+        :return: a list of points represented by a tuple (x,y)
+        """
+
+        raise NotImplementedError("get_nearest_positions must be implemented by the spatial index")
+
+    def iter_positions(self, x0, y0, x1, y1):
+        """
+        a method which generates the indexed positions in a rectangle
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :return: a generator of points represented by a tuple (x,y), in no particular order
+        """
+
+        raise NotImplementedError("iter_positions must be implemented by the spatial index")
+
+
+class BucketGridIndex(SpatialIndex):
+    """
+    this class represents a spatial index, which groups the occupied positions into square buckets of a fixed size,
+    only buckets containing at least one position are stored, so the index size depends on the number of events and
+    not on the size of the world
+    """
+
+    def __init__(self, bucket_size=8):
+        """
+        constructor for a BucketGridIndex object
+        :param bucket_size: optional argument, the length of the side of a bucket, default value is 8
+        :raises ValueError: if the bucket size is not a positive integer
+        """
+
+        if type(bucket_size) != int or bucket_size <= 0:
+            raise ValueError("Bucket size must be a positive integer")
+
+        self.bucket_size = bucket_size
+        self.buckets = {}  # a map linking the coordinates of a bucket to a map of its positions and their event counts
+        self.bucket_prices = {}  # a map linking the coordinates of a bucket to the price range of its tickets
+        self.bucket_price_ranges = {}  # a map linking the coordinates of a bucket to the counts of its events' ranges
+        self.bucket_times = {}  # a map linking the coordinates of a bucket to the earliest start and the latest end
+        self.bucket_time_ranges = {}  # a map linking the coordinates of a bucket to the counts of its events' windows
+
+        # the bounds of the stored buckets, used to know when there is nothing left to explore
+        self.min_bucket_x = self.max_bucket_x = self.min_bucket_y = self.max_bucket_y = None
+
+    def get_bucket(self, x, y):
+        """
+        a method which returns the coordinates of the bucket containing a position
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :return: a tuple (x, y) with the coordinates of the bucket
+        """
+
+        return x // self.bucket_size, y // self.bucket_size
+
+    def add_position(self, x, y, price_range=None, time_range=None):
+        """
+        a method to add an event at a position to the index, a position can hold more than one event
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :param price_range: optional argument, a tuple (minimum price, maximum price) of the event's tickets, used to
+            prune the search when filtering by price, default value is None, meaning the event has no tickets
+        :param time_range: optional argument, a tuple (start time, end time) of the event, used to prune the search
+            when filtering by time, default value is None, meaning the event has no time window
+        """
+
+        bucket = self.get_bucket(x, y)
+        if bucket not in self.buckets:
+            self.buckets[bucket] = {}
+            if self.min_bucket_x is None:
+                self.min_bucket_x = self.max_bucket_x = bucket[0]
+                self.min_bucket_y = self.max_bucket_y = bucket[1]
+            else:
+                self.min_bucket_x = min(self.min_bucket_x, bucket[0])
+                self.max_bucket_x = max(self.max_bucket_x, bucket[0])
+                self.min_bucket_y = min(self.min_bucket_y, bucket[1])
+                self.max_bucket_y = max(self.max_bucket_y, bucket[1])
+
+        positions = self.buckets[bucket]
+        positions[(x, y)] = positions.get((x, y), 0) + 1
+
+        if price_range is not None:
+            price_ranges = self.bucket_price_ranges.setdefault(bucket, {})
+            price_ranges[price_range] = price_ranges.get(price_range, 0) + 1
+
+            bucket_prices = self.bucket_prices.get(bucket)
+            if bucket_prices is None:
+                self.bucket_prices[bucket] = price_range
+            else:
+                self.bucket_prices[bucket] = (min(bucket_prices[0], price_range[0]),
+                                              max(bucket_prices[1], price_range[1]))
+
+        if time_range is None:
+            time_range = self.unbounded_time_range
+        time_ranges = self.bucket_time_ranges.setdefault(bucket, {})
+        time_ranges[time_range] = time_ranges.get(time_range, 0) + 1
+
+        bucket_times = self.bucket_times.get(bucket)
+        if bucket_times is None:
+            self.bucket_times[bucket] = time_range
+        else:
+            self.bucket_times[bucket] = (min(bucket_times[0], time_range[0]), max(bucket_times[1], time_range[1]))
+
+    def add_positions(self, entries):
+        """
+        a method to add many events to the index at once, the same as calling add_position for each of them but
+        without the overhead of a method call and of the bounds update for every event
+        :param entries: an iterable of tuples (x, y, price_range, time_range)
+        """
+
+        buckets, bucket_prices, bucket_price_ranges = self.buckets, self.bucket_prices, self.bucket_price_ranges
+        bucket_times, bucket_time_ranges = self.bucket_times, self.bucket_time_ranges
+        bucket_size, unbounded_time_range = self.bucket_size, self.unbounded_time_range
+        new_buckets = []
+
+        for x, y, price_range, time_range in entries:
+            bucket = (x // bucket_size, y // bucket_size)
+            positions = buckets.get(bucket)
+            if positions is None:
+                positions = buckets[bucket] = {}
+                new_buckets.append(bucket)
+            positions[(x, y)] = positions.get((x, y), 0) + 1
+
+            if price_range is not None:
+                price_ranges = bucket_price_ranges.get(bucket)
+                if price_ranges is None:
+                    bucket_price_ranges[bucket] = {price_range: 1}
+                    bucket_prices[bucket] = price_range
+                else:
+                    price_ranges[price_range] = price_ranges.get(price_range, 0) + 1
+                    low, high = bucket_prices[bucket]
+                    if price_range[0] < low or price_range[1] > high:
+                        bucket_prices[bucket] = (min(low, price_range[0]), max(high, price_range[1]))
+
+            if time_range is None:
+                time_range = unbounded_time_range
+            time_ranges = bucket_time_ranges.get(bucket)
+            if time_ranges is None:
+                bucket_time_ranges[bucket] = {time_range: 1}
+                bucket_times[bucket] = time_range
+            else:
+                time_ranges[time_range] = time_ranges.get(time_range, 0) + 1
+                start, end = bucket_times[bucket]
+                if time_range[0] < start or time_range[1] > end:
+                    bucket_times[bucket] = (min(start, time_range[0]), max(end, time_range[1]))
+
+        if len(new_buckets) > 0:
+            bucket_xs = [bucket[0] for bucket in new_buckets]
+            bucket_ys = [bucket[1] for bucket in new_buckets]
+            if self.min_bucket_x is not None:
+                bucket_xs += [self.min_bucket_x, self.max_bucket_x]
+                bucket_ys += [self.min_bucket_y, self.max_bucket_y]
+            self.min_bucket_x, self.max_bucket_x = min(bucket_xs), max(bucket_xs)
+            self.min_bucket_y, self.max_bucket_y = min(bucket_ys), max(bucket_ys)
+
+    def remove_position(self, x, y, price_range=None, time_range=None):
+        """
+        a method to remove an event at a position from the index, empty positions and buckets are dropped and the price
+        and time ranges of the bucket are only recomputed when the removed event was at their bounds
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :param price_range: optional argument, the price range the event was added with, default value is None
+        :param time_range: optional argument, the time range the event was added with, default value is None
+        """
+
+        bucket = self.get_bucket(x, y)
+        positions = self.buckets[bucket]
+        if positions[(x, y)] == 1:
+            del positions[(x, y)]
+            if len(positions) == 0:
+                del self.buckets[bucket]
+        else:
+            positions[(x, y)] -= 1
+
+        if price_range is not None:
+            price_ranges = self.bucket_price_ranges[bucket]
+            if price_ranges[price_range] == 1:
+                del price_ranges[price_range]
+            else:
+                price_ranges[price_range] -= 1
+
+            if len(price_ranges) == 0:
+                del self.bucket_price_ranges[bucket]
+                del self.bucket_prices[bucket]
+            elif price_range[0] == self.bucket_prices[bucket][0] or price_range[1] == self.bucket_prices[bucket][1]:
+                self.bucket_prices[bucket] = (min(low for low, _ in price_ranges),
+                                              max(high for _, high in price_ranges))
+
+        if time_range is None:
+            time_range = self.unbounded_time_range
+        time_ranges = self.bucket_time_ranges[bucket]
+        if time_ranges[time_range] == 1:
+            del time_ranges[time_range]
+        else:
+            time_ranges[time_range] -= 1
+
+        if len(time_ranges) == 0:
+            del self.bucket_time_ranges[bucket]
+            del self.bucket_times[bucket]
+        elif time_range[0] == self.bucket_times[bucket][0] or time_range[1] == self.bucket_times[bucket][1]:
+            self.bucket_times[bucket] = (min(start for start, _ in time_ranges), max(end for _, end in time_ranges))
+
+    def has_prices_in_range(self, bucket, min_price, max_price):
+        """
+        a method which checks if the price range of the tickets in a bucket overlaps a given price range
+        :param bucket: the coordinates of the bucket
+        :param min_price: the minimum price of the range or None if there is no lower bound
+        :param max_price: the maximum price of the range or None if there is no upper bound
+        :return: false if no event in the bucket can have a ticket in the range and true otherwise
+        """
+
+        bucket_prices = self.bucket_prices.get(bucket)
+        if bucket_prices is None:
+            return False
+
+        return (min_price is None or bucket_prices[1] >= min_price) and \
+            (max_price is None or bucket_prices[0] <= max_price)
+
+    def has_times_in_range(self, bucket, start_time, end_time):
+        """
+        a method which checks if the time windows of the events in a bucket can overlap a given time window
+        :param bucket: the coordinates of the bucket
+        :param start_time: the start of the window or None if there is no start
+        :param end_time: the end of the window or None if there is no end
+        :return: false if no event in the bucket can be happening in the window and true otherwise
+        """
+
+        bucket_times = self.bucket_times.get(bucket)
+        if bucket_times is None:
+            return False
+
+        return (start_time is None or bucket_times[1] >= start_time) and \
+            (end_time is None or bucket_times[0] <= end_time)
+
+    def get_bucket_distance(self, x, y, bucket):
+        """
+        a method which returns the minimum manhattan distance between a position and any position in a bucket
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :param bucket: the coordinates of the bucket
+        :return: a lower bound of the distance to all positions stored in the bucket
+        """
+
+        low_x, low_y = bucket[0]*self.bucket_size, bucket[1]*self.bucket_size
+        high_x, high_y = low_x + self.bucket_size - 1, low_y + self.bucket_size - 1
+
+        return max(low_x - x, 0, x - high_x) + max(low_y - y, 0, y - high_y)
+
+    def iter_positions(self, x0, y0, x1, y1):
+        """
+        a method which generates the indexed positions in a rectangle, only the stored buckets overlapping the
+        rectangle are visited
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :return: a generator of points represented by a tuple (x,y), in no particular order
+        """
+
+        if x0 > x1 or y0 > y1:
+            return
+
+        bucket_x0, bucket_y0 = self.get_bucket(x0, y0)
+        bucket_x1, bucket_y1 = self.get_bucket(x1, y1)
+
+        # go through the stored buckets if there are fewer of them than buckets overlapping the rectangle
+        if (bucket_x1 - bucket_x0 + 1)*(bucket_y1 - bucket_y0 + 1) > len(self.buckets):
+            buckets = [bucket for bucket in self.buckets
+                       if bucket_x0 <= bucket[0] <= bucket_x1 and bucket_y0 <= bucket[1] <= bucket_y1]
+        else:
+            buckets = [(bucket_x, bucket_y) for bucket_x in range(bucket_x0, bucket_x1 + 1)
+                       for bucket_y in range(bucket_y0, bucket_y1 + 1) if (bucket_x, bucket_y) in self.buckets]
+
+        for bucket in buckets:
+            # buckets fully inside the rectangle don't need their positions to be checked
+            inside = bucket_x0 < bucket[0] < bucket_x1 and bucket_y0 < bucket[1] < bucket_y1
+            for position in self.buckets[bucket]:
+                if inside or (x0 <= position[0] <= x1 and y0 <= position[1] <= y1):
+                    yield position
+
+    @staticmethod
+    def get_ring(bucket_x, bucket_y, ring):
+        """
+        a static method, which generates the buckets at a given chebyshev distance from a bucket
+        :param bucket_x: the x coordinate of the central bucket
+        :param bucket_y: the y coordinate of the central bucket
+        :param ring: the chebyshev distance of the generated buckets from the central bucket
+        :return: a generator of the coordinates of all buckets in the ring
+        """
+
+        if ring == 0:
+            yield bucket_x, bucket_y
+            return
+
+        for i in range(-ring, ring + 1):
+            yield bucket_x + i, bucket_y - ring
+            yield bucket_x + i, bucket_y + ring
+        for j in range(-ring + 1, ring):
+            yield bucket_x - ring, bucket_y + j
+            yield bucket_x + ring, bucket_y + j
+
+    def get_nearest_positions(self, x, y, num_nearest_events, min_price=None, max_price=None, count_events=None,
+                              start_time=None, end_time=None):
+        """
+        a method which returns the nearest indexed positions to an input position, ordered by manhattan distance and
+        with ties broken the same way as the Breadth-First-Search in GridWorld
+        :param x: the input x coordinate
+        :param y: the input y coordinate
+        :param num_nearest_events: the number of nearest events, the positions are returned until they hold at least
+            this many events in total
+        :param min_price: optional argument, if given only events with a ticket at this price or above are counted
+        :param max_price: optional argument, if given only events with a ticket at this price or below are counted
+        :param count_events: a function (x, y, min_price, max_price, start_time, end_time) returning the number of
+            events at a position with a ticket in the price range happening in the time window, required when filtering
+        :param start_time: optional argument, if given only events which end at this time or later are counted
+        :param end_time: optional argument, if given only events which start at this time or earlier are counted
+        :return: a list of points represented by a tuple (x,y)
+        """
+
+        if num_nearest_events <= 0 or len(self.buckets) == 0:
+            return []
+
+        # a max-heap (by negating the keys) holding the best positions found so far and their event counts
+        nearest = []
+        num_found = 0  # the number of events at the positions in the heap
+        priced = min_price is not None or max_price is not None
+        timed = start_time is not None or end_time is not None
+        filtered = priced or timed
+
+        def collect(bucket):
+            """
+            an inner function used to offer the positions of a bucket to the heap of nearest positions
+            :param bucket: the coordinates of the bucket
+            """
+
+            nonlocal num_found
+
+            # buckets without any ticket in the price range or event in the time window are pruned without looking
+            # at their positions
+            if priced and not self.has_prices_in_range(bucket, min_price, max_price):
+                return
+            if timed and not self.has_times_in_range(bucket, start_time, end_time):
+                return
+
+            for position, count in self.buckets[bucket].items():
+                distance, rank = get_search_key(x, y, position[0], position[1])
+                item = (-distance, -rank, position, count)
+                if num_found >= num_nearest_events and item < nearest[0]:
+                    continue
+
+                if filtered:
+                    count = count_events(position[0], position[1], min_price, max_price, start_time, end_time)
+                    if count == 0:
+                        continue
+                    item = item[:3] + (count,)
+
+                heappush(nearest, item)
+                num_found += count
+
+                # drop the furthest positions as long as the remaining ones hold enough events
+                while num_found - nearest[0][3] >= num_nearest_events:
+                    num_found -= heappop(nearest)[3]
+
+        def done(lower_bound):
+            """
+            an inner function used to determine if the search can stop
+            :param lower_bound: the minimum distance of all positions which have not been explored yet
+            :return: true if no unexplored position can be closer than the positions already found and false otherwise
+            """
+
+            return num_found >= num_nearest_events and -nearest[0][0] < lower_bound
+
+        bucket_x, bucket_y = self.get_bucket(x, y)
+        max_ring = max(bucket_x - self.min_bucket_x, self.max_bucket_x - bucket_x,
+                       bucket_y - self.min_bucket_y, self.max_bucket_y - bucket_y)
+
+        # explore the rings of buckets around the input position, closest rings first
+        ring = 0
+        while ring <= max_ring:
+            if done(0 if ring == 0 else (ring - 1)*self.bucket_size + 1):
+                break
+
+            # in a sparse index it is cheaper to go through the remaining buckets than through the empty ones
+            if 8*ring > len(self.buckets):
+                remaining = []
+                for bucket in self.buckets:
+                    if max(abs(bucket[0] - bucket_x), abs(bucket[1] - bucket_y)) >= ring:
+                        remaining.append((self.get_bucket_distance(x, y, bucket), bucket))
+                remaining.sort()
+
+                for lower_bound, bucket in remaining:
+                    if done(lower_bound):
+                        break
+                    collect(bucket)
+                break
+
+            for bucket in self.get_ring(bucket_x, bucket_y, ring):
+                if bucket in self.buckets:
+                    collect(bucket)
+            ring += 1
+
+        nearest.sort(reverse=True)
+        return [position for _, _, position, _ in nearest]
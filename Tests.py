@@ -1,6 +1,30 @@
+import asyncio
+import gc
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
 import unittest
-from CustomErrors import InvalidPriceError, InvalidPositionError, DuplicateIdentifierError
+from io import StringIO
+from heapq import heappush, heappop
+from random import Random
+from CustomErrors import InvalidPriceError, InvalidPositionError, DuplicateIdentifierError, UnknownIdentifierError, \
+    ReadOnlyWorldError
 from DataModel import GridWorld, Event
+from DataRandomizer import DataGenerator
+from SpatialIndex import BucketGridIndex, get_search_rank, get_search_key
+from ResultFormatting import ResultFormatter
+from WorldStorage import ChunkedStorage
+from EventStore import ColumnarStorage, RowMap
+from WorldSnapshot import WorldSnapshot
+from QueryCache import QueryCache
+from ParallelQueries import ParallelQueryRunner
+from QueryService import QueryService
+from Benchmarks import WorldBenchmark, get_percentiles
+from Metrics import MetricsCollector, CallbackSink
+from TravelCosts import CostLayer
+from WorldRegistry import WorldRegistry
 
 
 class SimulationTests(unittest.TestCase):
@@ -48,6 +72,23 @@ class SimulationTests(unittest.TestCase):
         self.assertEqual(self.event.get_minimum_ticket_price(), Event.currency + "07.54",
                          "Wrong formatting for min ticket price with 3 digits")
 
+    def test_compact_event(self):
+        """
+        tests the compact representation of events
+        """
+
+        event = Event(3, (4.5, 1, 20))
+        self.assertFalse(hasattr(event, "__dict__"), "Event attributes should be declared in __slots__")
+        self.assertEqual(event.tickets.typecode, "d", "Tickets should be stored in an array of doubles")
+        self.assertEqual(list(event.tickets), [4.5, 1.0, 20.0], "Tickets not stored in the given order")
+        self.assertIsNone(event.price_range, "Price range should only be cached when the event is registered")
+
+        self.world.register_event(event, 0, 0)
+        self.assertEqual(event.price_range, (1.0, 20.0), "Wrong price range cached when registering the event")
+        self.world.update_tickets(3, [])
+        self.assertIsNone(event.price_range, "Price range should be cleared when all tickets are removed")
+        self.assertEqual(event.get_minimum_ticket_price(), "N/A", "Minimum ticket price not updated")
+
     def test_world(self):
         """
         tests the methods of the GridWorld class
@@ -119,6 +160,1151 @@ class SimulationTests(unittest.TestCase):
         positions = tuple(self.world.get_available_moves(20, 20))
         self.assertEqual(positions, ((19, 20), (20, 19)), "Wrong positions returned with boundary case (20, 20)")
 
+    def test_spatial_index(self):
+        """
+        tests that the spatial index returns the same nearest positions as the Breadth-First-Search
+        """
+
+        with self.assertRaises(ValueError):
+            BucketGridIndex(0)
+
+        # the search ranks within a distance layer must be unique and consecutive
+        for distance in range(1, 6):
+            ranks = sorted(get_search_rank(dx, dy) for dx in range(-distance, distance + 1)
+                           for dy in range(-distance, distance + 1) if abs(dx) + abs(dy) == distance)
+            self.assertEqual(ranks, list(range(4*distance)), "Wrong search ranks for distance {0}".format(distance))
+
+        random = Random(42)
+        for bucket_size in (1, 3, 8):
+            for num_of_events in (1, 5, 60, 441):
+                world = GridWorld(generate=False)
+                indexed_world = GridWorld(generate=False, spatial_index=BucketGridIndex(bucket_size))
+                size = GridWorld.grid_size
+                positions = [(x, y) for x in range(-size, size + 1) for y in range(-size, size + 1)]
+                for identifier, (x, y) in enumerate(random.sample(positions, num_of_events)):
+                    world.register_event(Event(identifier, []), x, y)
+                    indexed_world.register_event(Event(identifier, []), x, y)
+
+                for x, y in random.sample(positions, 20):
+                    for num_nearest_events in (0, 1, 5, 30):
+                        self.assertEqual(indexed_world.get_nearest_positions(x, y, num_nearest_events),
+                                         world.get_nearest_positions(x, y, num_nearest_events),
+                                         "Spatial index and Breadth-First-Search returned different positions")
+
+    def test_chunked_storage(self):
+        """
+        tests that a world with chunked storage behaves the same as a world with dense storage
+        """
+
+        with self.assertRaises(ValueError):
+            ChunkedStorage(0)
+
+        storage = ChunkedStorage(4)
+        storage.set_events(-3, 5, {1: self.event})
+        self.assertEqual(storage.get_events(-3, 5), {1: self.event}, "Events not stored in chunked storage")
+        self.assertIsNone(storage.get_events(5, -3), "Wrong events returned from an unallocated region")
+        self.assertEqual(len(storage.regions), 1, "Only the region containing the events should be allocated")
+        storage.set_events(-3, 5, None)
+        self.assertEqual(len(storage.regions), 0, "Empty region should be released")
+
+        random = Random(3)
+        chunked_world = GridWorld(generate=False, storage=ChunkedStorage(5))
+        size = GridWorld.grid_size
+        positions = [(x, y) for x in range(-size, size + 1) for y in range(-size, size + 1)]
+        for identifier, (x, y) in enumerate(random.sample(positions, 50)):
+            self.world.register_event(Event(identifier, []), x, y)
+            chunked_world.register_event(Event(identifier + 100, []), x, y)
+
+        for x, y in positions:
+            self.assertEqual(chunked_world.get_nearest_positions(x, y, 5), self.world.get_nearest_positions(x, y, 5),
+                             "Chunked and dense storage returned different nearest positions")
+
+        # a very large world only allocates the regions containing events
+        class LargeWorld(GridWorld):
+            grid_size = 10**6
+
+        large_world = LargeWorld(generate=False, spatial_index=BucketGridIndex(), storage=ChunkedStorage())
+        large_world.register_event(Event(1, [5]), -10**6, 10**6)
+        large_world.register_event(Event(2, [5]), 999999, -5)
+        self.assertEqual(large_world.get_event(999999, -5).identifier, 2, "Event not registered in large world")
+        self.assertEqual(len(large_world.storage.regions), 2, "Only the regions containing events should be allocated")
+        self.assertEqual(large_world.get_nearest_positions(0, 0, 5), [(999999, -5), (-10**6, 10**6)],
+                         "Wrong nearest positions returned in large world")
+
+    def test_columnar_storage(self):
+        """
+        tests that a world with columnar storage behaves the same as a world with dense storage
+        """
+
+        # a row map holds the same keys as a dictionary through additions and removals
+        random = Random(17)
+        row_map, rows = RowMap(), {}
+        for step in range(3000):
+            key = random.choice((-1, 1)) * random.randint(0, 300) * 2**40 + random.randint(0, 3)
+            if random.random() < 0.6:
+                row_map[key] = rows[key] = step
+            elif key in rows:
+                self.assertEqual(row_map.pop(key), rows.pop(key), "Wrong row removed from the row map")
+            self.assertEqual(len(row_map), len(rows), "Wrong number of keys in the row map")
+        self.assertEqual(dict((key, row_map.get(key)) for key in rows), rows, "Wrong rows kept in the row map")
+        self.assertNotIn(5, row_map, "Key not added to the row map found in it")
+        with self.assertRaises(KeyError):
+            row_map.pop(5)
+
+        # events are copied into the columns and created again when they are accessed
+        storage = ColumnarStorage(GridWorld.grid_size)
+        world = GridWorld(generate=False, storage=storage)
+        event = Event(7, (10.29, 0.1, 99.99), 5, 50)
+        world.register_event(event, -3, 4)
+        stored = world.get_event(-3, 4)
+        self.assertIsNot(stored, event, "Events should be created from the columns of the storage")
+        self.assertEqual((stored.identifier, list(stored.tickets), stored.start_time, stored.end_time),
+                         (7, [10.29, 0.1, 99.99], 5, 50), "Event not stored in the columns")
+        self.assertEqual((stored.get_id(), stored.get_minimum_ticket_price()),
+                         (event.get_id(), event.get_minimum_ticket_price()), "Wrong formatting of a stored event")
+        self.assertEqual(storage.prices.typecode, "i", "Prices in whole cents should be kept as integers")
+
+        world.update_tickets(7, (1.005, 2))
+        self.assertEqual(storage.prices.typecode, "d", "Prices should be kept as doubles once a price is not in cents")
+        self.assertEqual(list(world.get_event(-3, 4).tickets), [1.005, 2.0], "Tickets not updated in the columns")
+
+        world.register_event(Event(8, []), -3, 4)
+        world.register_event(Event(9, [3]), -3, 4)
+        world.remove_event(8)
+        self.assertEqual([event.identifier for event in world.get_events(-3, 4)], [7, 9],
+                         "Events at a position not kept in the order they were registered")
+        world.move_event(7, 2, 2)
+        self.assertEqual(dict(world.event_positions.items()), {7: (2, 2), 9: (-3, 4)}, "Wrong positions of the events")
+        self.assertEqual([event.identifier for event in world.expire_events(60)], [7], "Wrong events expired")
+        self.assertEqual(list(world.unique_identifiers), [9], "Identifier of an expired event still in use")
+
+        # the same generated data is searched the same way in both storages, with a fraction of the memory
+        gc.collect()
+        tracemalloc.start()
+        chunked_world = GridWorld(generate=False, storage=ChunkedStorage(), grid_size=50)
+        chunked_world.generate_data(number_of_events=5000, seed=4)
+        chunked_bytes = tracemalloc.get_traced_memory()[0]
+        columnar_world = GridWorld(generate=False, storage=ColumnarStorage(50), grid_size=50)
+        columnar_world.generate_data(number_of_events=5000, seed=4)
+        columnar_bytes = tracemalloc.get_traced_memory()[0] - chunked_bytes
+        tracemalloc.stop()
+        self.assertLess(5*columnar_bytes, chunked_bytes, "Columnar storage should use a fraction of the memory")
+        self.assertEqual(WorldRegistry.estimate_world_size(columnar_world), columnar_world.storage.get_memory_size(),
+                         "The memory of a columnar world should be the size of its columns")
+
+        for _ in range(200):
+            x, y = random.randint(-50, 50), random.randint(-50, 50)
+            for max_price in (None, 20):
+                self.assertEqual([(event.identifier, distance) for event, distance in
+                                  columnar_world.query_nearest_events(x, y, 5, max_price=max_price)],
+                                 [(event.identifier, distance) for event, distance in
+                                  chunked_world.query_nearest_events(x, y, 5, max_price=max_price)],
+                                 "Columnar and chunked storage returned different nearest events")
+
+    def test_multiple_events(self):
+        """
+        tests worlds with more than one event at a single position
+        """
+
+        indexed_world = GridWorld(generate=False, spatial_index=BucketGridIndex(4))
+        for world in (self.world, indexed_world):
+            for identifier in range(10):
+                world.register_event(Event(identifier, []), 3, 3)
+            world.register_event(Event(10, []), 0, 1)
+            world.register_event(Event(11, []), -1, 0)
+            world.register_event(Event(12, []), 0, 0)
+            world.register_event(Event(13, []), 0, 0)
+
+            self.assertEqual(world.get_event(3, 3).identifier, 0, "The first registered event should be returned")
+            self.assertEqual([event.identifier for event in world.get_events(3, 3)], list(range(10)),
+                             "Wrong events returned at a position with multiple events")
+            self.assertEqual(world.get_events(5, 5), [], "Events returned at an empty position")
+
+            self.assertEqual(world.get_nearest_positions(0, 0, 2), [(0, 0)],
+                             "Search should stop once a single position holds enough events")
+            self.assertEqual(world.get_nearest_positions(0, 0, 3), [(0, 0), (0, 1)],
+                             "Search should stop once the found positions hold enough events")
+            self.assertEqual(world.get_nearest_positions(3, 2, 12), [(3, 3), (0, 1), (0, 0)],
+                             "Wrong positions returned when searching for multiple events")
+
+            nearest_events = world.query_nearest_events(3, 2, 12)
+            self.assertEqual([event.identifier for event, _ in nearest_events], list(range(11)) + [12],
+                             "Wrong events returned when searching for multiple events")
+            self.assertEqual([distance for _, distance in nearest_events], [1]*10 + [4, 5],
+                             "Wrong distances returned when searching for multiple events")
+
+        try:
+            import numpy
+        except ImportError:
+            return
+
+        identifiers, distances = indexed_world.get_nearest_events_batch([(3, 2), (0, 0)], 12)
+        self.assertEqual(identifiers[0].tolist(), list(range(11)) + [12], "Wrong events returned by batch query")
+        self.assertEqual(identifiers[1].tolist(), [12, 13, 10, 11] + list(range(8)),
+                         "Wrong events returned by batch query")
+
+    def test_price_filter(self):
+        """
+        tests the nearest events search filtered by ticket prices
+        """
+
+        event = Event(1, (10, 50, 20))
+        self.assertTrue(event.has_ticket_in_range(), "Event with tickets should match an unbounded range")
+        self.assertTrue(event.has_ticket_in_range(15, 25), "Event has a ticket in the price band")
+        self.assertFalse(event.has_ticket_in_range(25, 45), "Event has no ticket in the price band")
+        self.assertFalse(event.has_ticket_in_range(max_price=9.99), "Event has no ticket under the price")
+        self.assertFalse(Event(2, ()).has_ticket_in_range(max_price=100), "Event without tickets should not match")
+
+        random = Random(11)
+        indexed_world = GridWorld(generate=False, spatial_index=BucketGridIndex(4))
+        size = GridWorld.grid_size
+        positions = [(x, y) for x in range(-size, size + 1) for y in range(-size, size + 1)]
+        events = []
+        for identifier in range(150):
+            x, y = random.choice(positions)
+            tickets = tuple(round(random.uniform(1, 100), 2) for _ in range(random.randint(0, 3)))
+            self.world.register_event(Event(identifier, tickets), x, y)
+            indexed_world.register_event(Event(identifier, tickets), x, y)
+            events.append((identifier, tickets, x, y))
+
+        for min_price, max_price in ((None, 10), (40, 45), (95, None), (60, 50)):
+            for x, y in random.sample(positions, 20):
+                # the expected distances are computed by sorting all matching events by their distance
+                matching = [(self.world.get_manhattan_distance(x, y, event_x, event_y), identifier)
+                            for identifier, tickets, event_x, event_y in events
+                            if any((min_price is None or ticket >= min_price) and
+                                   (max_price is None or ticket <= max_price) for ticket in tickets)]
+                expected = sorted(matching)[:5]
+
+                for world in (self.world, indexed_world):
+                    nearest_events = world.query_nearest_events(x, y, 5, min_price, max_price)
+                    self.assertEqual([distance for _, distance in nearest_events],
+                                     [distance for distance, _ in expected],
+                                     "Wrong event distances returned when filtering by price")
+                    for event, _ in nearest_events:
+                        self.assertTrue(event.has_ticket_in_range(min_price, max_price),
+                                        "Event without a ticket in the price range returned")
+
+                self.assertEqual(indexed_world.get_nearest_positions(x, y, 5, min_price, max_price),
+                                 self.world.get_nearest_positions(x, y, 5, min_price, max_price),
+                                 "Spatial index and Breadth-First-Search returned different positions")
+
+    def test_time_windows(self):
+        """
+        tests the nearest upcoming events queries and the expiry of events which ended
+        """
+
+        with self.assertRaises(ValueError):
+            Event(1, [10], start_time=100, end_time=50)
+
+        event = Event(1, [10], start_time=100, end_time=200)
+        self.assertTrue(event.is_happening(150, 160), "An event happening during the window was not matched")
+        self.assertTrue(event.is_happening(200, 300), "An event ending at the start of the window was not matched")
+        self.assertFalse(event.is_happening(201, 300), "An event which ended before the window was matched")
+        self.assertFalse(event.is_happening(None, 99), "An event which starts after the window was matched")
+        self.assertTrue(Event(2, []).is_happening(0, 10), "An event without a time window was not matched")
+
+        hour = 3600
+        world = GridWorld(generate=False, spatial_index=BucketGridIndex(4))
+        world.register_event(Event(1, [10], 0, 2*hour), 1, 0)
+        world.register_event(Event(2, [20], 5*hour, 6*hour), 2, 0)
+        world.register_event(Event(3, [30]), 3, 0)
+        world.register_event(Event(4, [40], 10*hour, 11*hour), 0, 0)
+        self.assertEqual([event.identifier for event, _ in world.query_upcoming_events(0, 0, hour, 1)], [1, 3],
+                         "Wrong events happening within the next hour")
+        self.assertEqual([event.identifier for event, _ in world.query_upcoming_events(0, 0, 3*hour, 1, 2)], [3],
+                         "Wrong events happening between the 3rd and the 4th hour")
+        self.assertEqual([event.identifier for event, _ in world.query_upcoming_events(0, 0, 4*hour, 6, 5, 15)],
+                         [4, 2, 3], "Wrong events in the price range happening within the next 6 hours")
+        with self.assertRaises(ValueError):
+            world.query_upcoming_events(0, 0, 0, -1)
+
+        # the index prunes buckets by their time windows and returns the same results as Breadth-First-Search
+        random = Random(21)
+        index_world = GridWorld(generate=False, spatial_index=BucketGridIndex(4), query_cache=QueryCache())
+        events = []
+        for identifier in range(150):
+            start_time = random.randint(0, 100*hour)
+            end_time = start_time + random.randint(0, 10*hour)
+            events.append((identifier, random.randint(-10, 10), random.randint(-10, 10), start_time, end_time))
+        self.world.register_events((Event(identifier, [10], start_time, end_time), x, y)
+                                   for identifier, x, y, start_time, end_time in events)
+        index_world.register_events((Event(identifier, [10], start_time, end_time), x, y)
+                                    for identifier, x, y, start_time, end_time in events)
+        for _ in range(50):
+            x, y, k = random.randint(-10, 10), random.randint(-10, 10), random.randint(1, 8)
+            now, hours = random.randint(0, 100*hour), random.randint(0, 12)
+            self.assertEqual([(event.identifier, distance)
+                              for event, distance in index_world.query_upcoming_events(x, y, now, hours, k)],
+                             [(event.identifier, distance)
+                              for event, distance in self.world.query_upcoming_events(x, y, now, hours, k)],
+                             "The index and Breadth-First-Search returned different upcoming events")
+
+        # expired events are removed from the storage, the index and the cache
+        now = 50*hour
+        expired = index_world.expire_events(now)
+        self.assertEqual(sorted(event.identifier for event in expired),
+                         sorted(identifier for identifier, _, _, _, end_time in events if end_time < now),
+                         "Wrong expired events")
+        self.assertEqual([event.end_time for event in expired], sorted(event.end_time for event in expired),
+                         "Expired events were not ordered by their end times")
+        self.assertEqual(index_world.expire_events(now), [], "Events were expired twice")
+        self.assertTrue(all(event.end_time >= now for event, _ in index_world.query_nearest_events(0, 0, 200)),
+                        "An expired event is still returned")
+        self.assertEqual(sum(sum(positions.values()) for positions in index_world.spatial_index.buckets.values()),
+                         len(index_world.event_positions), "The index still holds expired events")
+
+        # a removed event is not expired again, even if its identifier is in use by a new event
+        identifier = next(identifier for identifier, _, _, _, end_time in events if end_time >= 60*hour)
+        index_world.remove_event(identifier)
+        index_world.register_event(Event(identifier, [10], 0, 200*hour), 0, 0)
+        self.assertNotIn(identifier, [event.identifier for event in index_world.expire_events(100*hour)],
+                         "A new event was expired with the end time of a removed event")
+
+    def test_range_queries(self):
+        """
+        tests the radius and rectangle range queries
+        """
+
+        with self.assertRaises(InvalidPositionError):
+            self.world.get_events_within_distance(self.world.grid_size + 1, 0, 5)
+
+        random = Random(5)
+        worlds = (self.world, GridWorld(generate=False, spatial_index=BucketGridIndex(3)),
+                  GridWorld(generate=False, storage=ChunkedStorage(4)),
+                  GridWorld(generate=False, storage=ColumnarStorage(GridWorld.grid_size)))
+        size = GridWorld.grid_size
+        positions = [(x, y) for x in range(-size, size + 1) for y in range(-size, size + 1)]
+        events = []
+        for identifier in range(120):
+            x, y = random.choice(positions)
+            for world in worlds:
+                world.register_event(Event(identifier, []), x, y)
+            events.append((identifier, x, y))
+
+        for _ in range(20):
+            x0, x1 = sorted(random.randint(-size - 3, size + 3) for _ in range(2))
+            y0, y1 = sorted(random.randint(-size - 3, size + 3) for _ in range(2))
+            expected = sorted(event for event in events if x0 <= event[1] <= x1 and y0 <= event[2] <= y1)
+            for world in worlds:
+                self.assertEqual(sorted((event.identifier, x, y)
+                                        for event, x, y in world.get_events_in_box(x0, y0, x1, y1)),
+                                 expected, "Wrong events returned by the rectangle query")
+
+            x, y = random.choice(positions)
+            radius = random.randint(0, 12)
+            expected = sorted((identifier, world.get_manhattan_distance(x, y, event_x, event_y))
+                              for identifier, event_x, event_y in events
+                              if world.get_manhattan_distance(x, y, event_x, event_y) <= radius)
+            for world in worlds:
+                self.assertEqual(sorted((event.identifier, distance)
+                                        for event, distance in world.get_events_within_distance(x, y, radius)),
+                                 expected, "Wrong events returned by the radius query")
+
+        self.assertEqual(list(self.world.get_events_in_box(5, 5, 4, 4)), [], "Empty rectangle should return no events")
+
+    def test_dynamic_updates(self):
+        """
+        tests removing, moving and updating the tickets of events
+        """
+
+        with self.assertRaises(UnknownIdentifierError):
+            self.world.remove_event(1)
+
+        self.world.register_event(self.event, 0, 0)
+        with self.assertRaises(InvalidPositionError):
+            self.world.move_event(1, 0, self.world.grid_size + 1)
+        with self.assertRaises(InvalidPriceError):
+            self.world.update_tickets(1, (5, -1))
+
+        self.world.update_tickets(1, (5, 3.5))
+        self.assertEqual(self.event.get_minimum_ticket_price(), Event.currency + "03.50",
+                         "Minimum ticket price not updated with the tickets")
+        self.world.move_event(1, 2, -3)
+        self.assertEqual(self.world.get_event_by_id(1), (self.event, 2, -3), "Event not moved to the new position")
+        self.assertIsNone(self.world.get_event(0, 0), "Moved event still at the old position")
+        self.assertEqual(self.world.remove_event(1), self.event, "Wrong event removed")
+        self.assertEqual(self.world.get_nearest_positions(0, 0, 5), [], "Removed event still found by the search")
+        self.world.register_event(Event(1, []), 0, 0)  # the identifier of a removed event can be reused
+
+        random = Random(13)
+        worlds = (GridWorld(generate=False), GridWorld(generate=False, spatial_index=BucketGridIndex(4)),
+                  GridWorld(generate=False, spatial_index=BucketGridIndex(2), storage=ChunkedStorage(4)),
+                  GridWorld(generate=False, storage=ColumnarStorage(GridWorld.grid_size)))
+        size = GridWorld.grid_size
+        positions = [(x, y) for x in range(-size, size + 1) for y in range(-size, size + 1)]
+        identifiers = []
+        for step in range(400):
+            operation = random.random()
+            tickets = tuple(round(random.uniform(1, 100), 2) for _ in range(random.randint(0, 3)))
+            x, y = random.choice(positions)
+            if operation < 0.4 or len(identifiers) == 0:
+                identifiers.append(step)
+                for world in worlds:
+                    world.register_event(Event(step, tickets), x, y)
+            elif operation < 0.6:
+                identifier = identifiers.pop(random.randrange(len(identifiers)))
+                for world in worlds:
+                    world.remove_event(identifier)
+            elif operation < 0.8:
+                identifier = random.choice(identifiers)
+                for world in worlds:
+                    world.move_event(identifier, x, y)
+            else:
+                identifier = random.choice(identifiers)
+                for world in worlds:
+                    world.update_tickets(identifier, tickets)
+
+            x, y = random.choice(positions)
+            max_price = random.choice((None, 20))
+            expected = [(event.identifier, distance)
+                        for event, distance in worlds[0].query_nearest_events(x, y, 5, max_price=max_price)]
+            for world in worlds[1:]:
+                self.assertEqual([(event.identifier, distance)
+                                  for event, distance in world.query_nearest_events(x, y, 5, max_price=max_price)],
+                                 expected,
+                                 "Spatial index not updated correctly after step {0}".format(step))
+
+        for identifier in identifiers:
+            worlds[2].remove_event(identifier)
+            worlds[3].remove_event(identifier)
+        self.assertEqual(len(worlds[2].storage.regions), 0, "Regions should be released when their events are removed")
+        self.assertEqual((len(worlds[3].storage.rows), len(worlds[3].storage.heads)), (0, 0),
+                         "Rows and positions should be dropped when their events are removed")
+        self.assertEqual(len(worlds[2].spatial_index.buckets), 0, "Buckets should be dropped when they are empty")
+        self.assertEqual(len(worlds[2].spatial_index.bucket_prices), 0, "Bucket price ranges should be dropped")
+
+    def test_bulk_generation(self):
+        """
+        tests the bulk generation of random data
+        """
+
+        with self.assertRaises(DuplicateIdentifierError):
+            self.world.register_events([(Event(1, []), 0, 0), (Event(1, []), 1, 1)])
+        with self.assertRaises(InvalidPositionError):
+            self.world.register_events([(Event(1, []), 0, 0), (Event(2, []), 0, self.world.grid_size + 1)])
+        self.assertEqual(len(self.world.unique_identifiers), 0, "No event should be registered if one is invalid")
+
+        world = GridWorld(generate=False)
+        world.generate_data(number_of_events=300, seed=1)
+        same_world = GridWorld(generate=False)
+        same_world.generate_data(number_of_events=300, seed=1)
+
+        self.assertEqual(len(world.event_positions), 300, "Wrong number of events generated")
+        self.assertEqual(len(set(world.event_positions.values())), 300, "Events generated at the same position")
+        self.assertEqual(world.event_positions, same_world.event_positions,
+                         "Different positions generated with the same seed")
+        for identifier in world.event_positions:
+            event = world.get_event_by_id(identifier)[0]
+            self.assertEqual(event.tickets, same_world.get_event_by_id(identifier)[0].tickets,
+                             "Different tickets generated with the same seed")
+            self.assertEqual(len(set(event.tickets)), len(event.tickets), "Ticket prices of an event are not unique")
+            self.assertLessEqual(len(event.tickets), DataGenerator.max_num_of_tickers + 1, "Too many tickets generated")
+            for ticket in event.tickets:
+                self.assertTrue(DataGenerator.min_ticket_price <= ticket <= DataGenerator.max_ticket_price,
+                                "Ticket price out of range")
+                self.assertEqual(ticket, round(ticket, 2), "Ticket price not rounded to 2 digits")
+
+        with self.assertRaises(ValueError):
+            GridWorld(generate=False).generate_data(number_of_events=(2*GridWorld.grid_size + 1)**2 + 1, seed=1)
+
+    def test_data_loading(self):
+        """
+        tests loading events from CSV and JSONL files, with invalid rows reported instead of stopping the load
+        """
+
+        self.world.register_event(Event(7, []), 0, 0)
+        lines = ["identifier,x,y,prices", "1,0,0,10.5,20", "2,1,-1", "3,0,0,-5", "4,a,0", "1,2,2,3.0",
+                 "7,2,2", "5,{0},0".format(self.world.grid_size + 1), "6,-2,3,1.25"]
+        report = self.world.load_data(StringIO("\n".join(lines)), file_format="csv", chunk_size=2, max_errors=3)
+
+        self.assertEqual(report.loaded, 3, "Wrong number of loaded events")
+        self.assertEqual(report.rejected, 5, "Wrong number of rejected rows")
+        self.assertEqual([line_number for line_number, _ in report.errors], [4, 5, 6], "Wrong reported rows")
+        self.assertEqual([type(error) for _, error in report.errors],
+                         [InvalidPriceError, ValueError, DuplicateIdentifierError], "Wrong reported errors")
+        self.assertEqual(tuple(self.world.get_event_by_id(1)[0].tickets), (10.5, 20.0), "Wrong loaded tickets")
+        self.assertEqual(self.world.get_event_by_id(6)[1:], (-2, 3), "Wrong loaded position")
+        with self.assertRaises(ValueError):
+            self.world.load_data(StringIO("\n".join(lines)), file_format="csv", chunk_size=0)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "events.jsonl")
+        with open(path, "w") as events_file:
+            events_file.write('{"id": 10, "x": 1, "y": 1, "tickets": [5]}\n\n{"id": 11, "x": 1.5, "y": 0}\n'
+                              '{"id": "12", "x": 0, "y": 0}\n{"x": 0, "y": 0}\nnot json\n{"id": 13, "x": 0, "y": 1}\n'
+                              '{"id": 14, "x": 2, "y": 2, "start_time": 100, "end_time": 50}\n'
+                              '{"id": 15, "x": 2, "y": 2, "start_time": 0, "end_time": 10}\n')
+
+        world = GridWorld(generate=False)
+        report = world.load_data(path)
+        self.assertEqual(report.loaded, 3, "Wrong number of loaded events")
+        self.assertEqual([line_number for line_number, _ in report.errors], [3, 4, 5, 6, 8], "Wrong reported rows")
+        for (_, error), error_type in zip(report.errors, (InvalidPositionError, TypeError, ValueError, ValueError,
+                                                          ValueError)):
+            self.assertIsInstance(error, error_type, "Wrong reported error")
+        self.assertEqual(world.query_nearest_events(0, 0, 2)[0][0].identifier, 13, "Loaded events not indexed")
+        self.assertEqual(world.get_event_by_id(15)[0].time_range, (0, 10), "Wrong loaded time window")
+
+        with self.assertRaises(ValueError):
+            world.load_data(os.path.join(directory, "events.txt"))
+
+    def test_query_cache(self):
+        """
+        tests the cache of nearest positions queries, cached results must stay equal to searched results after changes
+        """
+
+        cache = QueryCache(max_size=2)
+        cache.put("a", 0, 0, 1, [(0, 0)])
+        cache.put("b", 5, 5, 0, [(5, 5)])
+        self.assertEqual(cache.get("a"), [(0, 0)], "Wrong cached result")
+        cache.put("c", 9, 9, None, [])
+        self.assertIsNone(cache.get("b"), "The least recently used result was not evicted")
+        self.assertEqual((cache.hits, cache.misses), (1, 1), "Wrong cache counters")
+        cache.invalidate_position(2, 0)
+        self.assertEqual(list(cache.entries), ["a"], "Only the results affected by a change should be invalidated")
+        cache.invalidate_positions([(1, 0), (3, 3)])
+        self.assertEqual(len(cache), 0, "A result affected by a change was not invalidated")
+        with self.assertRaises(ValueError):
+            QueryCache(max_size=0)
+
+        random = Random(13)
+        for spatial_index in (None, BucketGridIndex(bucket_size=4)):
+            world = GridWorld(generate=False, spatial_index=spatial_index, query_cache=QueryCache(max_size=50))
+            reference = GridWorld(generate=False)
+            events = [(Event(i, [random.randint(1, 20)]), random.randint(-10, 10), random.randint(-10, 10))
+                      for i in range(40)]
+            world.register_events(events)
+            reference.register_events((Event(event.identifier, event.tickets), i, j) for event, i, j in events)
+
+            queries = [(random.randint(-10, 10), random.randint(-10, 10), random.randint(0, 6)) for _ in range(20)]
+            for step in range(60):
+                for x, y, k in queries:
+                    self.assertEqual(world.get_nearest_positions(x, y, k), reference.get_nearest_positions(x, y, k),
+                                     "Cached result differs from the searched result")
+                    self.assertEqual(world.get_nearest_positions(x, y, k, 5, 15),
+                                     reference.get_nearest_positions(x, y, k, 5, 15),
+                                     "Cached filtered result differs from the searched result")
+
+                identifier = random.choice(sorted(world.event_positions))
+                i, j = random.randint(-10, 10), random.randint(-10, 10)
+                if step % 3 == 0:
+                    world.move_event(identifier, i, j)
+                    reference.move_event(identifier, i, j)
+                elif step % 3 == 1:
+                    world.update_tickets(identifier, [random.randint(1, 20)])
+                    reference.update_tickets(identifier, world.get_event_by_id(identifier)[0].tickets)
+                else:
+                    world.remove_event(identifier)
+                    reference.remove_event(identifier)
+                    world.register_event(Event(identifier, [3]), i, j)
+                    reference.register_event(Event(identifier, [3]), i, j)
+
+            self.assertGreater(world.query_cache.hits, 0, "The cache was never used")
+            self.assertGreater(world.query_cache.invalidations, 0, "The cache was never invalidated")
+
+    def test_nearest_table(self):
+        """
+        tests the precomputed table of nearest positions, looked up results must stay equal to searched results
+        """
+
+        with self.assertRaises(ValueError):
+            self.world.precompute_nearest_positions(0)
+
+        self.world.precompute_nearest_positions(3)
+        self.assertEqual(self.world.get_nearest_positions(0, 0, 3), [], "Wrong result for an empty world")
+
+        random = Random(21)
+        reference = GridWorld(generate=False)
+        identifier = 0
+        for step in range(120):
+            if step % 40 == 0:
+                # a batch of events, some of them at the same position
+                events = [(Event(identifier + i, []), random.randint(-10, 10), random.randint(-3, 3)) for i in range(30)]
+                self.world.register_events(events)
+                reference.register_events((Event(event.identifier, []), i, j) for event, i, j in events)
+                identifier += len(events)
+            elif step % 3 == 0:
+                i, j = random.randint(-10, 10), random.randint(-10, 10)
+                self.world.register_event(Event(identifier, []), i, j)
+                reference.register_event(Event(identifier, []), i, j)
+                identifier += 1
+            elif step % 3 == 1:
+                removed = random.choice(sorted(reference.event_positions))
+                self.world.remove_event(removed)
+                reference.remove_event(removed)
+            else:
+                moved = random.choice(sorted(reference.event_positions))
+                i, j = random.randint(-10, 10), random.randint(-10, 10)
+                self.world.move_event(moved, i, j)
+                reference.move_event(moved, i, j)
+
+            for _ in range(10):
+                x, y, k = random.randint(-10, 10), random.randint(-10, 10), random.randint(0, 3)
+                self.assertEqual(self.world.get_nearest_positions(x, y, k), reference.get_nearest_positions(x, y, k),
+                                 "Looked up result differs from the searched result")
+
+        self.assertEqual(self.world.get_nearest_positions(4, 4, 6), reference.get_nearest_positions(4, 4, 6),
+                         "Queries for more events than the table holds should be searched")
+
+    def test_metrics(self):
+        """
+        tests the measurements of queries and changes sent to a metrics sink
+        """
+
+        collector = MetricsCollector(max_records=3)
+        world = GridWorld(generate=False, metrics=collector)
+        area = (2*world.grid_size + 1)**2
+
+        world.get_nearest_positions(0, 0, 1)
+        record = collector.records[-1]
+        self.assertEqual((record.method, record.cells_visited, record.nodes_expanded, record.fringe_size,
+                          record.events_found), ("bfs", area, area, 0, 0), "Wrong measurements of an empty world")
+
+        world.register_event(Event(1, [5]), 1, 0)
+        world.register_events([(Event(2, []), 0, 0), (Event(3, [20]), 0, 0)])
+        world.get_nearest_positions(0, 0, 3)
+        record = collector.records[-1]
+        self.assertEqual((record.cells_visited, record.nodes_expanded, record.fringe_size, record.positions_found,
+                          record.events_found), (2, 1, 3, 2, 3), "Wrong measurements of a query")
+        world.get_nearest_positions(0, 0, 1, min_price=10)
+        self.assertEqual((collector.records[-1].cells_visited, collector.records[-1].events_found), (1, 1),
+                         "Wrong measurements of a filtered query")
+        self.assertGreater(collector.records[-1].seconds, 0, "The wall time was not measured")
+
+        world.move_event(1, 2, 2)
+        world.update_tickets(1, [7])
+        world.remove_event(1)
+        self.assertEqual(collector.changes, {"register": 3, "move": 1, "update_tickets": 1, "remove": 1},
+                         "Wrong counters of changes")
+        self.assertEqual(collector.num_queries, 3, "Wrong number of queries")
+        self.assertEqual(len(collector.records), 3, "Too many records kept")
+        self.assertEqual(collector.get_slowest_queries(1)[0].cells_visited, area, "Wrong slowest query")
+
+        methods = []
+        changes = []
+        world = GridWorld(generate=False, spatial_index=BucketGridIndex(), query_cache=QueryCache(),
+                          metrics=CallbackSink(lambda record: methods.append(record.method),
+                                               lambda kind, count: changes.append((kind, count))))
+        world.generate_data(number_of_events=20, seed=2)
+        world.get_nearest_positions(0, 0, 2)
+        world.get_nearest_positions(0, 0, 2)
+        world.precompute_nearest_positions(2)
+        world.get_nearest_positions(1, 0, 2)
+        self.assertEqual(methods, ["index", "cache", "table"], "Wrong ways of answering the queries")
+        self.assertEqual(changes, [("register", 20)], "Wrong changes reported")
+
+    def test_travel_costs(self):
+        """
+        tests the search of the events with the cheapest travel costs over a cost layer with regions and obstacles
+        """
+
+        with self.assertRaises(ValueError):
+            CostLayer(self.world.grid_size, default_cost=0)
+        with self.assertRaises(ValueError):
+            GridWorld(generate=False, cost_layer=CostLayer(self.world.grid_size + 1))
+        with self.assertRaises(ValueError):
+            self.world.get_travel_costs(0, 0, 1)
+
+        layer = CostLayer(self.world.grid_size)
+        with self.assertRaises(InvalidPositionError):
+            layer.set_cost(0, self.world.grid_size + 1, 2)
+        with self.assertRaises(ValueError):
+            layer.set_region_cost(0, 0, 1, 1, -1)
+
+        # with the default costs the results are the same as the results of Breadth-First-Search
+        world = GridWorld(generate=False, cost_layer=layer, query_cache=QueryCache())
+        world.generate_data(number_of_events=40, seed=4)
+        self.world.generate_data(number_of_events=40, seed=4)
+        random = Random(4)
+        for _ in range(50):
+            x, y, k = random.randint(-10, 10), random.randint(-10, 10), random.randint(0, 8)
+            self.assertEqual(world.get_nearest_positions(x, y, k), self.world.get_nearest_positions(x, y, k),
+                             "Uniform travel costs should give the same results as Breadth-First-Search")
+
+        world = GridWorld(generate=False, cost_layer=layer, query_cache=QueryCache())
+        world.register_event(Event(1, [10]), 3, 0)
+        world.register_event(Event(2, [20]), -4, 0)
+        self.assertEqual(world.get_travel_costs(0, 0, 1), [((3, 0), 3)], "Wrong cheapest event")
+
+        # a wall between the input position and the first event, with a single gap at the top of the world
+        layer.set_region_cost(2, -10, 2, 9, float("inf"))
+        self.assertEqual(world.get_nearest_positions(0, 0, 1), [(-4, 0)], "The cached result was not refreshed")
+        self.assertEqual(world.get_travel_costs(0, 0, 2), [((-4, 0), 4), ((3, 0), 23)], "Wrong detour around a wall")
+
+        # an expensive region around the second event
+        layer.set_region_cost(-5, -1, -3, 1, 10)
+        self.assertEqual(world.get_travel_costs(0, 0, 2), [((-4, 0), 22), ((3, 0), 23)], "Wrong cost of a region")
+        self.assertEqual([(event.identifier, cost) for event, cost in world.query_nearest_events(0, 0, 5)],
+                         [(2, 22), (1, 23)], "Wrong nearest events")
+        self.assertEqual(world.query_nearest_events(0, 0, 5, min_price=15)[0][0].identifier, 2,
+                         "Wrong nearest filtered event")
+
+        layer.set_cost(2, 10, float("inf"))
+        self.assertEqual(world.get_travel_costs(0, 0, 5), [((-4, 0), 22)], "An unreachable event was returned")
+
+        # events with the same travel cost are returned in the order of the Breadth-First-Search, the closer first
+        layer = CostLayer(self.world.grid_size)
+        layer.set_cost(0, 3, 2)
+        world = GridWorld(generate=False, cost_layer=layer)
+        world.register_event(Event(1, [10]), -2, -2)
+        world.register_event(Event(2, [10]), 0, 3)
+        self.assertEqual(world.get_travel_costs(0, 0, 1), [((0, 3), 4)], "Equal travel costs not ordered by distance")
+
+        # the results are the same as the ones of Dijkstra's algorithm with the ties broken by the search key
+        random = Random(23)
+        for _ in range(15):
+            layer = CostLayer(self.world.grid_size)
+            for _ in range(40):
+                layer.set_cost(random.randint(-10, 10), random.randint(-10, 10), random.choice((2, 3, float("inf"))))
+            world = GridWorld(generate=False, cost_layer=layer)
+            world.generate_data(number_of_events=25, seed=random.randint(0, 1000))
+
+            x, y, k = random.randint(-10, 10), random.randint(-10, 10), random.randint(1, 6)
+            cheapest = {(x, y): 0}
+            fringe = [(0, x, y)]
+            while len(fringe) > 0:
+                cost, i, j = heappop(fringe)
+                if cost > cheapest[(i, j)]:
+                    continue
+                for i1, j1 in ((i + 1, j), (i, j + 1), (i - 1, j), (i, j - 1)):
+                    if max(abs(i1), abs(j1)) > self.world.grid_size:
+                        continue
+                    new_cost = cost + layer.get_cost(i1, j1)
+                    if new_cost < cheapest.get((i1, j1), float("inf")):
+                        cheapest[(i1, j1)] = new_cost
+                        heappush(fringe, (new_cost, i1, j1))
+
+            expected = sorted((cheapest[position], get_search_key(x, y, *position), position)
+                              for position in world.event_positions.values() if position in cheapest)
+            self.assertEqual(world.get_travel_costs(x, y, k), [(position, cost) for cost, _, position in expected[:k]],
+                             "Travel costs differ from Dijkstra's algorithm")
+
+        # the distances to the nearest events are updated incrementally when the events change
+        layer = CostLayer(self.world.grid_size)
+        layer.set_region_cost(-3, -6, 4, -2, 2.5)
+        layer.set_region_cost(0, 1, 0, 8, float("inf"))
+        world = GridWorld(generate=False, cost_layer=layer, metrics=MetricsCollector())
+        world.generate_data(number_of_events=30, seed=19)
+        random = Random(19)
+        for step in range(60):
+            identifier = random.choice(list(world.event_positions))
+            change = random.randint(0, 2)
+            if change == 0:
+                world.remove_event(identifier)
+            elif change == 1:
+                world.move_event(identifier, random.randint(-10, 10), random.randint(-10, 10))
+            else:
+                world.register_event(Event(1000 + step, [10]), random.randint(-10, 10), random.randint(-10, 10))
+
+            fresh_world = GridWorld(generate=False, cost_layer=layer)
+            for event_identifier, (x, y) in world.event_positions.items():
+                fresh_world.register_event(Event(event_identifier, [10]), x, y)
+            x, y, k = random.randint(-10, 10), random.randint(-10, 10), random.randint(1, 6)
+            self.assertEqual(world.get_travel_costs(x, y, k), fresh_world.get_travel_costs(x, y, k),
+                             "Wrong travel costs after the events changed")
+            if world.stale_distances == 0:
+                self.assertEqual(world.event_distances, fresh_world.get_event_distances(),
+                                 "Wrong distances to the nearest events after new events were registered")
+        world.get_nearest_positions(0, 0, 3)
+        self.assertEqual(world.metrics.records[-1].method, "astar", "Wrong method of a travel cost query")
+
+        # snapshots keep the travel costs, so parallel queries see the same wall, batch queries are not supported
+        layer = CostLayer(self.world.grid_size)
+        layer.set_region_cost(1, -10, 1, 10, float("inf"))
+        world = GridWorld(generate=False, cost_layer=layer)
+        world.register_event(Event(1, [10]), 2, 0)
+        world.register_event(Event(2, [20]), -5, 0)
+        self.assertEqual([(event.identifier, cost) for event, cost in world.query_nearest_events(0, 0, 1)], [(2, 5)],
+                         "An event behind a wall was returned")
+        with self.assertRaises(ValueError):
+            world.get_nearest_events_batch([(0, 0)], 1)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "costs.snapshot")
+        WorldSnapshot.save(world, path)
+        loaded_world = WorldSnapshot.load(path)
+        self.assertEqual(loaded_world.cost_layer.get_cost(1, 3), float("inf"), "The travel costs were not saved")
+        self.assertEqual(loaded_world.get_travel_costs(0, 0, 2), world.get_travel_costs(0, 0, 2),
+                         "Loaded world returned different travel costs")
+        with ParallelQueryRunner(snapshot_path=path, processes=1) as runner:
+            self.assertEqual(runner.query_nearest_events([(0, 0)], 1), [[(2, 5)]],
+                             "Parallel queries ignored the travel costs")
+
+    def test_snapshot(self):
+        """
+        tests saving a world to a snapshot file and loading it back
+        """
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "world.snapshot")
+
+        # an empty world can be saved and loaded too
+        WorldSnapshot.save(self.world, path)
+        self.assertEqual(WorldSnapshot.load(path).get_nearest_positions(0, 0, 5), [],
+                         "Loaded empty world returned events")
+
+        world = GridWorld(generate=False, spatial_index=BucketGridIndex(4))
+        world.generate_data(number_of_events=200, seed=9)
+        random = Random(9)
+        for identifier in range(200, 230):
+            x, y = random.randint(-3, 3), random.randint(-3, 3)
+            start_time = random.choice((None, random.randint(0, 100)))
+            world.register_event(Event(identifier, (random.randint(1, 100),), start_time,
+                                       random.choice((None, random.randint(100, 200)))), x, y)
+        WorldSnapshot.save(world, path)
+
+        loaded_world = WorldSnapshot.load(path)
+        with self.assertRaises(ReadOnlyWorldError):
+            loaded_world.register_event(Event(1000, []), 0, 0)
+        with self.assertRaises(ReadOnlyWorldError):
+            loaded_world.remove_event(0)
+
+        size = GridWorld.grid_size
+        for x, y in [(random.randint(-size, size), random.randint(-size, size)) for _ in range(30)]:
+            for min_price, max_price in ((None, None), (None, 10), (50, 55)):
+                self.assertEqual([(event.identifier, list(event.tickets), distance) for event, distance in
+                                  loaded_world.query_nearest_events(x, y, 8, min_price, max_price)],
+                                 [(event.identifier, list(event.tickets), distance) for event, distance in
+                                  world.query_nearest_events(x, y, 8, min_price, max_price)],
+                                 "Loaded world returned different nearest events")
+            self.assertEqual([(event.identifier, event.time_range) for event, _ in
+                              loaded_world.query_upcoming_events(x, y, 150, 0, 8)],
+                             [(event.identifier, event.time_range) for event, _ in
+                              world.query_upcoming_events(x, y, 150, 0, 8)],
+                             "Loaded world returned different upcoming events")
+            self.assertEqual(sorted(event.identifier for event, _ in loaded_world.get_events_within_distance(x, y, 4)),
+                             sorted(event.identifier for event, _ in world.get_events_within_distance(x, y, 4)),
+                             "Loaded world returned different events in range")
+
+        for identifier in (0, 57, 229):
+            event, x, y = loaded_world.get_event_by_id(identifier)
+            self.assertEqual((event.identifier, x, y), (identifier,) + world.get_event_by_id(identifier)[1:],
+                             "Loaded world returned a wrong event by identifier")
+        with self.assertRaises(UnknownIdentifierError):
+            loaded_world.get_event_by_id(1000)
+
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        if numpy is not None:
+            points = [(x, y) for x in range(-size, size + 1, 3) for y in range(-size, size + 1, 3)]
+            for expected, result in zip(world.get_nearest_events_batch(points, 6),
+                                        loaded_world.get_nearest_events_batch(points, 6)):
+                self.assertEqual(result.tolist(), expected.tolist(), "Loaded world returned different batch results")
+            self.assertFalse(any(array.flags.owndata or array.flags.writeable for array in loaded_world.event_arrays),
+                             "The arrays for the batch queries were copied instead of mapped from the file")
+
+        # the loaded world has the grid size of the saved world
+        small_world = GridWorld(generate=False, grid_size=3)
+        small_world.register_event(Event(1234, [5]), 3, -3)
+        small_path = os.path.join(directory, "small.snapshot")
+        WorldSnapshot.save(small_world, small_path)
+        loaded_world = WorldSnapshot.load(small_path)
+        self.assertEqual(loaded_world.grid_size, 3, "Wrong grid size of the loaded world")
+        self.assertEqual([(event.get_id(), distance) for event, distance in loaded_world.query_nearest_events(0, 0)],
+                         [("1234", 6)], "Wrong nearest events of the loaded world")
+        with self.assertRaises(InvalidPositionError):
+            loaded_world.get_nearest_positions(4, 0, 1)
+
+        # buckets outside of the world are never found, even if their keys collide with the keys of real buckets
+        edge_world = GridWorld(generate=False, spatial_index=BucketGridIndex(1), grid_size=7)
+        random = Random(11)
+        for identifier in range(31):
+            edge_world.register_event(Event(identifier, (random.uniform(1, 100),)), random.randint(-7, 7),
+                                      random.randint(-7, 7))
+        edge_world.register_event(Event(31, [99.5]), 7, 7)
+        edge_path = os.path.join(directory, "edge.snapshot")
+        WorldSnapshot.save(edge_world, edge_path)
+        loaded_world = WorldSnapshot.load(edge_path)
+        self.assertNotIn((8, -10), loaded_world.spatial_index.buckets, "A bucket outside of the world was found")
+        edges = [(x, y) for x in range(-7, 8) for y in range(-7, 8) if abs(x) == 7 or abs(y) == 7]
+        for x, y in edges:
+            for min_price in (None, 50, 95.4):
+                self.assertEqual(loaded_world.get_nearest_positions(x, y, 7, min_price),
+                                 edge_world.get_nearest_positions(x, y, 7, min_price),
+                                 "Loaded world returned different positions near the edge of the world")
+
+        with open(path, "r+b") as snapshot:
+            snapshot.write(b"NOTASNAP")
+        with self.assertRaises(ValueError):
+            WorldSnapshot.load(path)
+
+    def test_world_registry(self):
+        """
+        tests worlds of different grid sizes in one process and the registry loading and evicting them
+        """
+
+        with self.assertRaises(ValueError):
+            GridWorld(generate=False, grid_size=-1)
+
+        small_world = GridWorld(generate=False, grid_size=2)
+        large_world = GridWorld(generate=False, grid_size=50)
+        self.assertEqual((small_world.grid_size, large_world.grid_size, GridWorld.grid_size), (2, 50, 10),
+                         "Grid sizes of different worlds are not independent")
+        with self.assertRaises(InvalidPositionError):
+            small_world.register_event(Event(1, []), 3, 0)
+        large_world.register_event(Event(1, []), 50, 50)
+        small_world.register_event(Event(1, []), -2, -2)
+        self.assertEqual(large_world.get_nearest_positions(-50, -50, 1), [(50, 50)], "Wrong result in a large world")
+        self.assertEqual(small_world.get_nearest_positions(2, 2, 1), [(-2, -2)], "Wrong result in a small world")
+        self.assertEqual((small_world.get_event(-2, -2).get_id(), large_world.get_event(50, 50).get_id()),
+                         ("01", "00001"), "Event ids not formatted for the grid size of their world")
+        self.assertEqual(tuple(GridWorld.get_available_moves(4, 4, 2)), ((3, 4), (4, 3)), "Wrong available moves")
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        loaded = []
+        registry = WorldRegistry(memory_budget=2 * WorldRegistry.event_bytes)
+        for name, grid_size in (("a", 1), ("b", 2), ("c", 3)):
+            world = GridWorld(generate=False, grid_size=grid_size)
+            world.generate_data(number_of_events=1, seed=grid_size)
+            WorldSnapshot.save(world, os.path.join(directory, name))
+            registry.register(name, lambda name=name: loaded.append(name) or
+                              WorldSnapshot.load(os.path.join(directory, name)))
+        registry.add("pinned", GridWorld(generate=False, grid_size=1))
+
+        with self.assertRaises(DuplicateIdentifierError):
+            registry.register_snapshot("a", os.path.join(directory, "a"))
+        with self.assertRaises(UnknownIdentifierError):
+            registry.get("d")
+
+        registry.memory_budget = registry.sizes["pinned"] + 2 * max(os.path.getsize(os.path.join(directory, name))
+                                                                    for name in "abc")
+        self.assertEqual(registry.get("a").grid_size, 1, "Wrong world loaded")
+        self.assertEqual(registry.get("b").grid_size, 2, "Wrong world loaded")
+        registry.get("a")
+        self.assertEqual(registry.get("c").grid_size, 3, "Wrong world loaded")
+        self.assertEqual(list(registry.worlds), ["pinned", "a", "c"], "The least recently used world was not evicted")
+        registry.get("b")
+        self.assertEqual(loaded, ["a", "b", "c", "b"], "Worlds should be loaded on first access and after eviction")
+        self.assertEqual((registry.hits, registry.loads, registry.evictions), (1, 4, 2), "Wrong registry counters")
+        self.assertLessEqual(registry.memory, registry.memory_budget, "The memory budget was exceeded")
+
+        registry.unregister("b")
+        self.assertNotIn("b", registry, "The world was not unregistered")
+        self.assertEqual(len(registry), 3, "Wrong number of registered worlds")
+
+    def test_parallel_queries(self):
+        """
+        tests answering a batch of queries with a pool of processes, results must be in the order of the queries
+        """
+
+        with self.assertRaises(ValueError):
+            ParallelQueryRunner()
+        with self.assertRaises(ValueError):
+            ParallelQueryRunner(self.world, chunk_size=0)
+
+        self.world.generate_data(number_of_events=100, seed=5)
+        random = Random(5)
+        points = [(random.randint(-10, 10), random.randint(-10, 10)) for _ in range(300)]
+        expected = [[(event.identifier, distance) for event, distance in self.world.query_nearest_events(x, y, 3, 10)]
+                    for x, y in points]
+
+        with ParallelQueryRunner(self.world, processes=2, chunk_size=7) as runner:
+            self.assertEqual(runner.query_nearest_events(points, 3, min_price=10), expected,
+                             "Parallel results differ from serial results")
+            self.assertEqual(runner.query_nearest_events([]), [], "Wrong result for no queries")
+            with self.assertRaises(InvalidPositionError):
+                runner.query_nearest_events([(0, 0), (0, self.world.grid_size + 1)])
+
+        with self.assertRaises(ValueError):
+            runner.query_nearest_events(points)
+
+    def test_query_service(self):
+        """
+        tests the network query service with concurrent clients on the loopback interface
+        """
+
+        self.world.generate_data(number_of_events=60, seed=8)
+        service = QueryService(self.world, num_nearest_events=3, max_batch_size=16, max_pending_requests=4)
+        requests = ["{0}, {1}".format(x, y) for x in range(-10, 11, 4) for y in range(-10, 11, 5)] + ["0, 0"] * 5
+
+        async def run_client(lines):
+            reader, writer = await asyncio.open_connection("127.0.0.1", service.port)
+            writer.write("".join(line + "\n" for line in lines + ["q"]).encode("utf-8"))
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in lines]
+            self.assertEqual(await reader.readline(), b"", "The connection was not closed after 'q'")
+            writer.close()
+            return responses
+
+        async def run_clients():
+            await service.start()
+            try:
+                return await asyncio.gather(*[run_client(requests + ["1,", "0, {0}".format(self.world.grid_size + 1)])
+                                              for _ in range(8)])
+            finally:
+                await service.stop()
+
+        for responses in asyncio.run(run_clients()):
+            for request, response in zip(requests, responses):
+                x, y = map(int, request.split(","))
+                self.assertEqual(response, ResultFormatter.encode_nearest_events(
+                    x, y, self.world.query_nearest_events(x, y, 3)), "Wrong response of the service")
+            self.assertIn("Invalid format", responses[-2]["error"], "Invalid requests should be reported")
+            self.assertIn("Out of bounds", responses[-1]["error"], "Out of bounds requests should be reported")
+
+        self.assertEqual(service.requests, 8 * (len(requests) + 1), "Wrong number of answered requests")
+        self.assertLess(service.batches, service.requests, "Concurrent requests were not answered in batches")
+        self.assertLess(service.searches, service.requests, "Repeated positions in a batch were searched again")
+
+        # the positions of a batch are answered with one batch query, with the same results as single queries
+        positions = [(0, 0), (3, -2), (0, self.world.grid_size + 1), (-10, 10)]
+        self.assertEqual(service.answer_positions(positions), dict((position, service.answer(*position))
+                                                                   for position in positions),
+                         "Batched answers differ from single answers")
+
+        # a failed search is reported to the clients of its batch and later requests are still answered
+        failures = [RuntimeError("search failed")]
+
+        def search_positions(positions):
+            if len(failures) > 0:
+                raise failures.pop()
+            return QueryService.search_positions(service, positions)
+
+        async def run_failing_clients():
+            await service.start()
+            try:
+                failed = await run_client(["0, 0"])
+                answered = await run_client(["0, 0"])
+                return failed, answered, service.batcher.done()
+            finally:
+                await service.stop()
+
+        service.search_positions = search_positions
+        failed, answered, stopped = asyncio.run(run_failing_clients())
+        del service.search_positions
+        self.assertIn("error", failed[0], "A failed search should be reported to the client")
+        self.assertEqual(answered[0], service.answer(0, 0), "Requests after a failed search should be answered")
+        self.assertFalse(stopped, "A failed search should not stop the service")
+
+        # worlds with a spatial index are searched through the index instead of comparing every event
+        indexed_world = GridWorld(generate=False, spatial_index=BucketGridIndex(4))
+        indexed_world.generate_data(number_of_events=60, seed=8)
+        indexed_service = QueryService(indexed_world, num_nearest_events=3)
+        searched = []
+        indexed_world.get_nearest_events_batch = lambda *arguments: searched.append(arguments)
+        self.assertEqual(indexed_service.answer_positions(positions), service.answer_positions(positions),
+                         "Indexed answers differ from batched answers")
+        self.assertEqual(searched, [], "A world with a spatial index should not be searched with a batch query")
+
+    def test_benchmarks(self):
+        """
+        tests the benchmark harness on tiny worlds, only the structure of the report is checked, not the timings
+        """
+
+        self.assertEqual(get_percentiles([5, 1, 4, 2, 3]), {"p50": 3, "p90": 5, "p99": 5, "max": 5},
+                         "Wrong percentiles")
+        self.assertEqual(get_percentiles(list(range(1, 101)))["p90"], 90, "Wrong percentiles")
+
+        report = WorldBenchmark(grid_sizes=(2, 3), densities=(0.1, 1.0), num_queries=10, construction_repeats=3).run()
+        self.assertEqual(report["construction_repeats"], 3, "Wrong number of construction repeats in the report")
+        self.assertEqual(GridWorld.grid_size, 10, "The default grid size was changed by the benchmarks")
+        self.assertEqual(len(report["cases"]), 2 * (1 + 2*2), "Wrong number of benchmark cases")
+        self.assertEqual(json.loads(json.dumps(report)), report, "The report can not be saved as JSON")
+
+        query_cases = [case for case in report["cases"] if case["name"] != "init_data"]
+        self.assertEqual([case["number_of_events"] for case in query_cases], [2, 2, 25, 25, 5, 5, 49, 49],
+                         "Wrong number of events in the benchmarked worlds")
+        for case in query_cases:
+            self.assertLessEqual(case["query_latency_us"]["p50"], case["query_latency_us"]["p99"],
+                                 "Percentiles are not ordered")
+            self.assertGreater(case["memory_bytes"], 0, "The memory use was not measured")
+            self.assertGreater(case["construction_seconds"], 0, "The construction was not timed")
+
+        self.assertEqual(WorldBenchmark.compare(report, report), [], "A report should not regress against itself")
+        slower = json.loads(json.dumps(report))
+        slower["cases"][1]["query_latency_us"]["p99"] = report["cases"][1]["query_latency_us"]["p99"] * 2 + 1
+        self.assertEqual([regression[3] for regression in WorldBenchmark.compare(report, slower)],
+                         ["query_latency_us.p99"], "A slower case was not reported")
+
+        # init_data generates the same events in every run with the same seed, so its time is compared too
+        self.assertEqual(report["cases"][0]["number_of_events"],
+                         WorldBenchmark(grid_sizes=(2,), densities=(), construction_repeats=1).run()["cases"][0][
+                             "number_of_events"], "init_data should generate the same events with the same seed")
+        slower = json.loads(json.dumps(report))
+        slower["cases"][0]["seconds"] = report["cases"][0]["seconds"] * 2 + 1
+        self.assertEqual([regression[3] for regression in WorldBenchmark.compare(report, slower)], ["seconds"],
+                         "A slower init_data case was not reported")
+        slower["cases"][0]["number_of_events"] += 1
+        self.assertEqual(WorldBenchmark.compare(report, slower), [],
+                         "init_data cases with different numbers of events should not be compared")
+
+    def test_result_formatting(self):
+        """
+        tests the structured query results and their formatting
+        """
+
+        event = Event(7, (12.5, 3.25))
+        self.world.register_event(event, 1, 1)
+        self.world.register_event(Event(12, []), -1, 0)
+        self.assertEqual(event.formatted_id, "007", "Formatted id not cached when registering the event")
+        self.assertEqual(event.formatted_minimum_ticket_price, Event.currency + "03.25",
+                         "Minimum ticket price not cached when registering the event")
+
+        nearest_events = self.world.query_nearest_events(0, 0, 5)
+        self.assertEqual([(event.identifier, distance) for event, distance in nearest_events], [(12, 1), (7, 2)],
+                         "Wrong structured result of the nearest events query")
+
+        stream = StringIO()
+        ResultFormatter.write_nearest_events([(0, 0, nearest_events), (5, 5, [])], stream)
+        self.assertEqual(stream.getvalue(), "\nClosest Events to (0,0):\n\n"
+                                            "Event 012 - N/A, Distance 1\n\n"
+                                            "Event 007 - $03.25, Distance 2\n\n"
+                                            "\nClosest Events to (5,5):\n\n",
+                         "Wrong formatting of the nearest events")
+
+        # the encoded minimum price is the cached one, or computed for events which are not cached
+        self.assertEqual([result["minimum_price"] for result in
+                          ResultFormatter.encode_nearest_events(0, 0, nearest_events)["events"]], [None, 3.25],
+                         "Wrong minimum prices of the encoded nearest events")
+        event.tickets = (1.0,)  # the tickets are not searched while the price is cached
+        self.assertEqual(ResultFormatter.get_minimum_price(event), 3.25, "The cached minimum price should be used")
+        self.assertEqual(ResultFormatter.get_minimum_price(Event(8, (9.5, 4.75))), 4.75,
+                         "Minimum price not computed for an event which is not cached")
+
+    def test_nearest_events_batch(self):
+        """
+        tests that the batch query returns the same events and distances as the single queries
+        """
+
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+
+        with self.assertRaises(InvalidPositionError):
+            self.world.get_nearest_events_batch([(0, 0), (self.world.grid_size + 1, 0)])
+
+        identifiers, distances = self.world.get_nearest_events_batch([(0, 0)], 2)
+        self.assertEqual(identifiers.tolist(), [[-1, -1]], "Batch query should return -1 in an empty world")
+
+        random = Random(7)
+        size = GridWorld.grid_size
+        positions = [(x, y) for x in range(-size, size + 1) for y in range(-size, size + 1)]
+        for identifier, (x, y) in enumerate(random.sample(positions, 80)):
+            self.world.register_event(Event(identifier, []), x, y)
+
+        points = numpy.array(positions)
+        for num_nearest_events in (1, 5, 100):
+            identifiers, distances = self.world.get_nearest_events_batch(points, num_nearest_events)
+            self.assertEqual(identifiers.shape, (len(positions), num_nearest_events), "Wrong shape of batch result")
+            for point, point_identifiers, point_distances in zip(positions, identifiers, distances):
+                nearest_positions = self.world.get_nearest_positions(point[0], point[1], num_nearest_events)
+                expected = [self.world.get_event(x, y).identifier for x, y in nearest_positions]
+                expected_distances = [self.world.get_manhattan_distance(point[0], point[1], x, y)
+                                      for x, y in nearest_positions]
+                padding = [-1]*(num_nearest_events - len(expected))
+                self.assertEqual(point_identifiers.tolist(), expected + padding,
+                                 "Batch query returned different events than the single query")
+                self.assertEqual(point_distances.tolist(), expected_distances + padding,
+                                 "Batch query returned different distances than the single query")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,114 @@
+from CustomErrors import InvalidPositionError
+from array import array
+
+
+class CostLayer(object):
+    """
+    this class represents the travel costs of a world, the cost of every position is paid when moving into it from a
+    neighbour position, so the cost of travelling between two positions is the sum of the costs along the cheapest path,
+    positions with infinite cost are obstacles which can not be entered
+    """
+
+    def __init__(self, grid_size, default_cost=1.0, costs=None):
+        """
+        constructor for a CostLayer object
+        :param grid_size: the grid size of the world, coordinates are in the range [-grid_size, grid_size]
+        :param default_cost: optional argument, the initial cost of every position, default value is 1.0, in which
+            case travel costs are equal to manhattan distances until costs are changed
+        :param costs: optional argument, the already validated costs of all positions indexed like get_cell, e.g. a
+            read-only memoryview of a snapshot file, default value is None, in which case default_cost is used
+        :raises ValueError: if the default cost is not positive or the number of costs doesn't match the grid size
+        """
+
+        self.check_cost(default_cost)
+
+        self.grid_size = grid_size
+        self.side = 2*grid_size + 1
+        if costs is None:
+            self.costs = array("d", [default_cost]) * self.side**2
+        elif len(costs) != self.side**2:
+            raise ValueError("Expected {0} travel costs, got {1}".format(self.side**2, len(costs)))
+        else:
+            self.costs = costs
+
+        self.version = 0  # increased on every change, so that results computed with older costs can be recognized
+        self.minimum_cost = default_cost if costs is None else None  # the cached minimum cost, None if not computed
+
+    @staticmethod
+    def check_cost(cost):
+        """
+        a static method, which ensures a cost is valid
+        :param cost: the cost of a position
+        :raises ValueError: if the cost is not positive
+        """
+
+        if not cost > 0:
+            raise ValueError("Travel costs must be greater than 0, use float('inf') for obstacles")
+
+    def get_cell(self, x, y):
+        """
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :return: the index of the position in the array of costs
+        :raises InvalidPositionError: if the position is out of bounds
+        """
+
+        if not ((-1*self.grid_size) <= x <= self.grid_size and (-1*self.grid_size) <= y <= self.grid_size):
+            raise InvalidPositionError("Out of bounds coordinates of a travel cost: {0}, {1}".format(x, y))
+
+        return (x + self.grid_size)*self.side + (y + self.grid_size)
+
+    def get_cost(self, x, y):
+        """
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :return: the cost of moving into the position
+        :raises InvalidPositionError: if the position is out of bounds
+        """
+
+        return self.costs[self.get_cell(x, y)]
+
+    def set_cost(self, x, y, cost):
+        """
+        a method to change the cost of a single position
+        :param x: the x coordinate of the position
+        :param y: the y coordinate of the position
+        :param cost: the new cost of moving into the position, float('inf') for an obstacle
+        :raises InvalidPositionError: if the position is out of bounds
+        :raises ValueError: if the cost is not positive
+        """
+
+        self.set_region_cost(x, y, x, y, cost)
+
+    def set_region_cost(self, x0, y0, x1, y1, cost):
+        """
+        a method to change the cost of all positions in a rectangle
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :param cost: the new cost of moving into the positions, float('inf') for obstacles
+        :raises InvalidPositionError: if a corner of the rectangle is out of bounds
+        :raises ValueError: if the cost is not positive
+        """
+
+        self.check_cost(cost)
+        self.get_cell(x0, y0)
+        self.get_cell(x1, y1)
+
+        for x in range(x0, x1 + 1):
+            start = self.get_cell(x, y0)
+            self.costs[start:start + max(0, y1 - y0 + 1)] = array("d", [cost]) * max(0, y1 - y0 + 1)
+
+        self.version += 1
+        self.minimum_cost = None
+
+    def get_minimum_cost(self):
+        """
+        :return: the minimum cost of all positions, used to bound travel costs from below
+        """
+
+        if self.minimum_cost is None:
+            self.minimum_cost = min(self.costs)
+
+        return self.minimum_cost
@@ -0,0 +1,175 @@
+from CustomErrors import DuplicateIdentifierError, UnknownIdentifierError
+from WorldSnapshot import WorldSnapshot, MappedStorage
+from WorldStorage import DenseStorage, ChunkedStorage
+from EventStore import ColumnarStorage
+from collections import OrderedDict
+
+
+class WorldRegistry(object):
+    """
+    this class represents a registry of named worlds, e.g. one world for each city, worlds are loaded when they are
+    first accessed and the least recently used worlds are evicted when the loaded worlds exceed a memory budget, so
+    that they are loaded again on their next access
+    """
+
+    event_bytes = 500  # the estimated memory of an event, including its entries in the maps of the world
+
+    def __init__(self, memory_budget=None, size_function=None):
+        """
+        constructor for a WorldRegistry object
+        :param memory_budget: optional argument, the maximum estimated memory in bytes of the loaded worlds, default
+            value is None, in which case worlds are never evicted
+        :param size_function: optional argument, a function returning the memory in bytes of a world, default value is
+            None, in which case estimate_world_size is used
+        """
+
+        self.memory_budget = memory_budget
+        self.size_function = size_function if size_function is not None else WorldRegistry.estimate_world_size
+
+        self.loaders = {}  # a map linking the name of each world to the function loading it, None if it can't reload
+        self.worlds = OrderedDict()  # the loaded worlds, ordered from the least to the most recently used
+        self.sizes = {}  # a map linking the name of each loaded world to its memory in bytes
+        self.memory = 0  # the total memory of the loaded worlds
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """
+        :return: the number of registered worlds, loaded or not
+        """
+
+        return len(self.loaders)
+
+    def __contains__(self, name):
+        """
+        :param name: the name of a world
+        :return: True if a world with this name is registered and False otherwise
+        """
+
+        return name in self.loaders
+
+    def register(self, name, loader):
+        """
+        a method to register a world, which is loaded when it is first accessed
+        :param name: the unique name of the world
+        :param loader: a function without arguments returning the GridWorld object, called on every load of the world
+        :raises DuplicateIdentifierError: if the name is already in use
+        """
+
+        if name in self.loaders:
+            raise DuplicateIdentifierError("World name {0} is already in use".format(name))
+
+        self.loaders[name] = loader
+
+    def register_snapshot(self, name, path):
+        """
+        a method to register a world saved in a snapshot file, which is mapped in memory when it is first accessed
+        :param name: the unique name of the world
+        :param path: the path of the snapshot file
+        :raises DuplicateIdentifierError: if the name is already in use
+        """
+
+        self.register(name, lambda: WorldSnapshot.load(path))
+
+    def add(self, name, world):
+        """
+        a method to register an already loaded world, since it can not be loaded again it is never evicted
+        :param name: the unique name of the world
+        :param world: the GridWorld object
+        :raises DuplicateIdentifierError: if the name is already in use
+        """
+
+        self.register(name, None)
+        self.worlds[name] = world
+        self.sizes[name] = self.size_function(world)
+        self.memory += self.sizes[name]
+        self.evict()
+
+    def unregister(self, name):
+        """
+        a method to remove a world from the registry
+        :param name: the name of the world
+        :raises UnknownIdentifierError: if there is no world with the given name
+        """
+
+        if name not in self.loaders:
+            raise UnknownIdentifierError("There is no world with name {0}".format(name))
+
+        del self.loaders[name]
+        if name in self.worlds:
+            self.unload(name)
+
+    def get(self, name):
+        """
+        a method which returns a world, loading it if it is not loaded, and marks it as the most recently used
+        :param name: the name of the world
+        :return: the GridWorld object
+        :raises UnknownIdentifierError: if there is no world with the given name
+        """
+
+        if name in self.worlds:
+            self.hits += 1
+            self.worlds.move_to_end(name)
+            return self.worlds[name]
+
+        if name not in self.loaders:
+            raise UnknownIdentifierError("There is no world with name {0}".format(name))
+
+        world = self.loaders[name]()
+        self.loads += 1
+        self.worlds[name] = world
+        self.sizes[name] = self.size_function(world)
+        self.memory += self.sizes[name]
+        self.evict()
+
+        return world
+
+    def evict(self):
+        """
+        a method which unloads the least recently used worlds until the loaded worlds fit in the memory budget, the
+        most recently used world and the worlds which can not be loaded again are kept
+        """
+
+        if self.memory_budget is None:
+            return
+
+        for name in list(self.worlds)[:-1]:
+            if self.memory <= self.memory_budget:
+                break
+            if self.loaders[name] is not None:
+                self.unload(name)
+                self.evictions += 1
+
+    def unload(self, name):
+        """
+        a method which removes a loaded world from memory, references to it kept outside of the registry still work
+        :param name: the name of the world
+        """
+
+        del self.worlds[name]
+        self.memory -= self.sizes.pop(name)
+
+    @staticmethod
+    def estimate_world_size(world):
+        """
+        a static method, which estimates the memory of a world, the size of the file for worlds mapped from snapshots
+        and the size of the columns for worlds with a ColumnarStorage, an estimate based on the numbers of events and
+        allocated cells otherwise
+        :param world: the GridWorld object
+        :return: the estimated memory in bytes
+        """
+
+        if isinstance(world.storage, MappedStorage):
+            return len(world.storage.snapshot.mapping)
+        if isinstance(world.storage, ColumnarStorage):
+            return world.storage.get_memory_size()
+
+        size = len(world.event_positions) * WorldRegistry.event_bytes
+        if isinstance(world.storage, DenseStorage):
+            size += 8 * (2*world.grid_size + 1)**2  # a reference for every cell of the grid
+        elif isinstance(world.storage, ChunkedStorage):
+            size += 8 * len(world.storage.regions) * world.storage.region_size**2
+
+        return size
@@ -0,0 +1,620 @@
+from DataModel import GridWorld, Event
+from SpatialIndex import BucketGridIndex
+from WorldStorage import WorldStorage
+from CustomErrors import ReadOnlyWorldError
+from TravelCosts import CostLayer
+from array import array
+from bisect import bisect_left
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+import sys
+
+try:
+    import numpy
+except ImportError:  # numpy is only needed to prepare the arrays for batch queries
+    numpy = None
+
+
+class SnapshotFile(object):
+    """
+    this class represents a memory-mapped snapshot file, the sections of the file are exposed as typed memoryviews, so
+    nothing is read from the disk until it is accessed and processes mapping the same file share its pages
+
+    the file starts with a header followed by sections of 8-byte integers and doubles:
+        bucket keys, bucket offsets into positions, bucket minimum and maximum prices (NaN if the bucket has no
+        tickets), bucket earliest start and latest end times, position x and y coordinates, position offsets into
+        events, event identifiers, event offsets into ticket prices, ticket prices, event identifiers sorted, the rows
+        of the sorted identifiers, event start and end times (NaN if the event has no start or end), the travel costs
+        of all positions (empty if the world has no cost layer) and the x and y coordinates and the slot of every event,
+        which is its registration order among the events at the same position
+    """
+
+    magic = b"GWSNAP04"  # the first bytes of every snapshot file, including the version of the format
+
+    # grid size, bucket size, number of events, number of prices, number of buckets, number of positions, number of
+    # travel costs and the bounds of the buckets (min x, max x, min y, max y)
+    header = Struct("<8s11q")
+
+    # the name, the type code and the length of each section, given as the name of a count and a number added to it
+    sections = (("bucket_keys", "q", "buckets", 0), ("bucket_offsets", "q", "buckets", 1),
+                ("bucket_min_prices", "d", "buckets", 0), ("bucket_max_prices", "d", "buckets", 0),
+                ("bucket_start_times", "d", "buckets", 0), ("bucket_end_times", "d", "buckets", 0),
+                ("position_xs", "q", "positions", 0), ("position_ys", "q", "positions", 0),
+                ("position_offsets", "q", "positions", 1), ("identifiers", "q", "events", 0),
+                ("ticket_offsets", "q", "events", 1), ("prices", "d", "prices", 0),
+                ("sorted_identifiers", "q", "events", 0), ("sorted_rows", "q", "events", 0),
+                ("start_times", "d", "events", 0), ("end_times", "d", "events", 0), ("costs", "d", "costs", 0),
+                ("event_xs", "q", "events", 0), ("event_ys", "q", "events", 0), ("event_slots", "q", "events", 0))
+
+    def __init__(self, path):
+        """
+        constructor for a SnapshotFile object, which maps the file in memory
+        :param path: the path of the snapshot file
+        :raises ValueError: if the file is not a snapshot or was saved with a different version of the format
+        """
+
+        if sys.byteorder != "little":
+            raise ValueError("Snapshots can only be loaded on little-endian machines")
+
+        with open(path, "rb") as snapshot:
+            self.mapping = mmap(snapshot.fileno(), 0, access=ACCESS_READ)
+
+        if len(self.mapping) < self.header.size:
+            raise ValueError("{0} is not a snapshot file".format(path))
+
+        counts = {}
+        magic, self.grid_size, self.bucket_size, counts["events"], counts["prices"], counts["buckets"], \
+            counts["positions"], counts["costs"], self.min_bucket_x, self.max_bucket_x, self.min_bucket_y, \
+            self.max_bucket_y = self.header.unpack_from(self.mapping)
+        if magic != self.magic:
+            raise ValueError("{0} is not a snapshot file of a supported version".format(path))
+
+        view = memoryview(self.mapping)
+        offset = self.header.size
+        for name, typecode, count, extra in self.sections:
+            length = counts[count] + extra
+            if offset + 8*length > len(self.mapping):
+                raise ValueError("{0} is a truncated or corrupted snapshot file".format(path))
+            setattr(self, name, view[offset:offset + 8*length].cast(typecode))
+            offset += 8*length
+
+        if offset != len(self.mapping):
+            raise ValueError("{0} is a truncated or corrupted snapshot file".format(path))
+
+        self.id_digits = GridWorld.get_id_digits(self.grid_size)  # the number of digits of the formatted event ids
+
+    def get_bucket_key(self, bucket):
+        """
+        a method which encodes the coordinates of a bucket in a single integer, the keys are sorted by x and then by y
+        :param bucket: the coordinates of the bucket
+        :return: the integer key of the bucket
+        """
+
+        return WorldSnapshot.get_bucket_key(bucket, self.grid_size, self.bucket_size)
+
+    def find_bucket(self, bucket):
+        """
+        a method which finds the row of a bucket with a binary search over the sorted bucket keys
+        :param bucket: the coordinates of the bucket
+        :return: the row of the bucket or None if the bucket holds no events
+        """
+
+        # the keys are only unique for the buckets of the world, the buckets outside of it hold no events
+        half_span = self.grid_size // self.bucket_size + 1
+        if not (-half_span <= bucket[0] <= half_span and -half_span <= bucket[1] <= half_span):
+            return None
+
+        key = self.get_bucket_key(bucket)
+        row = bisect_left(self.bucket_keys, key)
+        if row < len(self.bucket_keys) and self.bucket_keys[row] == key:
+            return row
+
+        return None
+
+    def get_bucket(self, row):
+        """
+        a method which decodes the coordinates of the bucket at a given row
+        :param row: the row of the bucket
+        :return: a tuple (x, y) with the coordinates of the bucket
+        """
+
+        span = 2*(self.grid_size // self.bucket_size + 1) + 1
+        bucket_x, bucket_y = divmod(self.bucket_keys[row], span)
+        return bucket_x - span // 2, bucket_y - span // 2
+
+    def get_events(self, position_row):
+        """
+        a method which creates the event objects stored at the position of a given row
+        :param position_row: the row of the position
+        :return: a map linking the identifiers of the events to new event objects, in the order they were registered
+        """
+
+        events = {}
+        for row in range(self.position_offsets[position_row], self.position_offsets[position_row + 1]):
+            identifier = self.identifiers[row]
+            start_time, end_time = self.start_times[row], self.end_times[row]
+            event = Event(identifier, self.prices[self.ticket_offsets[row]:self.ticket_offsets[row + 1]],
+                          None if start_time != start_time else start_time,  # NaN
+                          None if end_time != end_time else end_time)
+            event.cache_formatting(self.id_digits)
+            events[identifier] = event
+
+        return events
+
+
+class MappedBuckets(object):
+    """
+    this class represents a read-only map linking the coordinates of the buckets in a snapshot to maps of their
+    positions and event counts, as used by BucketGridIndex
+    """
+
+    def __init__(self, snapshot):
+        """
+        constructor for a MappedBuckets object
+        :param snapshot: the SnapshotFile object
+        """
+
+        self.snapshot = snapshot
+
+    def __len__(self):
+        """
+        the number of buckets holding events
+        """
+
+        return len(self.snapshot.bucket_keys)
+
+    def __contains__(self, bucket):
+        """
+        a method which checks if a bucket holds events
+        :param bucket: the coordinates of the bucket
+        :return: true if the bucket holds events and false otherwise
+        """
+
+        return self.snapshot.find_bucket(bucket) is not None
+
+    def __iter__(self):
+        """
+        a method which generates the coordinates of all buckets holding events
+        :return: a generator of tuples (x, y)
+        """
+
+        return (self.snapshot.get_bucket(row) for row in range(len(self.snapshot.bucket_keys)))
+
+    def __getitem__(self, bucket):
+        """
+        a method which returns the positions of a bucket and their event counts
+        :param bucket: the coordinates of the bucket
+        :return: a map linking each position of the bucket to its number of events
+        :raises KeyError: if the bucket holds no events
+        """
+
+        row = self.snapshot.find_bucket(bucket)
+        if row is None:
+            raise KeyError(bucket)
+
+        snapshot = self.snapshot
+        return {(snapshot.position_xs[position], snapshot.position_ys[position]):
+                snapshot.position_offsets[position + 1] - snapshot.position_offsets[position]
+                for position in range(snapshot.bucket_offsets[row], snapshot.bucket_offsets[row + 1])}
+
+
+class MappedBucketPrices(object):
+    """
+    this class represents a read-only map linking the coordinates of the buckets in a snapshot to their price ranges
+    """
+
+    def __init__(self, snapshot):
+        """
+        constructor for a MappedBucketPrices object
+        :param snapshot: the SnapshotFile object
+        """
+
+        self.snapshot = snapshot
+
+    def get(self, bucket, default=None):
+        """
+        a method which returns the price range of a bucket
+        :param bucket: the coordinates of the bucket
+        :param default: optional argument, the value returned if the bucket has no tickets, default value is None
+        :return: a tuple (minimum price, maximum price) of the tickets in the bucket
+        """
+
+        row = self.snapshot.find_bucket(bucket)
+        if row is None or self.snapshot.bucket_min_prices[row] != self.snapshot.bucket_min_prices[row]:  # NaN
+            return default
+
+        return self.snapshot.bucket_min_prices[row], self.snapshot.bucket_max_prices[row]
+
+
+class MappedBucketTimes(object):
+    """
+    this class represents a read-only map linking the coordinates of the buckets in a snapshot to the earliest start and
+    the latest end times of their events
+    """
+
+    def __init__(self, snapshot):
+        """
+        constructor for a MappedBucketTimes object
+        :param snapshot: the SnapshotFile object
+        """
+
+        self.snapshot = snapshot
+
+    def get(self, bucket, default=None):
+        """
+        a method which returns the time range of a bucket
+        :param bucket: the coordinates of the bucket
+        :param default: optional argument, the value returned if the bucket holds no events, default value is None
+        :return: a tuple (earliest start time, latest end time) of the events in the bucket
+        """
+
+        row = self.snapshot.find_bucket(bucket)
+        if row is None:
+            return default
+
+        return self.snapshot.bucket_start_times[row], self.snapshot.bucket_end_times[row]
+
+
+class MappedEventPositions(object):
+    """
+    this class represents a read-only map linking the identifiers of the events in a snapshot to their positions
+    """
+
+    def __init__(self, snapshot):
+        """
+        constructor for a MappedEventPositions object
+        :param snapshot: the SnapshotFile object
+        """
+
+        self.snapshot = snapshot
+
+    def find_row(self, identifier):
+        """
+        a method which finds the row of an event with a binary search over the sorted identifiers
+        :param identifier: the identifier of the event
+        :return: the row of the event or None if there is no event with the identifier
+        """
+
+        row = bisect_left(self.snapshot.sorted_identifiers, identifier)
+        if row < len(self.snapshot.sorted_identifiers) and self.snapshot.sorted_identifiers[row] == identifier:
+            return self.snapshot.sorted_rows[row]
+
+        return None
+
+    def get_position(self, row):
+        """
+        a method which returns the position of the event at a given row
+        :param row: the row of the event
+        :return: a tuple (x, y) with the position of the event
+        """
+
+        return self.snapshot.event_xs[row], self.snapshot.event_ys[row]
+
+    def __len__(self):
+        """
+        the number of events in the snapshot
+        """
+
+        return len(self.snapshot.identifiers)
+
+    def __contains__(self, identifier):
+        """
+        a method which checks if there is an event with a given identifier
+        :param identifier: the identifier of the event
+        :return: true if there is an event with the identifier and false otherwise
+        """
+
+        return self.find_row(identifier) is not None
+
+    def __getitem__(self, identifier):
+        """
+        a method which returns the position of an event
+        :param identifier: the identifier of the event
+        :return: a tuple (x, y) with the position of the event
+        :raises KeyError: if there is no event with the identifier
+        """
+
+        row = self.find_row(identifier)
+        if row is None:
+            raise KeyError(identifier)
+
+        return self.get_position(row)
+
+    def __iter__(self):
+        """
+        a method which generates the identifiers of all events in the snapshot
+        :return: an iterator of the identifiers
+        """
+
+        return iter(self.snapshot.identifiers)
+
+    def keys(self):
+        """
+        a method which generates the identifiers of all events in the snapshot
+        :return: an iterator of the identifiers, in the same order as values
+        """
+
+        return iter(self.snapshot.identifiers)
+
+    def values(self):
+        """
+        a method which generates the positions of all events in the snapshot
+        :return: an iterator of tuples (x, y), in the same order as keys
+        """
+
+        return zip(self.snapshot.event_xs, self.snapshot.event_ys)
+
+
+class MappedBucketIndex(BucketGridIndex):
+    """
+    this class represents a read-only BucketGridIndex, whose buckets are read from a snapshot file instead of being
+    built in memory, the nearest events and range searches are the same as the ones of BucketGridIndex
+    """
+
+    def __init__(self, snapshot):
+        """
+        constructor for a MappedBucketIndex object
+        :param snapshot: the SnapshotFile object
+        """
+
+        super(MappedBucketIndex, self).__init__(snapshot.bucket_size)
+
+        self.buckets = MappedBuckets(snapshot)
+        self.bucket_prices = MappedBucketPrices(snapshot)
+        self.bucket_price_ranges = None  # only needed to update the index
+        self.bucket_times = MappedBucketTimes(snapshot)
+        self.bucket_time_ranges = None
+
+        if len(self.buckets) > 0:
+            self.min_bucket_x, self.max_bucket_x = snapshot.min_bucket_x, snapshot.max_bucket_x
+            self.min_bucket_y, self.max_bucket_y = snapshot.min_bucket_y, snapshot.max_bucket_y
+
+    def add_position(self, x, y, price_range=None, time_range=None):
+        """
+        a snapshot can not be changed
+        :raises ReadOnlyWorldError: always
+        """
+
+        raise ReadOnlyWorldError("The index of a snapshot can not be changed")
+
+    def add_positions(self, entries):
+        """
+        a snapshot can not be changed
+        :raises ReadOnlyWorldError: always
+        """
+
+        raise ReadOnlyWorldError("The index of a snapshot can not be changed")
+
+    def remove_position(self, x, y, price_range=None, time_range=None):
+        """
+        a snapshot can not be changed
+        :raises ReadOnlyWorldError: always
+        """
+
+        raise ReadOnlyWorldError("The index of a snapshot can not be changed")
+
+
+class MappedStorage(WorldStorage):
+    """
+    this class represents a read-only storage, whose events are read from a snapshot file, event objects are only
+    created for the positions which are accessed
+    """
+
+    def __init__(self, snapshot):
+        """
+        constructor for a MappedStorage object
+        :param snapshot: the SnapshotFile object
+        """
+
+        self.snapshot = snapshot
+        self.event_positions = MappedEventPositions(snapshot)
+
+    def find_position(self, x, y):
+        """
+        a method which finds the row of a position by searching the positions of its bucket
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: the row of the position or None if there are no events at the position
+        """
+
+        snapshot = self.snapshot
+        row = snapshot.find_bucket((x // snapshot.bucket_size, y // snapshot.bucket_size))
+        if row is None:
+            return None
+
+        for position in range(snapshot.bucket_offsets[row], snapshot.bucket_offsets[row + 1]):
+            if snapshot.position_xs[position] == x and snapshot.position_ys[position] == y:
+                return position
+
+        return None
+
+    def get_events(self, x, y):
+        """
+        a method which returns the map of events stored at position (x,y)
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: the map of events at position (x, y) or None if there are no events at the position
+        """
+
+        position = self.find_position(x, y)
+        if position is None:
+            return None
+
+        return self.snapshot.get_events(position)
+
+    def set_events(self, x, y, events):
+        """
+        a snapshot can not be changed
+        :raises ReadOnlyWorldError: always
+        """
+
+        raise ReadOnlyWorldError("The storage of a snapshot can not be changed")
+
+    def add_event(self, x, y, event):
+        """
+        a snapshot can not be changed
+        :raises ReadOnlyWorldError: always
+        """
+
+        raise ReadOnlyWorldError("The storage of a snapshot can not be changed")
+
+    def remove_event(self, identifier):
+        """
+        a snapshot can not be changed
+        :raises ReadOnlyWorldError: always
+        """
+
+        raise ReadOnlyWorldError("The storage of a snapshot can not be changed")
+
+    def update_event(self, event):
+        """
+        a snapshot can not be changed
+        :raises ReadOnlyWorldError: always
+        """
+
+        raise ReadOnlyWorldError("The storage of a snapshot can not be changed")
+
+    def iter_positions(self, x0, y0, x1, y1):
+        """
+        a method which generates the positions holding events in a rectangle of the world
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :return: a generator of tuples (x, y, events) for each position in the rectangle holding events
+        """
+
+        snapshot = self.snapshot
+        for position in range(len(snapshot.position_xs)):
+            x, y = snapshot.position_xs[position], snapshot.position_ys[position]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                yield x, y, snapshot.get_events(position)
+
+
+class WorldSnapshot(object):
+    """
+    a utility class providing static methods to save a GridWorld to a compact binary file and to load it back by
+    mapping the file in memory
+    """
+
+    @staticmethod
+    def get_bucket_key(bucket, grid_size, bucket_size):
+        """
+        a static method, which encodes the coordinates of a bucket in a single non-negative integer
+        :param bucket: the coordinates of the bucket
+        :param grid_size: half of the size of the grid
+        :param bucket_size: the length of the side of a bucket
+        :return: the integer key of the bucket, keys are ordered by x and then by y
+        """
+
+        span = 2*(grid_size // bucket_size + 1) + 1
+        return (bucket[0] + span // 2)*span + bucket[1] + span // 2
+
+    @staticmethod
+    def save(world, path, bucket_size=None):
+        """
+        a static method, which saves the events of a world, their tickets, a bucket index and the travel costs of the
+        world to a snapshot file
+        :param world: the GridWorld object to save
+        :param path: the path of the snapshot file, an existing file is overwritten
+        :param bucket_size: optional argument, the length of the side of the buckets of the saved index, default value
+            is None, in which case the bucket size of the world's BucketGridIndex or 8 is used
+        """
+
+        if bucket_size is None:
+            bucket_size = getattr(world.spatial_index, "bucket_size", 8)
+
+        # group the positions by bucket, the events of a position are kept in the order they were registered
+        positions = sorted(dict.fromkeys(world.event_positions.values()),
+                           key=lambda position: WorldSnapshot.get_bucket_key(
+                               (position[0] // bucket_size, position[1] // bucket_size), world.grid_size, bucket_size))
+
+        sections = {name: array(typecode) for name, typecode, _, _ in SnapshotFile.sections}
+        sections["bucket_offsets"].append(0)
+        sections["position_offsets"].append(0)
+        sections["ticket_offsets"].append(0)
+        buckets = []
+
+        for x, y in positions:
+            bucket = (x // bucket_size, y // bucket_size)
+            if len(buckets) == 0 or buckets[-1] != bucket:
+                buckets.append(bucket)
+                sections["bucket_keys"].append(WorldSnapshot.get_bucket_key(bucket, world.grid_size, bucket_size))
+                sections["bucket_offsets"].append(sections["bucket_offsets"][-1])
+                sections["bucket_min_prices"].append(float("nan"))
+                sections["bucket_max_prices"].append(float("nan"))
+                sections["bucket_start_times"].append(float("inf"))
+                sections["bucket_end_times"].append(float("-inf"))
+            sections["bucket_offsets"][-1] += 1
+
+            sections["position_xs"].append(x)
+            sections["position_ys"].append(y)
+            for slot, event in enumerate(world.storage.get_events(x, y).values()):
+                sections["identifiers"].append(event.identifier)
+                sections["event_xs"].append(x)
+                sections["event_ys"].append(y)
+                sections["event_slots"].append(slot)
+                sections["prices"].extend(event.tickets)
+                sections["ticket_offsets"].append(len(sections["prices"]))
+                sections["start_times"].append(float("nan") if event.start_time is None else event.start_time)
+                sections["end_times"].append(float("nan") if event.end_time is None else event.end_time)
+
+                start_time, end_time = event.time_range
+                sections["bucket_start_times"][-1] = min(sections["bucket_start_times"][-1], start_time)
+                sections["bucket_end_times"][-1] = max(sections["bucket_end_times"][-1], end_time)
+
+                price_range = event.get_price_range()
+                if price_range is not None:
+                    # comparisons with NaN are false, so the first price range always replaces it
+                    if not sections["bucket_min_prices"][-1] <= price_range[0]:
+                        sections["bucket_min_prices"][-1] = price_range[0]
+                    if not sections["bucket_max_prices"][-1] >= price_range[1]:
+                        sections["bucket_max_prices"][-1] = price_range[1]
+            sections["position_offsets"].append(len(sections["identifiers"]))
+
+        rows = sorted(range(len(sections["identifiers"])), key=sections["identifiers"].__getitem__)
+        sections["sorted_identifiers"].extend(sections["identifiers"][row] for row in rows)
+        sections["sorted_rows"].extend(rows)
+
+        if world.cost_layer is not None:
+            sections["costs"].extend(world.cost_layer.costs)
+
+        bucket_bounds = (min(bucket[0] for bucket in buckets), max(bucket[0] for bucket in buckets),
+                         min(bucket[1] for bucket in buckets), max(bucket[1] for bucket in buckets)) \
+            if len(buckets) > 0 else (0, 0, 0, 0)
+
+        with open(path, "wb") as snapshot:
+            snapshot.write(SnapshotFile.header.pack(SnapshotFile.magic, world.grid_size, bucket_size,
+                                                    len(sections["identifiers"]), len(sections["prices"]),
+                                                    len(buckets), len(positions), len(sections["costs"]),
+                                                    *bucket_bounds))
+            for name, _, _, _ in SnapshotFile.sections:
+                section = sections[name]
+                if sys.byteorder != "little":
+                    section.byteswap()
+                section.tofile(snapshot)
+
+    @staticmethod
+    def load(path, world_type=GridWorld):
+        """
+        a static method, which loads a read-only world from a snapshot file, the file is mapped in memory, so loading
+        takes the same time regardless of the number of events
+        :param path: the path of the snapshot file
+        :param world_type: optional argument, the type of the loaded world, default value is GridWorld
+        :return: a read-only GridWorld object with the grid size and the travel costs of the saved world, answering
+            queries from the snapshot file
+        :raises ValueError: if the file is not a valid snapshot
+        """
+
+        snapshot = SnapshotFile(path)
+        cost_layer = CostLayer(snapshot.grid_size, costs=snapshot.costs) if len(snapshot.costs) > 0 else None
+        world = world_type(generate=False, spatial_index=MappedBucketIndex(snapshot), storage=MappedStorage(snapshot),
+                           cost_layer=cost_layer, grid_size=snapshot.grid_size)
+        world.read_only = True
+
+        if numpy is not None:
+            # the arrays for the batch queries are views of the file, so nothing is copied or read until they are used
+            world.event_arrays = tuple(numpy.frombuffer(section, dtype=numpy.int64) for section in
+                                       (snapshot.identifiers, snapshot.event_xs, snapshot.event_ys, snapshot.event_slots))
+
+        return world
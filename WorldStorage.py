@@ -0,0 +1,252 @@
+class WorldStorage(object):
+    """
+    this class represents the interface of the storage of the events in a GridWorld, each position holds a map
+    linking the identifiers of the events at the position to the event objects, positions are given in world
+    coordinates, e.g. in the range [-10, 10] if the grid size is 10
+    """
+
+    def __init__(self):
+        """
+        constructor for a WorldStorage object
+        """
+
+        self.event_positions = {}  # a map linking the identifier of each stored event to its position
+
+    def get_events(self, x, y):
+        """
+        a method which returns the map of events stored at position (x,y)
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: the map of events at position (x, y) or None if there are no events at the position
+        """
+
+        raise NotImplementedError("get_events must be implemented by the world storage")
+
+    def set_events(self, x, y, events):
+        """
+        a method which stores the map of events at position (x,y), replacing any map already stored there
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :param events: the map of events to store or None to clear the position
+        """
+
+        raise NotImplementedError("set_events must be implemented by the world storage")
+
+    def iter_positions(self, x0, y0, x1, y1):
+        """
+        a method which generates the positions holding events in a rectangle of the world
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :return: a generator of tuples (x, y, events) for each position in the rectangle holding events
+        """
+
+        raise NotImplementedError("iter_positions must be implemented by the world storage")
+
+    def add_event(self, x, y, event):
+        """
+        a method which stores an event at position (x,y) after the events already stored there
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :param event: the event object to store
+        """
+
+        events = self.get_events(x, y)
+        if events is None:
+            events = {}
+            self.set_events(x, y, events)
+
+        events[event.identifier] = event
+        self.event_positions[event.identifier] = (x, y)
+
+    def remove_event(self, identifier):
+        """
+        a method which removes a stored event, positions are cleared when their last event is removed
+        :param identifier: the identifier of the event
+        :return: the removed event object
+        :raises KeyError: if there is no stored event with the given identifier
+        """
+
+        x, y = self.event_positions.pop(identifier)
+        events = self.get_events(x, y)
+        event = events.pop(identifier)
+        if len(events) == 0:
+            self.set_events(x, y, None)
+
+        return event
+
+    def update_event(self, event):
+        """
+        a method which is called after the tickets of a stored event were replaced, the event objects of this storage
+        are the stored events, so there is nothing to do, storages keeping the events in another form write them back
+        :param event: the changed event object
+        """
+
+        pass
+
+
+class DenseStorage(WorldStorage):
+    """
+    this class represents a storage, which allocates a 2D list with a cell for every position of the world
+    """
+
+    def __init__(self, grid_size):
+        """
+        constructor for a DenseStorage object
+        :param grid_size: half of the size of the grid, e.g. if this is 10, world is in range [-10, 10]
+        """
+
+        super(DenseStorage, self).__init__()
+
+        self.grid_size = grid_size
+
+        self.grid = []
+        for row in range(self.grid_size*2 + 1):
+            self.grid.append([None]*(self.grid_size*2 + 1))
+
+    def get_events(self, x, y):
+        """
+        a method which returns the map of events stored at position (x,y)
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: the map of events at position (x, y) or None if there are no events at the position
+        """
+
+        return self.grid[y + self.grid_size][x + self.grid_size]
+
+    def set_events(self, x, y, events):
+        """
+        a method which stores the map of events at position (x,y), replacing any map already stored there
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :param events: the map of events to store or None to clear the position
+        """
+
+        self.grid[y + self.grid_size][x + self.grid_size] = events
+
+    def iter_positions(self, x0, y0, x1, y1):
+        """
+        a method which generates the positions holding events in a rectangle of the world
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :return: a generator of tuples (x, y, events) for each position in the rectangle holding events
+        """
+
+        for y in range(max(y0, -self.grid_size), min(y1, self.grid_size) + 1):
+            row = self.grid[y + self.grid_size]
+            for x in range(max(x0, -self.grid_size), min(x1, self.grid_size) + 1):
+                events = row[x + self.grid_size]
+                if events:
+                    yield x, y, events
+
+
+class Region(object):
+    """
+    this class represents a square region of the world, which holds the maps of events of its positions
+    """
+
+    def __init__(self, region_size):
+        """
+        constructor for a Region object
+        :param region_size: the length of the side of the region
+        """
+
+        self.cells = [None]*(region_size*region_size)
+        self.num_of_positions = 0  # the number of positions in the region holding events
+
+
+class ChunkedStorage(WorldStorage):
+    """
+    this class represents a storage, which divides the world into square regions of a fixed size, a region is only
+    allocated when an event is stored in it, so the memory used depends on the events and not on the size of the world
+    """
+
+    def __init__(self, region_size=64):
+        """
+        constructor for a ChunkedStorage object
+        :param region_size: optional argument, the length of the side of a region, default value is 64
+        :raises ValueError: if the region size is not a positive integer
+        """
+
+        if type(region_size) != int or region_size <= 0:
+            raise ValueError("Region size must be a positive integer")
+
+        super(ChunkedStorage, self).__init__()
+
+        self.region_size = region_size
+        self.regions = {}  # a map linking the coordinates of a region to the Region object
+
+    def get_events(self, x, y):
+        """
+        a method which returns the map of events stored at position (x,y)
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :return: the map of events at position (x, y) or None if there are no events at the position
+        """
+
+        region = self.regions.get((x // self.region_size, y // self.region_size))
+        if region is None:
+            return None
+
+        return region.cells[(y % self.region_size)*self.region_size + x % self.region_size]
+
+    def set_events(self, x, y, events):
+        """
+        a method which stores the map of events at position (x,y), replacing any map already stored there, regions are
+        allocated when their first position is stored and released when their last position is cleared
+        :param x: the x coordinate
+        :param y: the y coordinate
+        :param events: the map of events to store or None to clear the position
+        """
+
+        key = (x // self.region_size, y // self.region_size)
+        region = self.regions.get(key)
+        if region is None:
+            if events is None:
+                return
+            region = self.regions[key] = Region(self.region_size)
+
+        cell = (y % self.region_size)*self.region_size + x % self.region_size
+        region.num_of_positions += (events is not None) - (region.cells[cell] is not None)
+        region.cells[cell] = events
+
+        if region.num_of_positions == 0:
+            del self.regions[key]
+
+    def iter_positions(self, x0, y0, x1, y1):
+        """
+        a method which generates the positions holding events in a rectangle of the world, only the allocated regions
+        overlapping the rectangle are visited
+        :param x0: the minimum x coordinate of the rectangle inclusive
+        :param y0: the minimum y coordinate of the rectangle inclusive
+        :param x1: the maximum x coordinate of the rectangle inclusive
+        :param y1: the maximum y coordinate of the rectangle inclusive
+        :return: a generator of tuples (x, y, events) for each position in the rectangle holding events
+        """
+
+        if x0 > x1 or y0 > y1:
+            return
+
+        region_x0, region_y0 = x0 // self.region_size, y0 // self.region_size
+        region_x1, region_y1 = x1 // self.region_size, y1 // self.region_size
+
+        # go through the allocated regions if there are fewer of them than regions overlapping the rectangle
+        if (region_x1 - region_x0 + 1)*(region_y1 - region_y0 + 1) > len(self.regions):
+            keys = [key for key in self.regions
+                    if region_x0 <= key[0] <= region_x1 and region_y0 <= key[1] <= region_y1]
+        else:
+            keys = [(region_x, region_y) for region_x in range(region_x0, region_x1 + 1)
+                    for region_y in range(region_y0, region_y1 + 1) if (region_x, region_y) in self.regions]
+
+        for key in keys:
+            cells = self.regions[key].cells
+            low_x, low_y = key[0]*self.region_size, key[1]*self.region_size
+            for cell_y in range(max(y0, low_y), min(y1, low_y + self.region_size - 1) + 1):
+                offset = (cell_y - low_y)*self.region_size - low_x
+                for cell_x in range(max(x0, low_x), min(x1, low_x + self.region_size - 1) + 1):
+                    events = cells[offset + cell_x]
+                    if events:
+                        yield cell_x, cell_y, events